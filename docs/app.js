@@ -7,6 +7,185 @@ async function loadJSON(path){
   return await r.json();
 }
 
+// citations.json（列指向・辞書エンコード形式）を論文オブジェクトの配列に展開する
+function decodeCitations(data){
+  if (data.format !== 'columnar-v1') return data.results || [];
+  const d = data.dicts, c = data.columns;
+  const papers = new Array(data.count);
+  for (let i = 0; i < data.count; i++) {
+    papers[i] = {
+      index: i,
+      id: 'https://openalex.org/' + c.id[i],
+      title: c.title[i],
+      publication_year: c.year[i],
+      host_venue: d.venues[c.venue[i]],
+      authorships: c.authors[i].map(a => ({ name: d.authors[a], id: d.author_ids ? d.author_ids[a] : undefined })),
+      tags: c.tags[i].map(t => d.tags[t]),
+      cited_by_count: c.cited_by_count[i],
+      landing_page_url: c.url[i],
+    };
+  }
+  return papers;
+}
+
+// graph.json（引用グラフのスコア、行番号はcitations.jsonと同じ）を各論文に付与する
+function attachGraphScores(papers, graph){
+  if (!graph || graph.format !== 'graph-v1' || graph.count !== papers.length) return false;
+  const c = graph.columns, scale = graph.pagerank_scale || 1;
+  papers.forEach((p, i) => {
+    p.cited_in_corpus = c.cited_in_corpus[i];
+    p.influence = c.pagerank[i] / scale;
+    p.cluster = c.cluster[i];
+  });
+  return true;
+}
+
+// trends.json（被引用数の推移、行番号はcitations.jsonと同じ）から直近の増加数を各論文に付与する
+function attachTrends(papers, trends){
+  if (!trends || trends.format !== 'trends-v1' || trends.count !== papers.length) return false;
+  const growth = trends.columns.growth;
+  papers.forEach((p, i) => { p.growth = growth[i]; });
+  return trends.days.length > 1;
+}
+
+// matrices.json の型付き配列（base64、リトルエンディアン、行優先）を行の配列に展開する
+function decodeMatrix(m){
+  const bin = atob(m.data);
+  const bytes = new Uint8Array(bin.length);
+  for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+  const size = {uint8: 1, uint16: 2, uint32: 4}[m.dtype];
+  const view = new DataView(bytes.buffer);
+  const [rows, cols] = m.shape;
+  const out = [];
+  for (let r = 0; r < rows; r++) {
+    const row = new Array(cols);
+    for (let c = 0; c < cols; c++) {
+      const at = (r * cols + c) * size;
+      row[c] = size === 1 ? view.getUint8(at) : size === 2 ? view.getUint16(at, true) : view.getUint32(at, true);
+    }
+    out.push(row);
+  }
+  return out;
+}
+
+// facets.json（差分符号化された転置リスト）を 名前 -> 行番号の昇順配列 のMapに展開する
+function decodePostings(deltas){
+  const out = new Array(deltas.length);
+  let acc = 0;
+  for (let i = 0; i < deltas.length; i++) { acc += deltas[i]; out[i] = acc; }
+  return out;
+}
+
+function buildFacetIndex(facets, citations){
+  if (!facets || facets.format !== 'postings-v1' || citations.format !== 'columnar-v1') return null;
+  const d = citations.dicts;
+  const toMap = (names, lists) => new Map(names.map((name, i) => [name, decodePostings(lists[i] || [])]));
+  return {
+    tag: toMap(d.tags, facets.tag),
+    author: toMap(d.author_ids ? d.author_ids.map(String) : d.authors, facets.author),
+    venue: toMap(d.venues, facets.venue),
+    year: new Map(Object.entries(facets.year || {}).map(([y, p]) => [Number(y), decodePostings(p)])),
+  };
+}
+
+// 昇順配列同士の積集合
+function intersectSorted(a, b){
+  const out = [];
+  let i = 0, j = 0;
+  while (i < a.length && j < b.length) {
+    if (a[i] === b[j]) { out.push(a[i]); i++; j++; }
+    else if (a[i] < b[j]) i++;
+    else j++;
+  }
+  return out;
+}
+
+// 昇順配列の和集合
+function unionSorted(lists){
+  const seen = new Set();
+  lists.forEach(l => l.forEach(x => seen.add(x)));
+  return Array.from(seen).sort((x, y) => x - y);
+}
+
+// 選択されたファセットに一致する行番号（AND: タグ・著者、OR: 学会）。絞り込みがなければnull
+function facetRows(index, selectedTags, selectedAuthors, selectedVenues){
+  const lists = [];
+  selectedTags.forEach(t => lists.push(index.tag.get(t) || []));
+  selectedAuthors.forEach(a => lists.push(index.author.get(a) || []));
+  if (selectedVenues.size) {
+    const venues = Array.from(selectedVenues).flatMap(group => group.split('|'));
+    lists.push(unionSorted(venues.map(v => index.venue.get(v) || [])));
+  }
+  if (!lists.length) return null;
+  // 短いリストから順に積集合を取る
+  lists.sort((a, b) => a.length - b.length);
+  return lists.reduce((acc, l) => intersectSorted(acc, l));
+}
+
+// 著者の識別キー（著者IDがあればID、古いデータでは名前）
+function authorKey(a){
+  return a.id !== undefined && a.id !== null ? String(a.id) : a.name;
+}
+
+// 全文検索（search.json + search/<prefix>.json、scripts/search_index.py と同じ解析を行う）
+function stemTerm(term, an){
+  if (term.length <= an.min_stem || /^[0-9]+$/.test(term)) return term;
+  for (const [suffix, rep] of an.suffixes) {
+    if (term.endsWith(suffix)) {
+      const cut = term.slice(0, term.length - suffix.length) + rep;
+      if (cut.length >= an.min_stem) term = cut;
+      break;
+    }
+  }
+  if (term.length > 4 && term.endsWith('e')) term = term.slice(0, -1);
+  return term;
+}
+
+function analyzeQuery(text, an){
+  const stop = an.stopSet || (an.stopSet = new Set(an.stopwords));
+  const folded = text.normalize('NFKD').toLowerCase().replace(/[\u0300-\u036f]/g, '');
+  const tokens = folded.match(/[a-z0-9]+/g) || [];
+  return [...new Set(tokens.filter(t => t.length >= an.min_token && !stop.has(t)).map(t => stemTerm(t, an)))];
+}
+
+const searchShardCache = new Map();
+
+function loadSearchShard(key){
+  if (!searchShardCache.has(key)) {
+    searchShardCache.set(key, loadJSON(`data/search/${key}.json`).catch(err => {
+      searchShardCache.delete(key);
+      throw err;
+    }));
+  }
+  return searchShardCache.get(key);
+}
+
+// 検索語を全て含む論文の 行番号 -> スコア（BM25）。クエリが空ならnull
+async function searchScores(manifest, query){
+  if (!manifest) return null;
+  const terms = analyzeQuery(query, manifest.analyzer);
+  if (!terms.length) return null;
+  const lists = await Promise.all(terms.map(async term => {
+    // 語の接頭辞に一致する最長のシャード
+    const key = manifest.shards.filter(k => term.startsWith(k)).sort((a, b) => b.length - a.length)[0];
+    if (key === undefined) return new Map();
+    const entry = (await loadSearchShard(key))[term];
+    const m = new Map();
+    if (!entry) return m;
+    let row = 0;
+    entry[0].forEach((d, i) => { row += d; m.set(row, entry[1][i]); });
+    return m;
+  }));
+  lists.sort((a, b) => a.size - b.size);
+  let scores = lists[0];
+  for (const m of lists.slice(1)) {
+    const next = new Map();
+    scores.forEach((s, row) => { if (m.has(row)) next.set(row, s + m.get(row)); });
+    scores = next;
+  }
+  return scores;
+}
+
 function el(tag, attrs={}, ...children){
   const e = document.createElement(tag);
   Object.entries(attrs).forEach(([k,v])=>{
@@ -40,20 +219,23 @@ function renderCard(w){
   return el('article', {class:'card'},
     el('h3',{}, w.title||'(no title)'),
     el('div',{class:'meta'}, [authorDisplay,' • ', w.host_venue||'(venue unknown)',' • ', w.publication_year||'–'].filter(Boolean).join(' ')),
-    el('div',{class:'citation-count'}, `被引用数: ${w.cited_by_count || 0}`),
+    el('div',{class:'citation-count'}, `被引用数: ${w.cited_by_count || 0}` + (w.cited_in_corpus !== undefined ? ` (コーパス内: ${w.cited_in_corpus})` : '') + (w.growth > 0 ? ` ↑${w.growth}` : '')),
     el('div',{class:'tags'}, ...tags),
     url ? el('a',{class:'btn', href:url, target:'_blank', rel:'noopener'}, 'Open') : null
   );
 }
 
-function filterPapers(papers, selectedTags, selectedAuthors, selectedVenues, sortBy = 'citations'){
-  const filtered = papers.filter(w=>{
+function filterPapers(papers, selectedTags, selectedAuthors, selectedVenues, sortBy = 'citations', searchHits = null){
+  const index = window.facetIndex;
+  let filtered = index
+    ? (rows => rows ? rows.map(i => papers[i]) : papers.slice())(facetRows(index, selectedTags, selectedAuthors, selectedVenues))
+    : papers.filter(w=>{
     // AND検索: 選択された全てのタグが含まれている必要がある
     const okTag = !selectedTags.size || selectedTags.size === 0 || 
                   Array.from(selectedTags).every(tag => (w.tags||[]).includes(tag));
     
     // AND検索: 選択された全ての著者が含まれている必要がある
-    const paperAuthors = (w.authorships||[]).map(a=>a.name).filter(Boolean);
+    const paperAuthors = (w.authorships||[]).filter(a=>a.name).map(authorKey);
     const okAuthor = !selectedAuthors.size || selectedAuthors.size === 0 || 
                      Array.from(selectedAuthors).every(author => paperAuthors.includes(author));
     
@@ -68,9 +250,19 @@ function filterPapers(papers, selectedTags, selectedAuthors, selectedVenues, sor
     
     return okTag && okAuthor && okVenue;
   });
+  if (searchHits) filtered = filtered.filter(w => searchHits.has(w.index));
   
   // ソート順を適用
-  if (sortBy === 'year') {
+  if (sortBy === 'relevance' && searchHits) {
+    // 検索スコアで降順ソート（同点は被引用数順）
+    return filtered.sort((a, b) => (searchHits.get(b.index) - searchHits.get(a.index)) || ((b.cited_by_count || 0) - (a.cited_by_count || 0)));
+  } else if (sortBy === 'influence') {
+    // 引用グラフ上の影響度（PageRank）で降順ソート（同点は被引用数順）
+    return filtered.sort((a, b) => ((b.influence || 0) - (a.influence || 0)) || ((b.cited_by_count || 0) - (a.cited_by_count || 0)));
+  } else if (sortBy === 'rising') {
+    // 直近の被引用数の増加で降順ソート（同点は被引用数順）
+    return filtered.sort((a, b) => ((b.growth || 0) - (a.growth || 0)) || ((b.cited_by_count || 0) - (a.cited_by_count || 0)));
+  } else if (sortBy === 'year') {
     // 出版年で降順ソート（新しい順）
     return filtered.sort((a, b) => (b.publication_year || 0) - (a.publication_year || 0));
   } else {
@@ -127,22 +319,22 @@ function mountTagFilter(allTags, stats){
   return container;
 }
 
-function mountAuthorFilter(allAuthors, stats){
+function mountAuthorFilter(allAuthors, authorCounts){
   const container = document.getElementById('author-checkboxes');
   container.innerHTML = '';
   
-  // 著者名でソート
-  const sortedAuthors = [...allAuthors].sort((a, b) => a.localeCompare(b));
+  // 著者名でソート（allAuthors: 著者キー -> 著者名）
+  const sortedAuthors = [...allAuthors.entries()].sort((a, b) => a[1].localeCompare(b[1]));
   
   // 著者の論文数を取得する関数
-  const getAuthorPaperCount = (authorName) => {
-    return stats.by_author ? stats.by_author[authorName] || 0 : 0;
+  const getAuthorPaperCount = (key) => {
+    return authorCounts.get(key) || 0;
   };
   
-  sortedAuthors.forEach(author => {
-    const count = getAuthorPaperCount(author);
+  sortedAuthors.forEach(([key, author]) => {
+    const count = getAuthorPaperCount(key);
     const label = el('label', {class: 'author-checkbox'}, 
-      el('input', {type: 'checkbox', value: author}),
+      el('input', {type: 'checkbox', value: key}),
       el('span', {class: 'author-text'}, `${author} (${count} papers)`)
     );
     container.appendChild(label);
@@ -289,8 +481,12 @@ function mountVenueFilter(allVenues, stats){
   return container;
 }
 
-// 著者の主要タグを計算する関数
-function getAuthorTopTags(authorName, papers) {
+// 著者の主要タグを計算する関数（著者ページに事前計算済みの値があればそれを使う）
+function getAuthorTopTags(author, papers) {
+  if (author.top_tags) {
+    return author.top_tags.map(([tag, count]) => ({ tag, count }));
+  }
+  const authorName = author.name;
   // 著者の論文を取得
   const authorPapers = papers.filter(p => 
     (p.authorships || []).some(a => a.name === authorName)
@@ -344,7 +540,7 @@ function closeAllFilters() {
 }
 
 // グローバル変数として著者フィルター関数を定義
-window.filterByAuthor = function(authorName) {
+window.filterByAuthor = function(key) {
   // 論文一覧タブに切り替え
   const papersTab = document.querySelector('.tab-btn[data-tab="papers"]');
   const tabContents = document.querySelectorAll('.tab-content');
@@ -365,7 +561,7 @@ window.filterByAuthor = function(authorName) {
   authorCheckboxes.forEach(cb => cb.checked = false);
   
   // 指定された著者を選択
-  const targetCheckbox = document.querySelector(`#author-checkboxes input[value="${authorName}"]`);
+  const targetCheckbox = document.querySelector(`#author-checkboxes input[value="${key}"]`);
   if (targetCheckbox) {
     targetCheckbox.checked = true;
     // フィルタリングを実行
@@ -376,7 +572,7 @@ window.filterByAuthor = function(authorName) {
 };
 
 // 著者とタグの両方でフィルタリングする関数
-window.filterByAuthorAndTag = function(authorName, tagName) {
+window.filterByAuthorAndTag = function(key, tagName) {
   // 論文一覧タブに切り替え
   const papersTab = document.querySelector('.tab-btn[data-tab="papers"]');
   const tabContents = document.querySelectorAll('.tab-content');
@@ -399,7 +595,7 @@ window.filterByAuthorAndTag = function(authorName, tagName) {
   tagCheckboxes.forEach(cb => cb.checked = false);
   
   // 指定された著者を選択
-  const targetAuthorCheckbox = document.querySelector(`#author-checkboxes input[value="${authorName}"]`);
+  const targetAuthorCheckbox = document.querySelector(`#author-checkboxes input[value="${key}"]`);
   if (targetAuthorCheckbox) {
     targetAuthorCheckbox.checked = true;
   }
@@ -419,26 +615,37 @@ window.filterByAuthorAndTag = function(authorName, tagName) {
 // ページネーション用のグローバル変数
 let currentPage = 1;
 let authorsPerPage = 50;
-let allAuthors = [];
+let totalAuthors = 0;
+
+// 著者の詳細はページ単位のファイル（data/authors/NNN.json）から遅延読み込みする
+const authorShardCache = new Map();
+function loadAuthorShard(index){
+  if (!authorShardCache.has(index)) {
+    authorShardCache.set(index, loadJSON(`data/authors/${String(index).padStart(3, '0')}.json`));
+  }
+  return authorShardCache.get(index);
+}
 
 function renderTopAuthors(stats, papers){
-  allAuthors = stats.top_authors || [];
+  const meta = stats.authors || {};
+  totalAuthors = meta.count || 0;
+  authorsPerPage = meta.per_shard || authorsPerPage;
   currentPage = 1;
   
   // 著者数を表示
-  document.getElementById('authors-count').textContent = allAuthors.length;
+  document.getElementById('authors-count').textContent = totalAuthors;
   
   renderAuthorsPage();
 }
 
-function getAuthorInstitutionsWithYears(authorName, papers, stats) {
-  // まず統計データから所属情報を取得
-  const topAuthor = stats.top_authors?.find(a => a.name === authorName);
-  if (topAuthor && topAuthor.institution_years) {
-    return Object.entries(topAuthor.institution_years).map(([institution, data]) => ({
+function getAuthorInstitutionsWithYears(author, papers) {
+  const authorName = author.name;
+  // まず著者ページのデータから所属情報を取得
+  if (author.institution_years) {
+    return Object.entries(author.institution_years).map(([institution, years]) => ({
       name: institution,
-      yearRange: data.year_range,
-      years: data.years
+      yearRange: years.length ? `${years[0]}-${years[years.length - 1]}` : '',
+      years: years
     }));
   }
   
@@ -468,38 +675,34 @@ function getAuthorInstitutionsWithYears(authorName, papers, stats) {
   });
 }
 
-function renderAuthorsPage() {
+async function renderAuthorsPage() {
   const tbody = document.getElementById('top-authors-tbody');
+  const page = currentPage;
+  const startIndex = (page - 1) * authorsPerPage;
+  const pageAuthors = totalAuthors ? await loadAuthorShard(page - 1) : [];
+  // 読み込み中に別のページへ移動した場合は描画しない
+  if (page !== currentPage) return;
   tbody.innerHTML = '';
   
-  const startIndex = (currentPage - 1) * authorsPerPage;
-  const endIndex = startIndex + authorsPerPage;
-  const pageAuthors = allAuthors.slice(startIndex, endIndex);
-  
   for(let i = 0; i < pageAuthors.length; i++){
     const a = pageAuthors[i];
     const name = a.name;
+    const key = authorKey(a);
     const papers = a.papers;
     const avgCitations = a.avg_citations.toFixed(1);
     const totalCitations = Math.round(papers * avgCitations);
     const rank = startIndex + i + 1;
     
     // 著者の所属を取得（年次情報付き）
-    const institutionsWithYears = getAuthorInstitutionsWithYears(name, window.allPapers || [], window.allStats || {});
+    const institutionsWithYears = getAuthorInstitutionsWithYears(a, window.allPapers || []);
     const institutionText = institutionsWithYears.length > 0 
       ? ` (${institutionsWithYears.map(inst => `${inst.name} (${inst.yearRange})`).join(', ')})` 
       : '';
     
-    // デバッグ用（Tim Kraskaの場合）
-    if (name === 'Tim Kraska') {
-      console.log('Tim Kraska institutions with years:', institutionsWithYears);
-      console.log('Tim Kraska stats data:', window.allStats?.top_authors?.find(a => a.name === 'Tim Kraska'));
-    }
-    
     // 著者の主要タグを取得
-    const topTags = getAuthorTopTags(name, window.allPapers || []);
+    const topTags = getAuthorTopTags(a, window.allPapers || []);
     const tagsHtml = topTags.map(tag => 
-      `<span class="tag-badge" onclick="filterByAuthorAndTag('${name}', '${tag.tag}')">${tag.tag} (${tag.count})</span>`
+      `<span class="tag-badge" onclick="filterByAuthorAndTag('${key}', '${tag.tag}')">${tag.tag} (${tag.count})</span>`
     ).join('');
     
     const tr = el('tr', {class: 'author-row'},
@@ -507,7 +710,7 @@ function renderAuthorsPage() {
         el('div', {class: 'author-rank'}, rank.toString())
       ),
       el('td', {class: 'name-cell'}, 
-        el('div', {class: 'author-name', onclick: `filterByAuthor('${name}')`}, name + institutionText)
+        el('div', {class: 'author-name', onclick: `filterByAuthor('${key}')`}, name + institutionText)
       ),
       el('td', {class: 'papers-cell'}, 
         el('div', {class: 'paper-count'}, 
@@ -533,7 +736,7 @@ function renderAuthorsPage() {
 }
 
 function updatePagination() {
-  const totalPages = Math.ceil(allAuthors.length / authorsPerPage);
+  const totalPages = Math.ceil(totalAuthors / authorsPerPage);
   const pageInfo = document.getElementById('page-info');
   const prevBtn = document.getElementById('prev-page');
   const nextBtn = document.getElementById('next-page');
@@ -553,7 +756,7 @@ function setupPagination() {
   });
   
   document.getElementById('next-page').addEventListener('click', () => {
-    const totalPages = Math.ceil(allAuthors.length / authorsPerPage);
+    const totalPages = Math.ceil(totalAuthors / authorsPerPage);
     if (currentPage < totalPages) {
       currentPage++;
       renderAuthorsPage();
@@ -593,46 +796,93 @@ function renderCharts(stats){
   new Chart(tc, {type:'bar', data:{labels:tags, datasets:[{label:'papers / tag (top20)', data:vals}]}});
 }
 
+// タグ×年・学会×年・タグ×タグの集計（matrices.jsonの事前計算済み行列）のグラフと表
+function renderMatrixCharts(matrices){
+  const boxes = ['tag-year-container', 'venue-year-container', 'cooccur-container'].map(id => document.getElementById(id));
+  if (!matrices || matrices.format !== 'matrices-v1') { boxes.forEach(b => { if (b) b.style.display = 'none'; }); return; }
+  const L = matrices.labels, M = matrices.matrices;
+  const tagYear = decodeMatrix(M.tag_year), venueYear = decodeMatrix(M.venue_year), tagTag = decodeMatrix(M.tag_tag);
+  // 論文数の多い順（対角成分 = タグごとの論文数）
+  const topTags = L.tags.map((name, i) => ({name, i, n: tagTag[i][i]})).sort((a, b) => b.n - a.n);
+
+  new Chart(document.getElementById('tagYear').getContext('2d'), {type:'line',
+    data:{labels:L.years, datasets:topTags.slice(0, 8).map(t => ({label:t.name, data:tagYear[t.i]}))}});
+  new Chart(document.getElementById('venueYear').getContext('2d'), {type:'bar',
+    data:{labels:L.years, datasets:L.venues.slice(0, 8).map((name, i) => ({label:name, data:venueYear[i]}))},
+    options:{scales:{x:{stacked:true}, y:{stacked:true}}}});
+
+  // 上位10タグの共起数
+  const top = topTags.slice(0, 10);
+  const table = document.getElementById('cooccur');
+  table.innerHTML = '';
+  table.appendChild(el('tr', {}, el('th', {}, ''), ...top.map(t => el('th', {}, t.name))));
+  top.forEach(a => table.appendChild(el('tr', {}, el('th', {}, a.name), ...top.map(b => el('td', {}, String(tagTag[a.i][b.i]))))));
+}
+
+// タグ別の被引用数の推移（trends.jsonの事前計算済み系列、直近の被引用数が多い上位8タグ）
+function renderTrendChart(trends){
+  const box = document.getElementById('trend-container');
+  if (!trends || trends.format !== 'trends-v1' || trends.days.length < 2) { if (box) box.style.display = 'none'; return; }
+  const t = trends.tags;
+  const top = t.names.map((name, i) => ({name, series: t.series[i]}))
+    .sort((a, b) => b.series[b.series.length - 1] - a.series[a.series.length - 1])
+    .slice(0, 8);
+  const ctx = document.getElementById('tagTrend').getContext('2d');
+  new Chart(ctx, {type:'line', data:{labels:trends.days, datasets:top.map(x => ({label:x.name, data:x.series, pointRadius:0}))}});
+}
+
 (async function(){
   console.log('Loading data...');
   const citations = await loadJSON('data/citations.json');
   console.log('Citations loaded');
   const stats = await loadJSON('data/stats.json');
   console.log('Stats loaded');
+  const facets = await loadJSON('data/facets.json').catch(() => null);
+  const searchManifest = await loadJSON('data/search.json').catch(() => null);
+  const graph = await loadJSON('data/graph.json').catch(() => null);
+  const trends = await loadJSON('data/trends.json').catch(() => null);
+  const matrices = await loadJSON('data/matrices.json').catch(() => null);
 
-  const papers = citations.results||[];
+  const papers = decodeCitations(citations);
   console.log('Loaded papers:', papers.length);
+  const hasGraph = attachGraphScores(papers, graph);
+  const hasTrends = attachTrends(papers, trends);
   console.log('Stats data loaded:', !!stats);
   console.log('Stats keys:', Object.keys(stats || {}));
-  console.log('Top authors count:', stats.top_authors?.length || 0);
-  if (stats.top_authors) {
-    const timKraska = stats.top_authors.find(a => a.name === 'Tim Kraska');
-    console.log('Tim Kraska in stats:', timKraska);
-    if (timKraska) {
-      console.log('Tim Kraska institutions:', timKraska.institutions);
-    }
-  }
+  console.log('Authors count:', stats.authors?.count || 0);
   const allTags = new Set(papers.flatMap(p=>p.tags||[]));
-  const allAuthors = new Set(papers.flatMap(p=>(p.authorships||[]).map(a=>a.name).filter(Boolean)));
+  // 著者ごとの論文数（著者フィルターの表示用、著者キー単位）
+  const authorCounts = new Map();
+  const allAuthors = new Map();
+  papers.forEach(p => (p.authorships||[]).forEach(a => {
+    if (!a.name) return;
+    const key = authorKey(a);
+    allAuthors.set(key, a.name);
+    authorCounts.set(key, (authorCounts.get(key) || 0) + 1);
+  }));
   const allVenues = new Set(papers.map(p=>p.host_venue||'Unknown').filter(Boolean));
   
   // グローバル変数にデータを保存
   window.allPapers = papers;
+  window.facetIndex = buildFacetIndex(facets, citations);
   window.allStats = stats;
   
   renderCounters(stats);
   renderCharts(stats);
+  renderTrendChart(trends);
+  renderMatrixCharts(matrices);
   renderTopAuthors(stats, papers);
   setupPagination();
 
   const tagContainer = mountTagFilter(allTags, stats);
-  const authorContainer = mountAuthorFilter(allAuthors, stats);
+  const authorContainer = mountAuthorFilter(allAuthors, authorCounts);
   const venueContainer = mountVenueFilter(allVenues, stats);
   const list = document.getElementById('list');
   const clear = document.getElementById('clear');
   const clearAuthors = document.getElementById('clear-authors');
   const clearVenues = document.getElementById('clear-venues');
   let currentSort = 'citations'; // デフォルトは被引用数順
+  let currentSearch = null; // 行番号 -> 検索スコア（検索語がなければnull）
 
   function refresh(){
     console.log('refresh() called');
@@ -665,7 +915,7 @@ function renderCharts(stats){
     console.log('Selected authors:', selectedAuthors.size);
     console.log('Selected venues:', selectedVenues.size);
     
-    const view = filterPapers(papers, selectedTags, selectedAuthors, selectedVenues, currentSort);
+    const view = filterPapers(papers, selectedTags, selectedAuthors, selectedVenues, currentSort, currentSearch);
     console.log('Filtered papers:', view.length, 'Total papers:', papers.length);
     list.innerHTML = '';
     for(const w of view){ list.appendChild(renderCard(w)); }
@@ -692,9 +942,30 @@ function renderCharts(stats){
     refresh(); 
   });
   
+  // キーワード検索（入力が止まってから必要なシャードだけを読み込む）
+  const searchInput = document.getElementById('search');
+  let searchTimer = null;
+  let searchSeq = 0;
+  if (!searchManifest) searchInput.disabled = true;
+  searchInput.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(async () => {
+      const seq = ++searchSeq;
+      const hits = await searchScores(searchManifest, searchInput.value).catch(err => {
+        console.error('Search failed:', err);
+        return null;
+      });
+      if (seq !== searchSeq) return; // 古い検索結果は捨てる
+      currentSearch = hits;
+      refresh();
+    }, 200);
+  });
+
   // 全ての絞り込みをクリアするボタン
   const clearAllFilters = document.getElementById('clear-all-filters');
   clearAllFilters.addEventListener('click', () => {
+    searchInput.value = '';
+    currentSearch = null;
     // 全てのチェックボックスをクリア
     tagContainer.querySelectorAll('input[type="checkbox"]').forEach(cb => cb.checked = false);
     authorContainer.querySelectorAll('input[type="checkbox"]').forEach(cb => cb.checked = false);
@@ -711,7 +982,14 @@ function renderCharts(stats){
   // ソート機能
   const sortCitationsBtn = document.getElementById('sort-citations');
   const sortYearBtn = document.getElementById('sort-year');
-  const sortBtns = [sortCitationsBtn, sortYearBtn];
+  const sortRelevanceBtn = document.getElementById('sort-relevance');
+  const sortInfluenceBtn = document.getElementById('sort-influence');
+  const sortRisingBtn = document.getElementById('sort-rising');
+  const sortBtns = [sortCitationsBtn, sortYearBtn, sortRelevanceBtn, sortInfluenceBtn, sortRisingBtn];
+  // 引用グラフがなければ影響度順は使えない
+  if (!hasGraph) sortInfluenceBtn.style.display = 'none';
+  // 推移が2日分以上なければ急上昇順は使えない
+  if (!hasTrends) sortRisingBtn.style.display = 'none';
 
   sortBtns.forEach(btn => {
     btn.addEventListener('click', () => {
@@ -722,6 +1000,12 @@ function renderCharts(stats){
       // ソート順を更新
       if (btn === sortCitationsBtn) {
         currentSort = 'citations';
+      } else if (btn === sortRelevanceBtn) {
+        currentSort = 'relevance';
+      } else if (btn === sortInfluenceBtn) {
+        currentSort = 'influence';
+      } else if (btn === sortRisingBtn) {
+        currentSort = 'rising';
       } else {
         currentSort = 'year';
       }
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Streaming statistics over processed works.
+
+`StatsAccumulator` is fed one work at a time (`add`) and collects every
+aggregate that ends up in stats.json in that single pass. Accumulators built
+over disjoint chunks of the corpus can be combined with `merge`; `finalize`
+is called once at the end to produce the stats dictionary.
+
+Merging chunks in corpus order gives the same result as one accumulator over
+the whole corpus (author ranks break ties by first appearance).
+
+Authors are accumulated per author key (OpenAlex id, else name);
+`resolve_authors` folds the keys of one author entity (see authors.py) into a
+single record before `finalize`.
+"""
+
+from __future__ import annotations
+import time
+from collections import Counter
+from typing import Dict, Any, Iterable, List, Optional, Set
+
+from authors import AuthorEntities, author_key
+
+OPENALEX_PREFIX = "https://openalex.org/"
+TOP_VENUES = 30
+AUTHOR_TOP_TAGS = 5
+
+
+class AuthorRecord:
+    """Per-author aggregates; keyed by OpenAlex author id (or name when missing)."""
+    __slots__ = ("name", "papers", "citations", "institutions", "tags", "entity_id")
+
+    def __init__(self) -> None:
+        self.name: Optional[str] = None
+        # stable integer id once resolved to an author entity
+        self.entity_id: Optional[int] = None
+        self.papers = 0
+        self.citations = 0
+        # institution -> years seen (insertion ordered)
+        self.institutions: Dict[str, Set[int]] = {}
+        self.tags: Counter = Counter()
+
+    def merge(self, other: "AuthorRecord") -> None:
+        if other.name is not None:
+            self.name = other.name
+        self.papers += other.papers
+        self.citations += other.citations
+        for inst, years in other.institutions.items():
+            self.institutions.setdefault(inst, set()).update(years)
+        self.tags.update(other.tags)
+
+
+def display_name(key: str, rec: AuthorRecord) -> str:
+    if rec.name is not None:
+        return rec.name
+    if key.startswith(OPENALEX_PREFIX):
+        return key.split("/")[-1]
+    return key
+
+
+class StatsAccumulator:
+    """Single-pass, mergeable aggregation of the statistics in stats.json."""
+
+    def __init__(self, tag_categories: Optional[Dict[str, str]] = None):
+        self.tag_categories: Dict[str, str] = dict(tag_categories or {})
+        self.total_works = 0
+        self.citations_sum = 0
+        self.by_year: Counter = Counter()
+        self.by_tag: Counter = Counter()
+        self.by_venue: Counter = Counter()
+        self.authors: Dict[str, AuthorRecord] = {}
+
+    def add(self, w: Dict[str, Any]) -> None:
+        self.total_works += 1
+        year = w.get("publication_year")
+        if year:
+            self.by_year[year] += 1
+        tags = w.get("tags") or []
+        self.by_tag.update(tags)
+        cited = int(w.get("cited_by_count") or 0)
+        self.citations_sum += cited
+        hv = w.get("host_venue")
+        if hv:
+            self.by_venue[hv] += 1
+        authors = self.authors
+        for a in (w.get("authorships") or []):
+            name = a.get("name") or "unknown"
+            # author_id がある場合はそれを使用、そうでなければ名前を使用
+            key = author_key(a)
+            rec = authors.get(key)
+            if rec is None:
+                rec = authors[key] = AuthorRecord()
+            if name != "unknown":
+                rec.name = name
+            rec.papers += 1
+            rec.citations += cited
+            rec.tags.update(tags)
+            # institutions filled in by enrich.py are current ones, not those of this year
+            dated = year and not a.get("institutions_enriched")
+            for inst in (a.get("institutions") or []):
+                years = rec.institutions.setdefault(inst, set())
+                if dated:
+                    years.add(year)
+
+    def add_all(self, items: Iterable[Dict[str, Any]]) -> "StatsAccumulator":
+        for w in items:
+            self.add(w)
+        return self
+
+    def merge(self, other: "StatsAccumulator") -> "StatsAccumulator":
+        """Fold in an accumulator built over a later, disjoint chunk of the corpus."""
+        self.tag_categories.update(other.tag_categories)
+        self.total_works += other.total_works
+        self.citations_sum += other.citations_sum
+        self.by_year.update(other.by_year)
+        self.by_tag.update(other.by_tag)
+        self.by_venue.update(other.by_venue)
+        for key, rec in other.authors.items():
+            mine = self.authors.get(key)
+            if mine is None:
+                self.authors[key] = rec
+            else:
+                mine.merge(rec)
+        return self
+
+    def resolve_authors(self, entities: AuthorEntities) -> "StatsAccumulator":
+        """Merge the records of every author entity under its primary key."""
+        merged: Dict[str, AuthorRecord] = {}
+        for key, rec in self.authors.items():
+            eid = entities.entity_of.get(key)
+            if eid is None:
+                merged[key] = rec
+                continue
+            primary = entities.primary(eid)
+            target = merged.get(primary)
+            if target is None:
+                # keep the position of the entity's first-seen key
+                target = merged[primary] = AuthorRecord()
+                target.entity_id = eid
+            target.merge(rec)
+            target.name = entities.names[eid]
+        self.authors = merged
+        return self
+
+    def finalize(self) -> Dict[str, Any]:
+        cats = self.tag_categories
+        # stable sort: ties keep first-appearance order
+        ranked = sorted(self.authors.items(), key=lambda kv: -kv[1].papers)
+        top_authors: List[Dict[str, Any]] = []
+        by_author: Dict[str, int] = {}
+        for key, rec in ranked:
+            name = display_name(key, rec)
+            by_author[key] = rec.papers
+            top_authors.append({
+                **({"id": rec.entity_id} if rec.entity_id is not None else {}),
+                "author_id": key,
+                "name": name,
+                "papers": rec.papers,
+                "sum_citations": rec.citations,
+                "avg_citations": rec.citations / rec.papers if rec.papers else 0.0,
+                "institutions": list(rec.institutions),
+                "institution_years": {
+                    inst: {"years": sorted(years), "year_range": f"{min(years)}-{max(years)}"}
+                    for inst, years in rec.institutions.items() if years
+                },
+                "top_tags": sorted(rec.tags.items(), key=lambda x: (-x[1], x[0]))[:AUTHOR_TOP_TAGS],
+            })
+        return {
+            "total_works": self.total_works,
+            "by_year": dict(sorted(self.by_year.items())),
+            "by_tag": dict(sorted(self.by_tag.items(), key=lambda x: (-x[1], x[0]))),
+            "by_tag_category": dict(sorted(self.by_tag.items(), key=lambda x: (cats.get(x[0], "Other"), -x[1], x[0]))),
+            "tag_categories": cats,
+            "by_venue": dict(self.by_venue.most_common(TOP_VENUES)),
+            "by_author": by_author,
+            "top_authors": top_authors,
+            "citations_sum": self.citations_sum,
+            "last_updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Author entities: which OpenAlex author ids (or bare names, when a record has
+no id) belong to the same person.
+
+`AuthorIndex` observes every work once and keeps, per author key, the names it
+appeared under, its institutions and the (blocked) names of its co-authors.
+`resolve()` then merges keys:
+
+- keys are blocked by normalized "first initial + surname" and only keys of
+  the same block are compared,
+- two keys merge when their names are compatible ("T. Kraska" / "Tim Kraska")
+  and they share an institution or a co-author,
+- `merge_authors` pairs in overrides.yml are always merged and
+  `separate_authors` pairs are never put in the same entity.
+
+Every entity gets a stable integer id. Ids are kept in data/author_ids.json
+between runs: an entity reuses the smallest id of its members, new entities
+take the next unused id, and ids are never reused.
+"""
+
+from __future__ import annotations
+import re, json, unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from rawstore import write_json_atomic
+
+ROOT = Path(__file__).resolve().parents[1]
+AUTHOR_IDS_PATH = ROOT / "data" / "author_ids.json"
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MARKS_RE = re.compile("[\u0300-\u036f]")
+
+
+def author_key(a: Dict[str, Any]) -> str:
+    """Aggregation key of an authorship: the OpenAlex author id, else the name."""
+    aid = a.get("author_id") or "unknown"
+    return aid if aid != "unknown" else (a.get("name") or "unknown")
+
+
+def name_tokens(name: Optional[str]) -> List[str]:
+    """Folded name tokens in "given ... family" order ("Kraska, Tim" -> ["tim", "kraska"])."""
+    s = MARKS_RE.sub("", unicodedata.normalize("NFKD", name or "")).lower()
+    if "," in s:
+        family, _, given = s.partition(",")
+        s = f"{given} {family}"
+    return TOKEN_RE.findall(s)
+
+
+def block_key(tokens: List[str]) -> str:
+    if len(tokens) < 2:
+        return tokens[0] if tokens else ""
+    return f"{tokens[0][0]} {tokens[-1]}"
+
+
+def compatible(a: List[str], b: List[str]) -> bool:
+    """Same family name and given names that agree, allowing initials and missing middle names."""
+    if not a or not b or a[-1] != b[-1]:
+        return False
+    for x, y in zip(a[:-1], b[:-1]):
+        if x != y and not (len(x) == 1 and y.startswith(x)) and not (len(y) == 1 and x.startswith(y)):
+            return False
+    return True
+
+
+def preferred_name(counts: Counter) -> Optional[str]:
+    """The most complete spelling (fewest initials), then the most frequent one."""
+    best = None
+    for name, n in counts.items():
+        rank = (sum(len(t) > 1 for t in name_tokens(name)), n)
+        if best is None or rank > best[0]:
+            best = (rank, name)
+    return best[1] if best else None
+
+
+class AuthorEntities:
+    """Resolved entities: author key -> stable id, plus the display name and keys of each id."""
+
+    def __init__(self, entity_of: Dict[str, int], members: Dict[int, List[str]],
+                 names: Dict[int, str], next_id: int):
+        self.entity_of = entity_of
+        # id -> member keys, most papers first (the first one is the primary key)
+        self.members = members
+        self.names = names
+        self.next_id = next_id
+
+    def primary(self, eid: int) -> str:
+        return self.members[eid][0]
+
+    def save(self, path: Path = AUTHOR_IDS_PATH) -> None:
+        write_json_atomic(path, {"next": self.next_id, "ids": dict(sorted(self.entity_of.items()))},
+                          indent=0)
+
+
+def load_author_ids(path: Path = AUTHOR_IDS_PATH) -> Tuple[Dict[str, int], int]:
+    """(author key -> id, next unused id) from the previous run."""
+    if not path.exists():
+        return {}, 0
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    ids = {k: int(v) for k, v in (data.get("ids") or {}).items()}
+    return ids, max(int(data.get("next") or 0), max(ids.values(), default=-1) + 1)
+
+
+class AuthorIndex:
+    """Collects per-key evidence in one pass over the works; `resolve()` builds the entities."""
+
+    def __init__(self) -> None:
+        self.papers: Counter = Counter()
+        self.names: Dict[str, Counter] = {}
+        self.institutions: Dict[str, Set[str]] = {}
+        self.coauthors: Dict[str, Set[str]] = {}
+        # same-block keys that appear on one work: namesakes, never merged
+        self.conflicts: Set[Tuple[str, str]] = set()
+
+    def add(self, w: Dict[str, Any]) -> None:
+        authorships = [a for a in (w.get("authorships") or []) if a.get("author_id") or a.get("name")]
+        keys = [author_key(a) for a in authorships]
+        blocks = [block_key(name_tokens(a.get("name"))) for a in authorships]
+        for i, (a, key) in enumerate(zip(authorships, keys)):
+            self.papers[key] += 1
+            if a.get("name"):
+                self.names.setdefault(key, Counter())[a["name"]] += 1
+            insts = self.institutions.setdefault(key, set())
+            insts.update(inst for inst in (a.get("institutions") or []) if inst)
+            co = self.coauthors.setdefault(key, set())
+            co.update(b for j, b in enumerate(blocks) if j != i and b)
+            for j in range(i + 1, len(keys)):
+                if blocks[j] == blocks[i] and keys[j] != key:
+                    self.conflicts.add((key, keys[j]))
+
+    def display_name(self, key: str) -> str:
+        names = self.names.get(key)
+        if names:
+            return names.most_common(1)[0][0]
+        return key.split("/")[-1] if key.startswith("https://openalex.org/") else key
+
+    def candidate_pairs(self) -> List[Tuple[str, str]]:
+        blocks: Dict[str, List[str]] = {}
+        tokens = {k: name_tokens(self.display_name(k)) for k in self.papers}
+        for k in self.papers:
+            b = block_key(tokens[k])
+            if b:
+                blocks.setdefault(b, []).append(k)
+        pairs = []
+        for block, keys in blocks.items():
+            for i, a in enumerate(keys):
+                for b in keys[i + 1:]:
+                    if not compatible(tokens[a], tokens[b]):
+                        continue
+                    # the block itself is not evidence (two namesakes on one paper)
+                    shared = (self.coauthors[a] & self.coauthors[b]) - {block}
+                    if shared or self.institutions[a] & self.institutions[b]:
+                        pairs.append((a, b))
+        return pairs
+
+    def resolve(self, overrides: Optional[Dict[str, Any]] = None,
+                previous: Optional[Tuple[Dict[str, int], int]] = None) -> AuthorEntities:
+        overrides = overrides or {}
+        parent = {k: k for k in self.papers}
+
+        def find(k: str) -> str:
+            while parent[k] != k:
+                parent[k] = parent[parent[k]]
+                k = parent[k]
+            return k
+
+        # root -> keys that may not join its entity
+        forbidden: Dict[str, Set[str]] = {}
+        separate = [tuple(p[:2]) for p in overrides.get("separate_authors") or [] if len(p) >= 2]
+        for a, b in separate + sorted(self.conflicts):
+            if a in parent and b in parent:
+                forbidden.setdefault(a, set()).add(b)
+                forbidden.setdefault(b, set()).add(a)
+        members: Dict[str, List[str]] = {k: [k] for k in self.papers}
+
+        def union(a: str, b: str, force: bool = False) -> None:
+            ra, rb = find(a), find(b)
+            if ra == rb:
+                return
+            fa, fb = forbidden.get(ra, set()), forbidden.get(rb, set())
+            if not force and (fa.intersection(members[rb]) or fb.intersection(members[ra])):
+                return
+            parent[rb] = ra
+            members[ra].extend(members.pop(rb))
+            if fb:
+                forbidden[ra] = fa | fb
+
+        for pair in overrides.get("merge_authors") or []:
+            known = [k for k in pair if k in parent]
+            for k in known[1:]:
+                union(known[0], k, force=True)
+        for a, b in self.candidate_pairs():
+            union(a, b)
+
+        prev_ids, next_id = previous if previous is not None else ({}, 0)
+        entity_of: Dict[str, int] = {}
+        groups: Dict[int, List[str]] = {}
+        names: Dict[int, str] = {}
+        taken: Set[int] = set()
+        # entities in order of first appearance; ties keep that order
+        for key in self.papers:
+            if key in entity_of:
+                continue
+            keys = sorted(members[find(key)], key=lambda k: -self.papers[k])
+            reuse = sorted(prev_ids[k] for k in keys if k in prev_ids and prev_ids[k] not in taken)
+            if reuse:
+                eid = reuse[0]
+            else:
+                eid, next_id = next_id, next_id + 1
+            taken.add(eid)
+            for k in keys:
+                entity_of[k] = eid
+            groups[eid] = keys
+            name_counts: Counter = Counter()
+            for k in keys:
+                name_counts.update(self.names.get(k) or {})
+            names[eid] = preferred_name(name_counts) or self.display_name(keys[0])
+        return AuthorEntities(entity_of, groups, names, next_id)
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end benchmark of the pipeline on synthetic corpora.
+
+For every corpus size a deterministic, OpenAlex-shaped corpus is generated
+(Zipf-distributed abstract vocabulary stored as inverted indexes, author
+lists drawn from a shared pool, venues, concepts) and served by a local stub
+of the OpenAlex API. The scripts are copied into a temporary workspace and run
+there, so the repository's data is never touched:
+
+- fetch: fetch_data.py --full against the stub (works/s, requests, bytes),
+- stages: parse, tag, override, stats and serialize timed separately
+  (process_data's streaming pipeline with every stage materialized),
+- process_data: the real script, cold (--no-cache) and warm (caches filled),
+- commit_message: generate_commit_message.py against a git-committed snapshot.
+
+Every step reports wall time and peak RSS; output file sizes are recorded.
+Results are printed as a table and, with --out, written as JSON so runs can
+be compared across commits.
+
+    python scripts/bench_pipeline.py [--sizes 1000,10000,100000] [--workers 1] [--out bench.json]
+"""
+
+from __future__ import annotations
+import os, sys, json, time, random, shutil, fnmatch, platform, argparse, tempfile, threading, subprocess
+from bisect import bisect
+from itertools import accumulate
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import resource  # type: ignore
+except Exception:
+    resource = None  # optional (not available on Windows)
+
+from publish import SIZE_BUDGETS
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SIZES = "1000,10000,100000"
+OPENALEX = "https://openalex.org/"
+TARGET_DOI = "10.1145/3183713.3196909"
+
+DOMAIN_PHRASES = [
+    "learned index", "learned bloom filter", "b-tree", "lsm tree", "hash table", "bloom filter",
+    "count-min sketch", "string keys", "multidimensional", "spatial index", "time series",
+    "hilbert curve", "updatable", "range query", "nearest neighbor", "key-value store",
+    "cardinality estimation", "query optimization", "gpu", "compression", "benchmark",
+    "survey", "reinforcement learning", "disk-based", "in-memory", "distributed",
+]
+SYLLABLES = ["da", "ta", "in", "dex", "mo", "del", "ar", "ray", "lo", "ca", "ti", "on", "re",
+             "pre", "sen", "struc", "ture", "per", "for", "mance", "al", "go", "rithm", "ma", "chi", "ne"]
+VOCAB_SIZE = 4000
+VENUES = ["Proceedings of the VLDB Endowment", "arXiv (Cornell University)",
+          "Proceedings of the ACM on Management of Data", "IEEE International Conference on Data Engineering",
+          "IEEE Access", "The VLDB Journal", "ACM Computing Surveys", "Information Sciences"]
+CONCEPTS = ["Computer science", "Database", "Index (publishing)", "Machine learning", "Algorithm",
+            "Data structure", "Bloom filter", "Artificial intelligence", "Theoretical computer science"]
+GIVEN = ["Tim", "Alex", "Jialin", "Paolo", "Andreas", "Wei", "Yuki", "Maria", "Ryan", "Chen", "Sara", "Jens"]
+FAMILY = ["Kraska", "Ding", "Ferragina", "Kipf", "Marcus", "Zhang", "Sato", "Wang", "Li", "Neumann", "Idreos"]
+
+
+def zipf_cum_weights(n: int, s: float = 1.1) -> List[float]:
+    return list(accumulate(1.0 / (r + 1) ** s for r in range(n)))
+
+
+def vocabulary(rnd: random.Random) -> List[str]:
+    words = set()
+    while len(words) < VOCAB_SIZE:
+        words.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(1, 4))))
+    return sorted(words)
+
+
+def synth_corpus(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """`n` works in the OpenAlex API shape returned for the `select` used by fetch_data."""
+    rnd = random.Random(seed)
+    vocab = vocabulary(rnd)
+    vocab_cw = zipf_cum_weights(len(vocab))
+    pool = max(100, n // 2)
+    authors = [(f"{OPENALEX}A{5000000000 + i}", f"{rnd.choice(GIVEN)} {rnd.choice(FAMILY)}{i % 97 or ''}")
+               for i in range(pool)]
+    author_cw = zipf_cum_weights(pool, 0.9)
+    insts = [f"University {i}" for i in range(300)]
+    venue_cw = zipf_cum_weights(len(VENUES))
+    works = []
+    for i in range(n):
+        title = rnd.choices(vocab, cum_weights=vocab_cw, k=rnd.randint(5, 12))
+        title.insert(rnd.randrange(len(title)), rnd.choice(DOMAIN_PHRASES))
+        tokens = rnd.choices(vocab, cum_weights=vocab_cw, k=rnd.randint(100, 250))
+        for _ in range(rnd.randint(1, 5)):
+            tokens[rnd.randrange(len(tokens))] = rnd.choice(DOMAIN_PHRASES)
+        inv: Dict[str, List[int]] = {}
+        pos = 0
+        for t in tokens:
+            for word in t.split():
+                inv.setdefault(word, []).append(pos)
+                pos += 1
+        chosen = {bisect(author_cw, rnd.random() * author_cw[-1]) for _ in range(rnd.randint(1, 8))}
+        venue = VENUES[bisect(venue_cw, rnd.random() * venue_cw[-1])] if rnd.random() > 0.05 else None
+        year = rnd.randint(2018, 2026)
+        works.append({
+            "id": f"{OPENALEX}W{3000000000 + i}",
+            "display_name": " ".join(title).capitalize(),
+            "publication_year": year,
+            "doi": f"https://doi.org/10.5555/bench.{i}" if i % 4 else None,
+            "cited_by_count": int(rnd.paretovariate(1.2)) - 1,
+            "primary_location": {"source": {"display_name": venue} if venue else None,
+                                 "landing_page_url": f"https://example.org/w/{i}"},
+            "authorships": [
+                {"author": {"id": authors[a][0], "display_name": authors[a][1]},
+                 "institutions": [{"display_name": inst} for inst in rnd.sample(insts, rnd.randint(0, 2))]}
+                for a in sorted(chosen)
+            ],
+            "concepts": [{"display_name": c, "score": round(rnd.random(), 3)}
+                         for c in rnd.sample(CONCEPTS, rnd.randint(1, 4))],
+            "abstract_inverted_index": inv if rnd.random() > 0.1 else None,
+            "referenced_works": [f"{OPENALEX}W{3000000000 + j}" for j in rnd.sample(range(i), min(i, 5))],
+            "updated_date": f"{year}-06-01T00:00:00.000000",
+            "created_date": f"{year}-01-01",
+        })
+    return works
+
+
+class StubOpenAlex:
+    """Local HTTP server answering the queries fetch_data makes (DOI lookup, cursor paging, id batches)."""
+
+    def __init__(self, works: List[Dict[str, Any]]):
+        self.works = [json.dumps(w, ensure_ascii=False).encode("utf-8") for w in works]
+        self.index = {w["id"].rsplit("/", 1)[-1]: i for i, w in enumerate(works)}
+        self.requests = 0
+        self.bytes = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                body = stub.respond(self.path, self.headers.get("Host"))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def respond(self, path: str, host: Optional[str]) -> bytes:
+        q = {k: v[0] for k, v in parse_qs(urlsplit(path).query).items()}
+        filters = dict(f.split(":", 1) for f in q.get("filter", "").split(",") if ":" in f)
+        per_page = int(q.get("per-page", "25"))
+        if "doi" in filters:
+            target = {"id": f"{OPENALEX}W2785", "display_name": "The Case for Learned Index Structures",
+                      "cited_by_count": len(self.works), "cited_by_api_url": f"{self.url}/works?filter=cites:W2785"}
+            body = json.dumps({"meta": {"count": 1}, "results": [target]}).encode("utf-8")
+        elif "cites" in filters:
+            cursor = q.get("cursor", "*")
+            start = 0 if cursor == "*" else int(cursor)
+            end = min(len(self.works), start + per_page)
+            nxt = json.dumps(str(end) if end < len(self.works) else None).encode("utf-8")
+            body = (b'{"meta":{"count":%d,"next_cursor":%s},"results":[' % (len(self.works), nxt)
+                    + b",".join(self.works[start:end]) + b"]}")
+        else:
+            ids = (filters.get("openalex") or filters.get("ids.openalex") or "").split("|")
+            rows = [self.index[i] for i in ids if i in self.index]
+            body = b'{"meta":{"count":%d},"results":[' % len(rows) + b",".join(self.works[r] for r in rows) + b"]}"
+        self.requests += 1
+        self.bytes += len(body)
+        return body
+
+    def __enter__(self) -> "StubOpenAlex":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Runs a script and records its peak RSS at exit. ru_maxrss of a child also
+# counts the parent's memory at fork time, so the child reads its own VmHWM.
+RUN_AND_MEASURE = """
+import atexit, os, runpy, sys
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+from bench_pipeline import peak_rss_mb
+atexit.register(lambda: open(os.environ["BENCH_RSS_FILE"], "w").write(str(peak_rss_mb())))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MiB."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def run_script(ws: Path, args: List[str], env: Dict[str, str]) -> Dict[str, Any]:
+    """Run `python scripts/<args>` in the workspace; returns wall time and peak RSS of the child."""
+    rss_file = ws / "bench.rss"
+    with open(ws / "bench.log", "ab") as log:
+        log.write(f"$ {' '.join(args)}\n".encode("utf-8"))
+        log.flush()
+        t0 = time.perf_counter()
+        p = subprocess.run([sys.executable, "-c", RUN_AND_MEASURE, *args], cwd=ws,
+                           env=dict(env, BENCH_RSS_FILE=str(rss_file)), stdout=log, stderr=subprocess.STDOUT)
+        seconds = time.perf_counter() - t0
+    if p.returncode != 0:
+        tail = (ws / "bench.log").read_text(encoding="utf-8", errors="replace").splitlines()[-20:]
+        raise SystemExit(f"{' '.join(args)} failed (exit {p.returncode}):\n" + "\n".join(tail))
+    rss = float(rss_file.read_text()) if rss_file.exists() else None
+    return {"seconds": round(seconds, 3), "peak_rss_mb": rss}
+
+
+def make_workspace(base: Path) -> Path:
+    ws = base / "ws"
+    shutil.copytree(ROOT / "scripts", ws / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    (ws / "data").mkdir(parents=True)
+    for name in ("tag_rules.yml", "overrides.yml"):
+        if (ROOT / "data" / name).exists():
+            shutil.copy(ROOT / "data" / name, ws / "data" / name)
+    return ws
+
+
+def output_sizes(data_dir: Path) -> Dict[str, Dict[str, int]]:
+    """Bytes (and .gz bytes) of the published files, with directories summed, and files over budget."""
+    groups: Dict[str, Dict[str, int]] = {}
+    for p in sorted(data_dir.rglob("*")):
+        if not p.is_file() or p.suffix == ".br":
+            continue
+        rel = p.relative_to(data_dir)
+        over = any(fnmatch.fnmatch(rel.as_posix(), pat) and p.stat().st_size > limit
+                   for pat, limit in SIZE_BUDGETS.items())
+        gz = p.suffix == ".gz"
+        key = rel.parts[0] + "/" if len(rel.parts) > 1 else (rel.name[:-3] if gz else rel.name)
+        entry = groups.setdefault(key, {"bytes": 0, "gzip_bytes": 0, "over_budget": 0})
+        entry["gzip_bytes" if gz else "bytes"] += p.stat().st_size
+        entry["over_budget"] += over
+    return groups
+
+
+def run_stages(workers: int, out_path: Path) -> None:
+    """Child mode: time process_data's stages one after another over materialized lists."""
+    from tagging import get_engine
+    from rawstore import iter_raw_records
+    from process_data import iter_abstracts, iter_tagged, iter_overrides, load_overrides, split_stats
+    from projection import CitationProjector
+    from aggregate import StatsAccumulator
+    from authors import AuthorIndex
+    from search_index import SearchIndexBuilder
+    from facets import build_facets
+    from publish import write_json
+
+    stages: Dict[str, Dict[str, float]] = {}
+
+    def timed(name: str, fn: Any) -> Any:
+        t0 = time.perf_counter()
+        result = fn()
+        stages[name] = {"seconds": round(time.perf_counter() - t0, 3)}
+        stages[name]["peak_rss_mb"] = peak_rss_mb()
+        return result
+
+    engine = get_engine()
+    overrides = load_overrides()
+    items = timed("parse", lambda: list(iter_abstracts(iter_raw_records())))
+    items = timed("tag", lambda: list(iter_tagged(items, engine, None, workers)))
+    items = timed("override", lambda: list(iter_overrides(items, overrides)))
+
+    def aggregate() -> Any:
+        projector, search, authors = CitationProjector(), SearchIndexBuilder(), AuthorIndex()
+        acc = StatsAccumulator(engine.categories)
+        for w in items:
+            search.add(projector.add(w), w)
+            authors.add(w)
+            acc.add(w)
+        entities = authors.resolve(overrides)
+        return projector, search, entities, acc.resolve_authors(entities).finalize()
+
+    projector, search, entities, stats = timed("stats", aggregate)
+
+    def serialize() -> None:
+        out = out_path.parent / "stage-out"
+        payload = projector.payload({}, entities)
+        write_json(out / "citations.json", payload)
+        write_json(out / "facets.json", build_facets(payload))
+        summary, shards = split_stats(stats)
+        write_json(out / "stats.json", summary)
+        for i, shard in enumerate(shards):
+            write_json(out / "authors" / f"{i:03d}.json", shard)
+        manifest, search_shards = search.build()
+        write_json(out / "search.json", manifest)
+        for key, shard in search_shards.items():
+            write_json(out / "search" / f"{key}.json", shard)
+
+    timed("serialize", serialize)
+    out_path.write_text(json.dumps(stages), encoding="utf-8")
+
+
+def bench_size(n: int, seed: int, workers: int) -> Dict[str, Any]:
+    print(f"== {n} works", flush=True)
+    t0 = time.perf_counter()
+    works = synth_corpus(n, seed)
+    result: Dict[str, Any] = {"works": n, "generate_seconds": round(time.perf_counter() - t0, 3)}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp, StubOpenAlex(works) as stub:
+        del works
+        ws = make_workspace(Path(tmp))
+        env = dict(os.environ, OPENALEX_API_URL=stub.url, OPENALEX_RATE="1000000",
+                   TARGET_DOIS=TARGET_DOI, PYTHONHASHSEED="0")
+        for key in ("FETCH_GRAPH", "FETCH_ENRICH", "RAW_COMPRESS"):
+            env.pop(key, None)
+
+        fetch = run_script(ws, ["scripts/fetch_data.py", "--full", "--no-http-cache"], env)
+        fetch.update(requests=stub.requests, bytes=stub.bytes,
+                     works_per_second=round(n / fetch["seconds"], 1) if fetch["seconds"] else None)
+        result["fetch"] = fetch
+
+        stages_path = ws / "stages.json"
+        run_script(ws, ["scripts/bench_pipeline.py", "--stages-out", str(stages_path), "--workers", str(workers)], env)
+        result["stages"] = json.loads(stages_path.read_text(encoding="utf-8"))
+
+        cold = run_script(ws, ["scripts/process_data.py", "--no-cache", "--ignore-budgets", "--workers", str(workers)], env)
+        run_script(ws, ["scripts/process_data.py", "--ignore-budgets", "--workers", str(workers)], env)
+        warm = run_script(ws, ["scripts/process_data.py", "--ignore-budgets", "--workers", str(workers)], env)
+        result["process_data"] = {"cold": cold, "warm": warm}
+
+        git = ["git", "-c", "user.name=bench", "-c", "user.email=bench@example.invalid"]
+        subprocess.run(["git", "init", "-q"], cwd=ws, check=True)
+        subprocess.run(git + ["add", "docs/data"], cwd=ws, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "snapshot"], cwd=ws, check=True)
+        result["commit_message"] = run_script(ws, ["scripts/generate_commit_message.py"], env)
+        result["outputs"] = output_sizes(ws / "docs" / "data")
+    return result
+
+
+def print_table(runs: List[Dict[str, Any]]) -> None:
+    stage_names = ["parse", "tag", "override", "stats", "serialize"]
+    header = ["works", "fetch", "w/s"] + stage_names + ["cold", "warm", "commit", "rss MB", "cit.json KB"]
+    print(" ".join(f"{h:>9}" for h in header))
+    for r in runs:
+        row = [r["works"], r["fetch"]["seconds"], r["fetch"]["works_per_second"]]
+        row += [r["stages"][s]["seconds"] for s in stage_names]
+        row += [r["process_data"]["cold"]["seconds"], r["process_data"]["warm"]["seconds"],
+                r["commit_message"]["seconds"], r["process_data"]["cold"]["peak_rss_mb"],
+                round(r["outputs"].get("citations.json", {}).get("bytes", 0) / 1024)]
+        print(" ".join(f"{v:>9}" for v in row))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pipeline benchmark on synthetic corpora")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated corpus sizes")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=1, help="tagging processes")
+    ap.add_argument("--out", type=Path, default=None, help="write the results as JSON")
+    ap.add_argument("--stages-out", type=Path, default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.stages_out is not None:
+        run_stages(args.workers, args.stages_out)
+        return
+
+    runs = [bench_size(int(n), args.seed, args.workers) for n in args.sizes.split(",") if n.strip()]
+    report = {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "workers": args.workers,
+        "runs": runs,
+    }
+    print_table(runs)
+    if args.out is not None:
+        args.out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Saved results to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of parallel tagging: matches the raw corpus with 1, 2, 4, ... worker
+processes (up to the CPU count) and prints the time and speedup of each run.
+Every run is checked against the serial result.
+
+    python scripts/bench_tagging.py [--workers 1,2,4,8] [--repeat 3] [--chunk-size 256]
+"""
+
+from __future__ import annotations
+import os, time, argparse
+from typing import List
+
+from tagging import get_engine, text_blob, iter_match_chunks
+from rawstore import iter_raw_records
+
+
+def default_workers() -> List[int]:
+    cpus = os.cpu_count() or 1
+    out, n = [], 1
+    while n < cpus:
+        out.append(n)
+        n *= 2
+    return out + [cpus]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Tagging scaling benchmark")
+    ap.add_argument("--workers", default=None, help="comma-separated worker counts")
+    ap.add_argument("--repeat", type=int, default=3, help="runs per worker count (best is reported)")
+    ap.add_argument("--chunk-size", type=int, default=256)
+    args = ap.parse_args()
+    counts = [int(x) for x in args.workers.split(",")] if args.workers else default_workers()
+
+    engine = get_engine()
+    blobs = [text_blob(w) for w in iter_raw_records()]
+    if not blobs:
+        raise SystemExit("No raw records found")
+    chunks = [blobs[i:i + args.chunk_size] for i in range(0, len(blobs), args.chunk_size)]
+    print(f"{len(blobs)} works, {len(engine.rules)} rules, {len(chunks)} chunks of {args.chunk_size}")
+
+    baseline = None
+    base_time = None
+    print(f"{'workers':>7} {'seconds':>8} {'works/s':>9} {'speedup':>8}")
+    for n in counts:
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            result = list(iter_match_chunks(chunks, engine, n))
+            best = min(best, time.perf_counter() - t0)
+        if baseline is None:
+            baseline, base_time = result, best
+        elif result != baseline:
+            raise SystemExit(f"workers={n}: result differs from the first run")
+        print(f"{n:>7} {best:>8.2f} {len(blobs) / best:>9.0f} {base_time / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
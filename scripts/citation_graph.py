@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Citation graph of the corpus: which citing works cite each other.
+
+fetch_data (`--graph`) looks up the `referenced_works` of every citing work and
+keeps them in data/build/references.ndjson.gz, one line per work
+({"id", "stamp", "refs"}; the stamp is the work's `updated_date`, so only new
+or changed works are looked up again). Lookups are batched: one
+`ids.openalex:W1|W2|...` filter query resolves up to BATCH_IDS works.
+
+process_data restricts the references to works of the corpus and builds a
+CSR adjacency (row i -> the rows it cites), from which NumPy computes:
+
+- `cited_in_corpus`: how many works of the corpus cite the work,
+- `pagerank`: PageRank over the citation edges (a work cited by influential
+  works scores higher), scaled so that the corpus mean is PAGERANK_SCALE,
+- `cluster`: communities found by label propagation on the undirected graph,
+  numbered by size (-1 for works in communities smaller than MIN_CLUSTER).
+
+    data/graph.json  {"format": "graph-v1", "count": N, "edges": E, "pagerank_scale": 1000,
+                      "columns": {"cited_in_corpus": [...], "pagerank": [...], "cluster": [...]},
+                      "clusters": [{"size": n, "tags": [...]}, ...]}
+
+Rows are the rows of citations.json.
+"""
+
+from __future__ import annotations
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # optional
+
+from openalex_client import OpenAlexClient, OPENALEX_API_URL
+from rawstore import BUILD_DIR, NDJSONWriter, iter_ndjson
+
+REFERENCES_PATH = BUILD_DIR / "references.ndjson.gz"
+FORMAT = "graph-v1"
+OPENALEX_PREFIX = "https://openalex.org/"
+
+# Ids per `ids.openalex:` filter query (the OpenAlex limit for OR filters)
+BATCH_IDS = 50
+DAMPING = 0.85
+PAGERANK_TOL = 1e-10
+PAGERANK_MAX_ITER = 100
+PAGERANK_SCALE = 1000
+LABEL_ITER = 20
+MIN_CLUSTER = 3
+CLUSTER_TAGS = 3
+
+
+def load_references(path: Path = REFERENCES_PATH) -> Dict[str, Tuple[Optional[str], List[str]]]:
+    """work id -> (stamp, referenced work ids) from the previous run."""
+    if not path.exists():
+        return {}
+    return {r["id"]: (r.get("stamp"), r.get("refs") or []) for r in iter_ndjson(path)}
+
+
+def save_references(refs: Dict[str, Tuple[Optional[str], List[str]]], path: Path = REFERENCES_PATH) -> None:
+    with NDJSONWriter(path) as out:
+        for wid in sorted(refs):
+            stamp, ids = refs[wid]
+            out.write({"id": wid, "stamp": stamp, "refs": ids})
+
+
+def short_ids(ids: Iterable[str]) -> List[str]:
+    return [i[len(OPENALEX_PREFIX):] if i.startswith(OPENALEX_PREFIX) else i for i in ids]
+
+
+def fetch_references(client: OpenAlexClient, works: Iterable[Tuple[str, Optional[str]]],
+                     previous: Dict[str, Tuple[Optional[str], List[str]]],
+                     params: Optional[Dict[str, Any]] = None
+                     ) -> Tuple[Dict[str, Tuple[Optional[str], List[str]]], int, int]:
+    """Referenced works of `works` ((id, stamp) pairs); returns (refs by id, works looked up, requests).
+
+    Entries of `previous` with an unchanged stamp are reused; the others are
+    resolved BATCH_IDS at a time. Works OpenAlex no longer returns are kept
+    with no references so they are not looked up again until they change.
+    """
+    refs: Dict[str, Tuple[Optional[str], List[str]]] = {}
+    todo: List[Tuple[str, Optional[str]]] = []
+    for wid, stamp in works:
+        if not wid or wid in refs:
+            continue
+        old = previous.get(wid)
+        if old is not None and old[0] == stamp:
+            refs[wid] = old
+        else:
+            refs[wid] = (stamp, [])
+            todo.append((wid, stamp))
+
+    url = f"{OPENALEX_API_URL}/works"
+    requests_made = 0
+    for i in range(0, len(todo), BATCH_IDS):
+        batch = todo[i:i + BATCH_IDS]
+        query = dict(params or {})
+        query.update({
+            "filter": "ids.openalex:" + "|".join(short_ids(wid for wid, _ in batch)),
+            "select": "id,referenced_works",
+            "per-page": BATCH_IDS,
+        })
+        results = client.get_json(url, params=query, timeout=60).get("results", [])
+        requests_made += 1
+        found = {w.get("id"): w.get("referenced_works") or [] for w in results}
+        for wid, stamp in batch:
+            refs[wid] = (stamp, found.get(wid, []))
+    return refs, len(todo), requests_made
+
+
+class CitationGraph:
+    """Directed citation edges between rows in CSR form: row i cites indices[indptr[i]:indptr[i+1]]."""
+
+    def __init__(self, indptr: "np.ndarray", indices: "np.ndarray"):
+        self.indptr = indptr
+        self.indices = indices
+        self.n = len(indptr) - 1
+
+    @classmethod
+    def from_references(cls, ids: List[str], refs: Dict[str, Tuple[Optional[str], List[str]]]) -> "CitationGraph":
+        """Graph over `ids` (row order) keeping only references to other rows."""
+        row_of = {wid: i for i, wid in enumerate(ids)}
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        targets: List[int] = []
+        for i, wid in enumerate(ids):
+            cited = {row_of[r] for r in (refs.get(wid) or (None, []))[1] if r in row_of}
+            cited.discard(i)
+            targets.extend(sorted(cited))
+            indptr[i + 1] = len(targets)
+        return cls(indptr, np.asarray(targets, dtype=np.int32))
+
+    @property
+    def edges(self) -> int:
+        return int(len(self.indices))
+
+    def sources(self) -> "np.ndarray":
+        return np.repeat(np.arange(self.n, dtype=np.int32), np.diff(self.indptr))
+
+    def in_degree(self) -> "np.ndarray":
+        return np.bincount(self.indices, minlength=self.n)
+
+    def pagerank(self, damping: float = DAMPING) -> "np.ndarray":
+        """Power iteration; the rank of works citing nothing in the corpus is spread uniformly."""
+        n = self.n
+        if n == 0:
+            return np.zeros(0)
+        out = np.diff(self.indptr)
+        src = self.sources()
+        dangling = out == 0
+        inv_out = np.where(dangling, 0.0, 1.0 / np.maximum(out, 1))
+        pr = np.full(n, 1.0 / n)
+        for _ in range(PAGERANK_MAX_ITER):
+            flow = np.bincount(self.indices, weights=(pr * inv_out)[src], minlength=n)
+            new = (1 - damping) / n + damping * (flow + pr[dangling].sum() / n)
+            done = np.abs(new - pr).sum() < PAGERANK_TOL
+            pr = new
+            if done:
+                break
+        return pr
+
+    def clusters(self) -> "np.ndarray":
+        """Label propagation on the undirected graph; labels are renumbered by community size.
+
+        Every row adopts the most frequent label among itself and its
+        neighbours (smallest label on ties), all rows at once, until nothing
+        changes or LABEL_ITER rounds have run.
+        """
+        n = self.n
+        src, dst = self.sources(), self.indices
+        rows = np.arange(n, dtype=np.int64)
+        a = np.concatenate([src, dst, rows]).astype(np.int64)
+        b = np.concatenate([dst, src, rows]).astype(np.int64)
+        labels = rows.copy()
+        for _ in range(LABEL_ITER):
+            keys, counts = np.unique(a * n + labels[b], return_counts=True)
+            node, label = keys // n, keys % n
+            order = np.lexsort((label, -counts, node))
+            node, label = node[order], label[order]
+            first = np.ones(len(node), dtype=bool)
+            first[1:] = node[1:] != node[:-1]
+            new = labels.copy()
+            new[node[first]] = label[first]
+            if np.array_equal(new, labels):
+                break
+            labels = new
+        uniq, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        # largest community first, ties by label
+        order = np.lexsort((uniq, -sizes))
+        rank = np.empty(len(uniq), dtype=np.int64)
+        rank[order] = np.arange(len(uniq))
+        out = rank[inverse]
+        out[sizes[inverse] < MIN_CLUSTER] = -1
+        return out
+
+
+def graph_payload(graph: CitationGraph, row_tags: Optional[List[List[str]]] = None) -> Dict[str, Any]:
+    """The published graph.json; `row_tags` (tags per row) label each cluster with its top tags."""
+    cluster = graph.clusters()
+    k = int(cluster.max()) + 1 if graph.n else 0
+    sizes = np.bincount(cluster[cluster >= 0], minlength=k) if k else []
+    tag_counts = [Counter() for _ in range(k)]
+    if row_tags is not None:
+        for c, tags in zip(cluster.tolist(), row_tags):
+            if c >= 0:
+                tag_counts[c].update(tags)
+    return {
+        "format": FORMAT,
+        "count": graph.n,
+        "edges": graph.edges,
+        "pagerank_scale": PAGERANK_SCALE,
+        "columns": {
+            "cited_in_corpus": graph.in_degree().tolist(),
+            "pagerank": np.rint(graph.pagerank() * graph.n * PAGERANK_SCALE).astype(np.int64).tolist(),
+            "cluster": cluster.tolist(),
+        },
+        "clusters": [
+            {"size": int(sizes[c]),
+             "tags": [t for t, _ in sorted(tag_counts[c].items(), key=lambda x: (-x[1], x[0]))[:CLUSTER_TAGS]]}
+            for c in range(k)
+        ],
+    }
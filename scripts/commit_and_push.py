@@ -3,12 +3,15 @@
 """
 データをコミットしてプッシュするスクリプト。
 生成されたコミットメッセージを使用して自動的にコミットとプッシュを行います。
+run_report.json はこのスクリプトの前にコミット対象となるため、所要時間は表示のみです。
 """
 
 import subprocess
 import sys
 from pathlib import Path
 
+from metrics import metrics
+
 ROOT = Path(__file__).resolve().parents[1]
 
 def run_git_command(command: list, check: bool = True) -> subprocess.CompletedProcess:
@@ -64,6 +67,7 @@ def show_commit_message() -> None:
         print("コミットメッセージファイルが見つかりません。")
 
 def main() -> None:
+    metrics.begin("commit_and_push")
     print("データのコミットとプッシュを開始します...")
     
     # Gitの状態をチェック
@@ -76,14 +80,19 @@ def main() -> None:
     
     try:
         # 変更をステージング
-        stage_changes()
+        with metrics.stage("stage"):
+            stage_changes()
         
         # コミット
-        commit_changes()
+        with metrics.stage("commit"):
+            commit_changes()
         
         # プッシュ
-        push_changes()
+        with metrics.stage("push"):
+            push_changes()
         
+        metrics.finish(path=None)
+        print(f"所要時間: {metrics.summary()}")
         print("\n✅ データの更新が完了しました！")
         
     except Exception as e:
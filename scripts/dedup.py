@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate works: the arXiv preprint and the published version of a paper
+(or the same work indexed twice) are merged into one record.
+
+`DuplicateIndex` observes every raw record once and keeps only its shingles:
+character 4-grams of the normalized title and the family names of its
+authors. Candidates are found with MinHash + locality-sensitive hashing
+instead of comparing all pairs:
+
+- every work gets a NUM_PERM-value MinHash signature (computed with NumPy for
+  CHUNK works at a time),
+- signatures are cut into BANDS bands; works sharing a band fall into the
+  same bucket and become candidate pairs (near-linear in the corpus size),
+- pairs whose signatures agree on less than MIN_ESTIMATE of their values
+  (the MinHash estimate of their Jaccard similarity) are dropped in one
+  vectorized step,
+- a candidate pair is kept when the titles' 4-gram Jaccard similarity is at
+  least TITLE_SIMILARITY, the author family names overlap by at least
+  AUTHOR_SIMILARITY (or one side has no authors) and the years are at most
+  MAX_YEAR_GAP apart.
+
+Clusters of kept pairs with at most one published (non-preprint) work are
+merged automatically. Clusters with several published works (e.g. a
+conference paper and its journal version) are only reported, because those
+are usually distinct publications. overrides.yml decides:
+
+- `merge_works` groups are always merged. A group counts as one published
+  work, so an automatic match that adds another published work to it is
+  reported for review (the group itself is still merged),
+- `separate_works` pairs are never put in the same cluster.
+
+The canonical record of a cluster is its published work (else the one with a
+known venue, then the most cited one). It keeps its own fields, lists the
+other ids under `merged`, and takes the highest `cited_by_count` and all
+`cites` of the cluster. Without NumPy no duplicates are detected, but
+`merge_works` still applies.
+"""
+
+from __future__ import annotations
+import re, zlib, unicodedata
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # optional
+
+from authors import name_tokens
+
+NUM_PERM = 64
+BANDS = 16
+# Works per vectorized signature batch
+CHUNK = 2048
+# Buckets larger than this (e.g. generic titles) produce no candidates
+MAX_BUCKET = 50
+# Signature agreement a candidate pair needs before it is verified exactly
+MIN_ESTIMATE = 0.5
+TITLE_SIMILARITY = 0.7
+AUTHOR_SIMILARITY = 0.5
+MAX_YEAR_GAP = 3
+SEED = 20180610
+
+MERSENNE = (1 << 61) - 1
+PREPRINT_RE = re.compile(r"arxiv|biorxiv|medrxiv|ssrn|research\s*square|techrxiv|preprints?\b", re.IGNORECASE)
+PREPRINT_DOI = ("10.48550/", "10.2139/ssrn", "10.1101/", "10.21203/rs.")
+WORD_RE = re.compile(r"[a-z0-9]+")
+MARKS_RE = re.compile("[\u0300-\u036f]")
+
+
+def normalize_title(title: Optional[str]) -> str:
+    s = MARKS_RE.sub("", unicodedata.normalize("NFKD", title or "")).lower()
+    return " ".join(WORD_RE.findall(s))
+
+
+def title_grams(title: str, n: int = 4) -> Set[str]:
+    if len(title) <= n:
+        return {title} if title else set()
+    return {title[i:i + n] for i in range(len(title) - n + 1)}
+
+
+def author_names(w: Dict[str, Any]) -> Set[str]:
+    """Family names of the authors (the last name token)."""
+    out = set()
+    for a in w.get("authorships") or []:
+        tokens = name_tokens(a.get("name"))
+        if tokens:
+            out.add(tokens[-1])
+    return out
+
+
+def is_preprint(w: Dict[str, Any]) -> bool:
+    doi = (w.get("doi") or "").lower().replace("https://doi.org/", "")
+    return (bool(PREPRINT_RE.search(w.get("host_venue") or ""))
+            or doi.startswith(PREPRINT_DOI)
+            or "arxiv.org" in (w.get("landing_page_url") or ""))
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class WorkInfo:
+    __slots__ = ("id", "grams", "authors", "year", "preprint", "venue", "cited_by_count", "cites")
+
+    def __init__(self, w: Dict[str, Any]):
+        self.id = w.get("id")
+        self.grams = title_grams(normalize_title(w.get("title")))
+        self.authors = author_names(w)
+        self.year = w.get("publication_year")
+        self.preprint = is_preprint(w)
+        self.venue = bool(w.get("host_venue")) and w.get("host_venue") != "Unknown"
+        self.cited_by_count = int(w.get("cited_by_count") or 0)
+        self.cites = list(w.get("cites") or [])
+
+    def rank(self) -> Tuple:
+        """Sort key of the canonical record: published, known venue, most cited, then id."""
+        return (self.preprint, not self.venue, -self.cited_by_count, self.id or "")
+
+
+def similar(a: WorkInfo, b: WorkInfo) -> bool:
+    if a.year and b.year and abs(a.year - b.year) > MAX_YEAR_GAP:
+        return False
+    if jaccard(a.grams, b.grams) < TITLE_SIMILARITY:
+        return False
+    return not a.authors or not b.authors or jaccard(a.authors, b.authors) >= AUTHOR_SIMILARITY
+
+
+class MinHasher:
+    """NUM_PERM universal hash functions h(x) = (a*x + b) mod 2^61-1 applied to 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.default_rng(seed)
+        # a, b < 2^31 and x < 2^32 keep a*x + b below 2^63
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signatures(self, shingles: List[List[int]]) -> "np.ndarray":
+        """(len(shingles), num_perm) signatures; works without shingles get all-max rows."""
+        out = np.full((len(shingles), self.num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for start in range(0, len(shingles), CHUNK):
+            part = shingles[start:start + CHUNK]
+            sizes = np.fromiter((len(s) for s in part), dtype=np.int64, count=len(part))
+            rows = np.flatnonzero(sizes)
+            if not len(rows):
+                continue
+            x = np.fromiter((h for s in part for h in s), dtype=np.uint64, count=int(sizes.sum()))
+            hashed = (self.a[:, None] * x[None, :] + self.b[:, None]) % np.uint64(MERSENNE)
+            offsets = np.concatenate([[0], np.cumsum(sizes[rows])[:-1]])
+            out[start + rows] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        return out
+
+
+def lsh_pairs(sigs: "np.ndarray", bands: int = BANDS) -> Set[Tuple[int, int]]:
+    """Row pairs that agree on all values of at least one band."""
+    n, k = sigs.shape
+    width = k // bands
+    pairs: Set[Tuple[int, int]] = set()
+    empty = (sigs == np.iinfo(np.uint64).max).all(axis=1)
+    for band in range(bands):
+        block = np.ascontiguousarray(sigs[:, band * width:(band + 1) * width])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * width))).ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        ends = np.append(starts[1:], n)
+        for s, e in zip(starts.tolist(), ends.tolist()):
+            if 1 < e - s <= MAX_BUCKET:
+                rows = sorted(order[s:e].tolist())
+                if empty[rows[0]]:
+                    continue
+                for i, a in enumerate(rows):
+                    for b in rows[i + 1:]:
+                        pairs.add((a, b))
+    return pairs
+
+
+class Duplicates:
+    """Resolved clusters: duplicate id -> canonical id, and the merged fields of each canonical record."""
+
+    def __init__(self, canonical_of: Dict[str, str], members: Dict[str, List[str]],
+                 cited_by_count: Dict[str, int], cites: Dict[str, List[str]],
+                 candidates: List[List[str]]):
+        self.canonical_of = canonical_of
+        self.members = members
+        self.cited_by_count = cited_by_count
+        self.cites = cites
+        # detected clusters with several published works, left unmerged
+        self.candidates = candidates
+
+    def __len__(self) -> int:
+        return len(self.canonical_of)
+
+
+class DuplicateIndex:
+    """Collects the shingles of every work in one pass; `resolve()` finds and merges clusters."""
+
+    def __init__(self) -> None:
+        self.works: List[WorkInfo] = []
+
+    def add(self, w: Dict[str, Any]) -> None:
+        if w.get("id"):
+            self.works.append(WorkInfo(w))
+
+    def add_all(self, items: Iterable[Dict[str, Any]]) -> "DuplicateIndex":
+        for w in items:
+            self.add(w)
+        return self
+
+    def shingles(self, info: WorkInfo) -> List[int]:
+        return [zlib.crc32(s.encode("utf-8")) for s in
+                [f"t:{g}" for g in info.grams] + [f"a:{a}" for a in info.authors]]
+
+    def candidate_pairs(self) -> List[Tuple[int, int]]:
+        if np is None or len(self.works) < 2:
+            return []
+        sigs = MinHasher().signatures([self.shingles(w) for w in self.works])
+        pairs = np.array(sorted(lsh_pairs(sigs)), dtype=np.int64).reshape(-1, 2)
+        keep = np.zeros(len(pairs), dtype=bool)
+        for start in range(0, len(pairs), CHUNK * 64):
+            a, b = pairs[start:start + CHUNK * 64].T
+            keep[start:start + len(a)] = (sigs[a] == sigs[b]).mean(axis=1) >= MIN_ESTIMATE
+        works = self.works
+        return [(a, b) for a, b in pairs[keep].tolist() if similar(works[a], works[b])]
+
+    def resolve(self, overrides: Optional[Dict[str, Any]] = None) -> Duplicates:
+        overrides = overrides or {}
+        works = self.works
+        row_of = {w.id: i for i, w in enumerate(works)}
+        parent = list(range(len(works)))
+        members: Dict[int, List[int]] = {i: [i] for i in range(len(works))}
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        forbidden: Dict[int, Set[int]] = {}
+        for pair in overrides.get("separate_works") or []:
+            rows = [row_of[k] for k in pair[:2] if k in row_of]
+            if len(rows) == 2:
+                forbidden.setdefault(rows[0], set()).add(rows[1])
+                forbidden.setdefault(rows[1], set()).add(rows[0])
+        def union(a: int, b: int, force: bool = False) -> None:
+            ra, rb = find(a), find(b)
+            if ra == rb:
+                return
+            fa, fb = forbidden.get(ra, set()), forbidden.get(rb, set())
+            if not force and (fa.intersection(members[rb]) or fb.intersection(members[ra])):
+                return
+            parent[rb] = ra
+            members[ra].extend(members.pop(rb))
+            if fb:
+                forbidden[ra] = fa | fb
+
+        for group in overrides.get("merge_works") or []:
+            rows = [row_of[k] for k in group if k in row_of]
+            for r in rows[1:]:
+                union(rows[0], r, force=True)
+        # merge_works group of each row, fixed before automatic matches move the roots
+        group_of = {r: find(r) for rows in members.values() if len(rows) > 1 for r in rows}
+        for a, b in self.candidate_pairs():
+            union(a, b)
+
+        canonical_of: Dict[str, str] = {}
+        merged: Dict[str, List[str]] = {}
+        cited_by: Dict[str, int] = {}
+        cites: Dict[str, List[str]] = {}
+        candidates: List[List[str]] = []
+        for rows in members.values():
+            if len(rows) < 2:
+                continue
+            # published works, a merge_works group counting as one
+            published = {group_of.get(r, -1 - r) for r in rows if not works[r].preprint}
+            parts = [rows]
+            if len(published) > 1:
+                candidates.append([w.id for w in sorted((works[r] for r in rows), key=WorkInfo.rank)])
+                groups: Dict[int, List[int]] = {}
+                for r in rows:
+                    if r in group_of:
+                        groups.setdefault(group_of[r], []).append(r)
+                parts = list(groups.values())
+            for part in parts:
+                cluster = sorted((works[r] for r in part), key=WorkInfo.rank)
+                head = cluster[0]
+                merged[head.id] = sorted(w.id for w in cluster[1:])
+                for w in cluster[1:]:
+                    canonical_of[w.id] = head.id
+                cited_by[head.id] = max(w.cited_by_count for w in cluster)
+                cites[head.id] = sorted({c for w in cluster for c in w.cites})
+        return Duplicates(canonical_of, merged, cited_by, cites, sorted(candidates))
+
+
+def iter_dedup(items: Iterable[Dict[str, Any]], dups: Duplicates) -> Iterator[Dict[str, Any]]:
+    """Drop merged duplicates and fold their ids, citation count and targets into the canonical record."""
+    for w in items:
+        wid = w.get("id")
+        if wid in dups.canonical_of:
+            continue
+        if wid in dups.members:
+            w["merged"] = dups.members[wid]
+            w["cited_by_count"] = dups.cited_by_count[wid]
+            if dups.cites[wid]:
+                w["cites"] = dups.cites[wid]
+        yield w
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batched OpenAlex lookups for enrichment and override checks.
+
+Raw records sometimes lack fields that OpenAlex has elsewhere: works whose
+primary location has no source (venue "Unknown") often list the venue under
+another location, and authorships without institutions can fall back to the
+author's last known institutions. fetch_data (`--enrich`) collects every id
+that needs a lookup and resolves them with `EnrichmentClient`:
+
+- ids are resolved BATCH_IDS at a time with one OR-filter query
+  (`filter=openalex:W1|W2|...`) and `select` limited to the needed fields,
+  instead of one request per id,
+- results are kept in data/build/openalex_entities.json.gz and reused for
+  ENRICH_TTL_DAYS (ids OpenAlex does not return are remembered too), so a
+  repeated run only looks up new or stale ids.
+
+Enriched records list the filled-in fields under `enriched`. Filled-in
+institutions are the author's current ones, not necessarily those at the time
+of the paper, so such authorships are marked `institutions_enriched` and
+their years are not counted in the authors' institution history. Ids referenced in
+overrides.yml that are not part of the corpus are looked up the same way and
+reported, so typos and merged ids are noticed.
+"""
+
+from __future__ import annotations
+import os, json, time
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+from openalex_client import OpenAlexClient, OPENALEX_API_URL
+from rawstore import BUILD_DIR, open_text, write_json_atomic
+
+ENTITY_CACHE_PATH = BUILD_DIR / "openalex_entities.json.gz"
+# Days a looked-up entity is reused before it is fetched again
+ENRICH_TTL_DAYS = float(os.getenv("ENRICH_TTL_DAYS", "30"))
+# Ids per OR-filter query (the OpenAlex limit)
+BATCH_IDS = 50
+OPENALEX_PREFIX = "https://openalex.org/"
+
+WORK_FIELDS = ("id", "display_name", "locations")
+AUTHOR_FIELDS = ("id", "display_name", "last_known_institutions")
+
+
+def short_id(oid: str) -> str:
+    return oid[len(OPENALEX_PREFIX):] if oid.startswith(OPENALEX_PREFIX) else oid
+
+
+def full_id(oid: str) -> str:
+    return oid if oid.startswith("http") else OPENALEX_PREFIX + oid
+
+
+class EntityCache:
+    """Looked-up OpenAlex entities by "<entity>?<select>" and id, with the time they were fetched."""
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, List[Any]]]] = None,
+                 ttl_days: float = ENRICH_TTL_DAYS, now: Optional[float] = None):
+        self.entries = entries or {}
+        self.ttl = ttl_days * 86400
+        self.now = time.time() if now is None else now
+        self.evicted = self.evict()
+
+    def evict(self) -> int:
+        """Drop entries older than the TTL; returns how many were dropped."""
+        dropped = 0
+        for key, table in self.entries.items():
+            stale = [oid for oid, (fetched, _) in table.items() if self.now - fetched > self.ttl]
+            for oid in stale:
+                del table[oid]
+            dropped += len(stale)
+        return dropped
+
+    def get(self, key: str, oid: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(cached, record); a cached None means OpenAlex did not return the id."""
+        hit = self.entries.get(key, {}).get(oid)
+        return (True, hit[1]) if hit is not None else (False, None)
+
+    def put(self, key: str, oid: str, record: Optional[Dict[str, Any]]) -> None:
+        self.entries.setdefault(key, {})[oid] = [self.now, record]
+
+    @classmethod
+    def load(cls, path: Path = ENTITY_CACHE_PATH, ttl_days: float = ENRICH_TTL_DAYS) -> "EntityCache":
+        entries = {}
+        if path.exists():
+            try:
+                with open_text(path) as f:
+                    entries = json.load(f)
+            except (OSError, ValueError):
+                entries = {}
+        return cls(entries, ttl_days)
+
+    def save(self, path: Path = ENTITY_CACHE_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(path, self.entries, separators=(",", ":"))
+
+
+class EnrichmentClient:
+    """Resolves OpenAlex ids in batched OR-filter queries through an `EntityCache`."""
+
+    def __init__(self, client: OpenAlexClient, cache: EntityCache, params: Optional[Dict[str, Any]] = None):
+        self.client = client
+        self.cache = cache
+        self.params = params or {}
+        self.requests = 0
+        self.fetched = 0
+        self.cached = 0
+
+    def lookup(self, entity: str, ids: Iterable[str], select: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Full id -> record (None if OpenAlex has no such id) for `ids` of `entity` ("works", "authors")."""
+        fields = ",".join(select)
+        key = f"{entity}?{fields}"
+        out: Dict[str, Optional[Dict[str, Any]]] = {}
+        todo: List[str] = []
+        for oid in dict.fromkeys(full_id(i) for i in ids if i):
+            cached, record = self.cache.get(key, oid)
+            if cached:
+                out[oid] = record
+                self.cached += 1
+            else:
+                todo.append(oid)
+        url = f"{OPENALEX_API_URL}/{entity}"
+        for i in range(0, len(todo), BATCH_IDS):
+            batch = todo[i:i + BATCH_IDS]
+            params = dict(self.params)
+            params.update({
+                "filter": "openalex:" + "|".join(short_id(oid) for oid in batch),
+                "select": fields,
+                "per-page": BATCH_IDS,
+            })
+            results = self.client.get_json(url, params=params, timeout=60).get("results", [])
+            self.requests += 1
+            found = {r.get("id"): r for r in results}
+            for oid in batch:
+                record = found.get(oid)
+                self.cache.put(key, oid, record)
+                out[oid] = record
+            self.fetched += len(batch)
+        return out
+
+    def summary(self) -> Tuple[int, int, int]:
+        """(ids fetched, requests made, ids served from the cache)."""
+        return self.fetched, self.requests, self.cached
+
+
+def override_ids(overrides: Dict[str, Any]) -> Set[str]:
+    """Work ids referenced by overrides.yml."""
+    ids: Set[str] = set()
+    for section in ("add_tags", "remove_tags"):
+        ids.update((overrides.get(section) or {}).keys())
+    ids.update(overrides.get("hide") or [])
+    return {full_id(i) for i in ids if isinstance(i, str)}
+
+
+def needs_venue(it: Dict[str, Any]) -> bool:
+    return not it.get("host_venue") or it.get("host_venue") == "Unknown"
+
+
+def location_venue(work: Optional[Dict[str, Any]]) -> Optional[str]:
+    for loc in (work or {}).get("locations") or []:
+        name = ((loc or {}).get("source") or {}).get("display_name")
+        if name:
+            return name
+    return None
+
+
+def author_institutions(author: Optional[Dict[str, Any]]) -> List[str]:
+    insts = (author or {}).get("last_known_institutions") or []
+    return [i.get("display_name") for i in insts if i and i.get("display_name")]
+
+
+def collect_needs(records: Iterable[Dict[str, Any]]) -> Tuple[Set[str], Set[str], Set[str]]:
+    """(work ids without a venue, author ids without institutions, all work ids)."""
+    works: Set[str] = set()
+    authors: Set[str] = set()
+    seen: Set[str] = set()
+    for it in records:
+        wid = it.get("id")
+        if wid:
+            seen.add(wid)
+            if needs_venue(it):
+                works.add(wid)
+        for a in it.get("authorships") or []:
+            if a.get("author_id") and not a.get("institutions"):
+                authors.add(a["author_id"])
+    return works, authors, seen
+
+
+def enrich_record(it: Dict[str, Any], works: Dict[str, Optional[Dict[str, Any]]],
+                  authors: Dict[str, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    enriched = set(it.get("enriched") or [])
+    if needs_venue(it):
+        venue = location_venue(works.get(it.get("id") or ""))
+        if venue:
+            it["host_venue"] = venue
+            enriched.add("host_venue")
+    for a in it.get("authorships") or []:
+        if a.get("author_id") and not a.get("institutions"):
+            insts = author_institutions(authors.get(a["author_id"]))
+            if insts:
+                a["institutions"] = insts
+                a["institutions_enriched"] = True
+                enriched.add("institutions")
+    if enriched:
+        it["enriched"] = sorted(enriched)
+    return it
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Inverted facet indexes published as facets.json.
+
+For every tag, author, venue and year the row numbers (positions in
+citations.json) of the works carrying it are stored as sorted integer lists,
+delta-encoded (first value, then gaps) to keep the file small. The lists are
+aligned with the dictionaries of citations.json: `tag[i]` is the posting list
+of `dicts.tags[i]`, and likewise for authors and venues.
+
+    {"format": "postings-v1", "count": N,
+     "tag": [[...]], "author": [[...]], "venue": [[...]], "year": {"2019": [...]}}
+"""
+
+from __future__ import annotations
+from typing import Dict, Any, List
+
+FORMAT = "postings-v1"
+
+
+def delta_encode(sorted_ids: List[int]) -> List[int]:
+    out: List[int] = []
+    prev = 0
+    for i in sorted_ids:
+        out.append(i - prev)
+        prev = i
+    return out
+
+
+def build_facets(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Posting lists for a columnar citations payload (see projection.py)."""
+    dicts, cols = payload["dicts"], payload["columns"]
+    tag: List[List[int]] = [[] for _ in dicts["tags"]]
+    author: List[List[int]] = [[] for _ in dicts["authors"]]
+    venue: List[List[int]] = [[] for _ in dicts["venues"]]
+    year: Dict[str, List[int]] = {}
+    # Rows are visited in order, so every posting list comes out sorted.
+    for row in range(payload["count"]):
+        for t in cols["tags"][row]:
+            tag[t].append(row)
+        for a in set(cols["authors"][row]):
+            author[a].append(row)
+        venue[cols["venue"][row]].append(row)
+        y = cols["year"][row]
+        if y:
+            year.setdefault(str(y), []).append(row)
+    return {
+        "format": FORMAT,
+        "count": payload["count"],
+        "tag": [delta_encode(p) for p in tag],
+        "author": [delta_encode(p) for p in author],
+        "venue": [delta_encode(p) for p in venue],
+        "year": {y: delta_encode(p) for y, p in sorted(year.items())},
+    }
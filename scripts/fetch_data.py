@@ -1,20 +1,63 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Fetch all works that cite "The Case for Learned Index Structures" using OpenAlex.
+Fetch all works that cite "The Case for Learned Index Structures" (and any other
+configured target papers) using OpenAlex.
 This script only handles data fetching and saves raw data to JSON files.
 
 - Source work is looked up by DOI, then we follow `cited_by_api_url` with cursor paging.
+- Several target DOIs are fetched concurrently over one pooled session under a
+  single global rate limit; works citing several targets are stored once with
+  the list of targets they cite (`cites`).
+- Records are streamed to newline-delimited JSON as pages arrive
+  (raw_citations.ndjson, or .ndjson.gz with `--gzip`), so memory use does not
+  grow with the number of citing works.
 - No API key is required for OpenAlex; we include a `mailto` parameter if provided.
+- By default only works updated since the last run are fetched (the max
+  `updated_date` seen is kept as a watermark) and merged into the existing
+  raw records by work id. Use `--full` to re-download everything.
+- Incremental runs only add and update works: works deleted or merged in
+  OpenAlex, or that no longer cite a target, are only dropped by a full
+  refresh. A run therefore becomes a full refresh by itself when the last one
+  is more than FULL_REFRESH_DAYS days old (default 7; 0 disables), so the
+  nightly job re-downloads everything about once a week.
+- With `--graph`, the `referenced_works` of every citing work are looked up in
+  batched `ids.openalex:` queries for the citation graph (see citation_graph.py).
+- With `--enrich`, missing venues and author institutions are filled in and the
+  ids used in overrides.yml are checked, with batched, cached lookups (see enrich.py).
+- Each target's crawl is checkpointed after every page (cursor, records so far,
+  watermark); a crawl that failed part-way resumes from its last cursor on
+  the next run, and finished targets are not fetched again until the raw
+  file has been written. The nightly workflow saves the part files and
+  checkpoints even when the job fails, and RESUME_MAX_AGE_HOURS (default 36)
+  is longer than its daily schedule, so a failed CI crawl resumes the next
+  day (a cursor OpenAlex no longer accepts restarts that crawl).
+- Responses are kept in an on-disk HTTP cache (data/build/http_cache.sqlite,
+  see http_cache.py) and revalidated with ETag / Last-Modified; `--offline`
+  replays a previous run from the cache without any network access.
+- Stage times and request / retry / byte counters go to docs/data/run_report.json
+  (see metrics.py); `--profile` adds a cProfile or tracemalloc profile.
 """
 
 from __future__ import annotations
-import os, time, json
+import os, json, time, calendar, argparse
 from pathlib import Path
-from typing import Dict, Any, Iterable, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit, parse_qsl
 
 import requests
 
+from openalex_client import OpenAlexClient, OPENALEX_API_URL
+from http_cache import HTTPCache, CachingAdapter, HTTP_CACHE_MAX_AGE
+from citation_graph import fetch_references, load_references, save_references
+from enrich import (AUTHOR_FIELDS, WORK_FIELDS, EnrichmentClient, EntityCache, collect_needs,
+                    enrich_record, override_ids)
+from process_data import load_overrides
+from metrics import metrics, PROFILE_MODES, PIPELINE_PROFILE
+from rawstore import (BUILD_DIR, AppendWriter, NDJSONWriter, finalize_raw, iter_ndjson, iter_raw_records,
+                      load_raw_meta, raw_records_path, raw_writer, save_raw_meta, write_json_atomic)
+
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / "docs"
 DATA_DIR = DOCS / "data"
@@ -23,14 +66,38 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 # ===== Configuration =====
 # DOI of "The Case for Learned Index Structures" (SIGMOD'18)
 TARGET_DOI = os.getenv("TARGET_DOI", "10.1145/3183713.3196909")
+# Comma-separated list of target DOIs; the first one is the primary target
+TARGET_DOIS = [d.strip() for d in os.getenv("TARGET_DOIS", TARGET_DOI).split(",") if d.strip()]
+# Max number of targets fetched concurrently (all share one rate limit)
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "4"))
 # Your email for OpenAlex usage statistics (optional, no emails sent)
 OPENALEX_MAILTO = os.getenv("OPENALEX_MAILTO", os.getenv("OPENALEX_EMAIL", ""))
 USER_AGENT = os.getenv("USER_AGENT", "learned-index-citations/1.0 (mailto:your-email@example.com)")
+# API key (optional); the `from_updated_date` filter used by incremental runs requires one
+OPENALEX_API_KEY = os.getenv("OPENALEX_API_KEY", "")
+
+# Write raw records gzip-compressed (raw_citations.ndjson.gz)
+RAW_COMPRESS = os.getenv("RAW_COMPRESS", "") not in ("", "0", "false")
+# Also fetch the references of citing works for the citation graph
+FETCH_GRAPH = os.getenv("FETCH_GRAPH", "") not in ("", "0", "false")
+# Fill in missing venues / institutions with batched lookups
+FETCH_ENRICH = os.getenv("FETCH_ENRICH", "") not in ("", "0", "false")
+# Days after which a run re-downloads everything instead of fetching incrementally
+FULL_REFRESH_DAYS = float(os.getenv("FULL_REFRESH_DAYS", "7"))
+# Checkpoints of interrupted crawls older than this are discarded (cursors
+# expire); longer than the interval of the nightly job, so CI runs resume too
+RESUME_MAX_AGE_HOURS = float(os.getenv("RESUME_MAX_AGE_HOURS", "36"))
 
 # ===== Helpers =====
 
-def _session() -> requests.Session:
+def _session(pool_size: int = 10, cache: Optional[HTTPCache] = None) -> requests.Session:
     s = requests.Session()
+    if cache is not None:
+        adapter = CachingAdapter(cache, pool_connections=pool_size, pool_maxsize=pool_size)
+    else:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     s.headers.update({
         "User-Agent": USER_AGENT,
         "Accept": "application/json",
@@ -39,140 +106,436 @@ def _session() -> requests.Session:
     return s
 
 
-def get_work_by_doi(sess: requests.Session, doi: str) -> Dict[str, Any]:
+def auth_params() -> Dict[str, Any]:
+    params: Dict[str, Any] = {}
+    if OPENALEX_MAILTO:
+        params["mailto"] = OPENALEX_MAILTO
+    if OPENALEX_API_KEY:
+        params["api_key"] = OPENALEX_API_KEY
+    return params
+
+
+def get_work_by_doi(client: OpenAlexClient, doi: str) -> Dict[str, Any]:
     # Search for work by DOI using the search endpoint
-    url = "https://api.openalex.org/works"
-    params = {
-        "filter": f"doi:{doi}",
-        "mailto": OPENALEX_MAILTO
-    } if OPENALEX_MAILTO else {"filter": f"doi:{doi}"}
-    
-    max_retries = 3
-    for attempt in range(max_retries):
-        try:
-            r = sess.get(url, params=params, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-            results = data.get("results", [])
-            if results:
-                return results[0]  # Return the first (and should be only) result
-            else:
-                raise ValueError(f"No work found for DOI: {doi}")
-        except requests.exceptions.HTTPError as e:
-            print(f"HTTP Error {e.response.status_code}: {e.response.text[:200]}")
-            if e.response.status_code == 403 and attempt < max_retries - 1:
-                print(f"Rate limited (403), retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
-                continue
-            else:
-                raise
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                print(f"Request failed, retrying in {2 ** attempt} seconds...")
-                time.sleep(2 ** attempt)
-                continue
-            else:
-                raise
+    url = f"{OPENALEX_API_URL}/works"
+    params = {"filter": f"doi:{doi}", **auth_params()}
 
+    results = client.get_json(url, params=params, timeout=30).get("results", [])
+    if results:
+        return results[0]  # Return the first (and should be only) result
+    raise ValueError(f"No work found for DOI: {doi}")
 
-def iter_citations(sess: requests.Session, cited_by_api_url: str) -> Iterable[Dict[str, Any]]:
-    """Iterate all citing works using OpenAlex cursor paging."""
-    base = cited_by_api_url
-    cursor = "*"
-    per_page = 50  # reduced from 200 to avoid rate limiting
-    params = {"per-page": per_page, "cursor": cursor}
-    if OPENALEX_MAILTO:
-        params["mailto"] = OPENALEX_MAILTO
+
+def iter_citation_pages(client: OpenAlexClient, cited_by_api_url: str, extra_filter: Optional[str] = None,
+                        cursor: str = "*") -> Iterable[tuple[List[Dict[str, Any]], Optional[str]]]:
+    """Iterate pages of citing works as (works, next cursor) using OpenAlex cursor paging.
+
+    `extra_filter` (e.g. "from_updated_date:2024-01-01") is ANDed with the
+    `cites:` filter already present in `cited_by_api_url`; `cursor` resumes an
+    earlier crawl. Pacing and retries are handled by the client.
+    """
+    parts = urlsplit(cited_by_api_url)
+    base = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    params: Dict[str, Any] = dict(parse_qsl(parts.query))
+    if extra_filter:
+        params["filter"] = ",".join(f for f in (params.get("filter"), extra_filter) if f)
+    params.update({"per-page": client.per_page, "cursor": cursor, **auth_params()})
     # Reduce payload size via select - using valid field names
     params["select"] = ",".join([
         "id","display_name","publication_year","doi","cited_by_count",
-        "primary_location","authorships","concepts","abstract_inverted_index"
+        "primary_location","authorships","concepts","abstract_inverted_index",
+        "updated_date","created_date"
     ])
 
-    total = 0
-    max_retries = 3
     while True:
-        for attempt in range(max_retries):
-            try:
-                r = sess.get(base, params=params, timeout=60)
-                r.raise_for_status()
-                break
-            except requests.exceptions.HTTPError as e:
-                print(f"HTTP Error {e.response.status_code}: {e.response.text[:200]}")
-                if e.response.status_code == 403 and attempt < max_retries - 1:
-                    print(f"Rate limited (403), retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise
-            except requests.exceptions.RequestException as e:
-                if attempt < max_retries - 1:
-                    print(f"Request failed, retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
-                    continue
-                else:
-                    raise
-        
-        data = r.json()
+        data = client.get_json(base, params=params, timeout=60)
         results = data.get("results", [])
-        for w in results:
-            yield w
-        total += len(results)
         cursor = data.get("meta", {}).get("next_cursor")
+        if not results:
+            cursor = None
+        yield results, cursor
         if not cursor:
             break
         params["cursor"] = cursor
-        # polite delay - OpenAlex recommends at least 1 second between requests
-        time.sleep(2.0)
 
 
-def main() -> None:
-    print("Fetching data from OpenAlex...")
-    
-    sess = _session()
-    work = get_work_by_doi(sess, TARGET_DOI)
+def iter_citations(client: OpenAlexClient, cited_by_api_url: str, extra_filter: Optional[str] = None) -> Iterable[Dict[str, Any]]:
+    """Iterate all citing works (see `iter_citation_pages`)."""
+    for results, _ in iter_citation_pages(client, cited_by_api_url, extra_filter):
+        yield from results
+
+
+def to_item(w: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten an OpenAlex work into the raw_citations.json record format."""
+    return {
+        "id": w.get("id"),
+        "title": w.get("display_name"),
+        "publication_year": w.get("publication_year"),
+        "doi": w.get("doi"),
+        "cited_by_count": w.get("cited_by_count"),
+        "host_venue": (w.get("primary_location") or {}).get("source",{}).get("display_name") if w.get("primary_location") and w.get("primary_location").get("source") else "Unknown",
+        "landing_page_url": (w.get("primary_location") or {}).get("landing_page_url"),
+        "abstract_inverted_index": w.get("abstract_inverted_index"),
+        "concepts": w.get("concepts"),
+        "authorships": [
+            {
+                "author_id": (a.get("author") or {}).get("id"),
+                "name": (a.get("author") or {}).get("display_name"),
+                "institutions": [ (inst or {}).get("display_name") for inst in (a.get("institutions") or []) ],
+            }
+            for a in (w.get("authorships") or [])
+        ],
+        "updated_date": w.get("updated_date"),
+        "created_date": w.get("created_date"),
+    }
+
+
+class Watermark:
+    """Running max of `updated_date` / `created_date` over streamed records."""
+
+    def __init__(self, start: Optional[Dict[str, Optional[str]]] = None):
+        self.mark: Dict[str, Optional[str]] = {"updated_date": None, "created_date": None}
+        if start:
+            self.update(start)
+
+    def update(self, it: Dict[str, Any]) -> None:
+        for key, cur in self.mark.items():
+            v = it.get(key)
+            if v and (cur is None or v > cur):
+                self.mark[key] = v
+
+
+def merge_streams(sources: List[Callable[[], Iterable[Dict[str, Any]]]], targets: Set[str],
+                  primary: Optional[str], writer: NDJSONWriter) -> tuple[int, int]:
+    """Merge record streams by work id into `writer`. Returns (added, updated).
+
+    `sources[0]` is the previous raw file, the rest are freshly fetched parts;
+    later sources win. Two passes keep only ids and `cites` sets in memory:
+    the first collects the latest source and the unioned `cites` of every id,
+    the second streams each record once from its latest source.
+    """
+    cites: Dict[str, Set[str]] = {}
+    latest: Dict[str, int] = {}
+    previous_ids: Set[str] = set()
+    for si, src in enumerate(sources):
+        for it in src():
+            wid = it.get("id")
+            # Records written before multi-target support cite the primary target only.
+            c = it.get("cites") or ([primary] if si == 0 and primary else [])
+            cites.setdefault(wid, set()).update(t for t in c if t in targets)
+            latest[wid] = si
+            if si == 0:
+                previous_ids.add(wid)
+
+    added = updated = 0
+    for si, src in enumerate(sources):
+        for it in src():
+            wid = it.get("id")
+            if latest.get(wid) != si or not cites.get(wid):
+                continue
+            del latest[wid]  # write each id once
+            it["cites"] = sorted(cites[wid])
+            writer.write(it)
+            if si:
+                if wid in previous_ids:
+                    updated += 1
+                else:
+                    added += 1
+    return added, updated
+
+
+class FetchCheckpoint:
+    """Progress of one target's crawl, saved atomically after every page.
+
+    Holds the next cursor (None once the crawl is complete), the number of
+    records and the byte offset of the part file, and the watermark so far.
+    A saved state is only resumed by a crawl with the same target, URL and
+    filter, and only within RESUME_MAX_AGE_HOURS.
+    """
+
+    def __init__(self, path: Path, key: Dict[str, Any]):
+        self.path = path
+        self.key = key
+        self.state: Dict[str, Any] = {"cursor": "*", "count": 0, "offset": 0, "watermark": None}
+        self.resumed = False
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+            except (OSError, ValueError):
+                saved = {}
+            fresh = time.time() - float(saved.get("saved_at") or 0) < RESUME_MAX_AGE_HOURS * 3600
+            if saved.get("key") == key and fresh:
+                self.state.update(saved.get("state") or {})
+                self.resumed = True
+
+    def save(self, cursor: Optional[str], count: int, offset: int, watermark: Dict[str, Optional[str]]) -> None:
+        self.state = {"cursor": cursor, "count": count, "offset": offset, "watermark": watermark}
+        write_json_atomic(self.path, {"key": self.key, "state": self.state, "saved_at": time.time()})
+
+    def reset(self) -> None:
+        self.state = {"cursor": "*", "count": 0, "offset": 0, "watermark": None}
+        self.resumed = False
+
+
+def part_paths(index: int) -> tuple[Path, Path]:
+    """(part file, checkpoint) of the target at `index`."""
+    return BUILD_DIR / f"fetch-part-{index}.ndjson", BUILD_DIR / f"fetch-part-{index}.checkpoint.json"
+
+
+def previous_watermarks(previous: Dict[str, Any]) -> Dict[str, Dict[str, Optional[str]]]:
+    """Per-target watermarks of the previous run (older files kept a single one)."""
+    fetch = previous.get("fetch") or {}
+    marks = dict(fetch.get("watermarks") or {})
+    doi = (previous.get("work") or {}).get("doi")
+    if not marks and doi and fetch.get("watermark"):
+        marks[doi] = fetch["watermark"]
+    return marks
+
+
+class QueryRejected(requests.exceptions.HTTPError):
+    """The first page of a new crawl was refused (400/403): the query itself is not accepted."""
+
+
+def http_status(e: requests.exceptions.HTTPError) -> Optional[int]:
+    return e.response.status_code if e.response is not None else None
+
+
+def fetch_target(client: OpenAlexClient, index: int, doi: str, since: Optional[str]) -> Dict[str, Any]:
+    """Stream the citing works of one target into a part file, incrementally when `since` is given."""
+    work = get_work_by_doi(client, doi)
     cited_by_url = work.get("cited_by_api_url")
     if not cited_by_url:
-        raise SystemExit("cited_by_api_url not found in the work object.")
-
-    items: List[Dict[str,Any]] = []
-    for w in iter_citations(sess, cited_by_url):
-        item = {
-            "id": w.get("id"),
-            "title": w.get("display_name"),
-            "publication_year": w.get("publication_year"),
-            "doi": w.get("doi"),
-            "cited_by_count": w.get("cited_by_count"),
-            "host_venue": (w.get("primary_location") or {}).get("source",{}).get("display_name") if w.get("primary_location") and w.get("primary_location").get("source") else "Unknown",
-            "landing_page_url": (w.get("primary_location") or {}).get("landing_page_url"),
-            "abstract_inverted_index": w.get("abstract_inverted_index"),
-            "concepts": w.get("concepts"),
-            "authorships": [
-                {
-                    "author_id": (a.get("author") or {}).get("id"),
-                    "name": (a.get("author") or {}).get("display_name"),
-                    "institutions": [ (inst or {}).get("display_name") for inst in (a.get("institutions") or []) ],
-                }
-                for a in (w.get("authorships") or [])
-            ],
-        }
-        items.append(item)
+        raise SystemExit(f"cited_by_api_url not found in the work object for {doi}.")
+
+    def stream(extra_filter: Optional[str]) -> tuple[Path, int, Dict[str, Optional[str]]]:
+        part_path, ckpt_path = part_paths(index)
+        ckpt = FetchCheckpoint(ckpt_path, {"doi": doi, "url": cited_by_url, "filter": extra_filter})
+        if ckpt.resumed and (not part_path.exists() or part_path.stat().st_size < ckpt.state["offset"]):
+            ckpt.reset()
+        while True:
+            state = ckpt.state
+            mark = Watermark(state["watermark"])
+            count = state["count"]
+            if ckpt.resumed:
+                if state["cursor"] is None:
+                    print(f"[{doi}] Reusing {count} citing works from an earlier interrupted run")
+                    return part_path, count, mark.mark
+                print(f"[{doi}] Resuming after {count} citing works")
+            fetched_pages = 0
+            try:
+                with AppendWriter(part_path, state["offset"]) as part:
+                    if not ckpt.resumed:
+                        ckpt.save("*", 0, 0, mark.mark)
+                    for results, cursor in iter_citation_pages(client, cited_by_url, extra_filter, state["cursor"]):
+                        for w in results:
+                            it = to_item(w)
+                            it["cites"] = [work.get("id")]
+                            mark.update(it)
+                            part.write(it)
+                        count += len(results)
+                        fetched_pages += 1
+                        ckpt.save(cursor, count, part.sync(), mark.mark)
+                return part_path, count, mark.mark
+            except requests.exceptions.HTTPError as e:
+                # anything else (429/5xx the client gave up on, ...) keeps the
+                # checkpoint, so the next run resumes from the last page
+                if fetched_pages:
+                    raise
+                status = http_status(e)
+                if not ckpt.resumed:
+                    if status in (400, 403):
+                        raise QueryRejected(*e.args, response=e.response) from e
+                    raise
+                if status != 400:
+                    raise
+                # OpenAlex answers 400 to an invalid or expired cursor: start this crawl over
+                print(f"[{doi}] Saved cursor rejected, restarting the crawl")
+                ckpt.reset()
+
+    mode = "full"
+    if since:
+        # Incremental: only works updated on/after the watermark day. Newly
+        # created works always have updated_date >= created_date, so this
+        # covers both new and changed citations.
+        try:
+            path, count, mark = stream(f"from_updated_date:{since[:10]}")
+            mode = "incremental"
+        except QueryRejected as e:
+            print(f"[{doi}] Incremental query rejected ({http_status(e)}), falling back to a full refresh")
+    if mode == "full":
+        path, count, mark = stream(None)
+    print(f"[{doi}] {count} citing works ({mode})")
+    return {
+        "doi": doi,
+        "mode": mode,
+        "part": path,
+        "watermark": mark,
+        "work": {
+            "doi": doi,
+            "openalex_id": work.get("id"),
+            "display_name": work.get("display_name"),
+            "cited_by_count": work.get("cited_by_count"),
+        },
+    }
+
+
+def enrich_raw(client: OpenAlexClient) -> None:
+    """Fill in missing venues and institutions of the raw records and check override ids."""
+    path = raw_records_path()
+    if path is None:
+        return
+    works, authors, seen = collect_needs(iter_ndjson(path))
+    unknown = override_ids(load_overrides()) - seen
+    cache = EntityCache.load()
+    enricher = EnrichmentClient(client, cache, auth_params())
+    venues = enricher.lookup("works", sorted(works | unknown), WORK_FIELDS)
+    institutions = enricher.lookup("authors", sorted(authors), AUTHOR_FIELDS)
+    for wid in sorted(unknown):
+        found = venues.get(wid)
+        print(f"overrides.yml: {wid} is not a citing work"
+              + (f" ({found.get('display_name')})" if found else " and was not found in OpenAlex"))
+
+    counts = {"host_venue": 0, "institutions": 0}
+    with NDJSONWriter(path) as out:
+        for it in iter_ndjson(path):
+            before = set(it.get("enriched") or [])
+            it = enrich_record(it, venues, institutions)
+            for field in set(it.get("enriched") or []) - before:
+                counts[field] += 1
+            out.write(it)
+    cache.save()
+    fetched, requests_made, cached = enricher.summary()
+    print(f"Enrichment: venues of {counts['host_venue']} works and institutions in {counts['institutions']} works filled in; "
+          f"{fetched} ids looked up in {requests_made} requests, {cached} from cache "
+          f"({cache.evicted} expired entries dropped)")
+
+
+def full_refresh_due(meta: Dict[str, Any], now: Optional[float] = None) -> bool:
+    """Whether the last full refresh (`fetch.full_at` of the raw metadata) is older than FULL_REFRESH_DAYS."""
+    if FULL_REFRESH_DAYS <= 0 or not meta:
+        return False
+    full_at = (meta.get("fetch") or {}).get("full_at")
+    if not full_at:
+        return True
+    try:
+        then = calendar.timegm(time.strptime(full_at, "%Y-%m-%dT%H:%M:%SZ"))
+    except ValueError:
+        return True
+    return (time.time() if now is None else now) - then > FULL_REFRESH_DAYS * 86400
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Fetch works citing the target papers from OpenAlex.")
+    ap.add_argument("--full", action="store_true",
+                    help="re-download every citing work instead of only those updated since the last run")
+    ap.add_argument("--doi", action="append", dest="dois", metavar="DOI",
+                    help="target DOI (repeatable; defaults to TARGET_DOIS / TARGET_DOI)")
+    ap.add_argument("--workers", type=int, default=FETCH_WORKERS,
+                    help="number of targets fetched concurrently")
+    ap.add_argument("--gzip", action="store_true",
+                    help="write raw_citations.ndjson.gz instead of raw_citations.ndjson")
+    ap.add_argument("--graph", action="store_true", default=FETCH_GRAPH,
+                    help="also fetch the referenced works of citing works (citation graph)")
+    ap.add_argument("--enrich", action="store_true", default=FETCH_ENRICH,
+                    help="fill in missing venues / institutions with batched, cached lookups")
+    ap.add_argument("--offline", action="store_true",
+                    help="replay responses from the HTTP cache only (no network; use with --full "
+                         "to replay a recorded full run)")
+    ap.add_argument("--no-http-cache", action="store_true",
+                    help="do not read or write the on-disk HTTP response cache")
+    ap.add_argument("--cache-max-age", type=float, default=HTTP_CACHE_MAX_AGE, metavar="SECONDS",
+                    help="serve cached responses younger than this without revalidating (default: 0)")
+    ap.add_argument("--profile", choices=PROFILE_MODES, default=PIPELINE_PROFILE,
+                    help="profile the run with cProfile or tracemalloc (summary in docs/data/run_report.json)")
+    args = ap.parse_args(argv)
+    if args.offline and args.no_http_cache:
+        ap.error("--offline needs the HTTP cache")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    metrics.begin("fetch_data", profile=args.profile)
+    dois = list(dict.fromkeys(args.dois or TARGET_DOIS))
+    print(f"Fetching data from OpenAlex for {len(dois)} target(s)...")
+
+    workers = max(1, min(args.workers, len(dois)))
+    http_cache = None if args.no_http_cache else HTTPCache(max_age=args.cache_max_age, offline=args.offline)
+    client = OpenAlexClient(_session(pool_size=workers, cache=http_cache))
+
+    meta = load_raw_meta()
+    if not args.full and not args.offline and full_refresh_due(meta):
+        print(f"Last full refresh is older than {FULL_REFRESH_DAYS:g} days, re-downloading every citing work")
+        args.full = True
+    previous = {} if args.full else meta
+    marks = previous_watermarks(previous)
+    with ThreadPoolExecutor(max_workers=workers) as pool, metrics.stage("fetch"):
+        fetched = list(pool.map(
+            lambda a: fetch_target(client, a[0], a[1], (marks.get(a[1]) or {}).get("updated_date")),
+            enumerate(dois)))
+
+    # The previous records are only carried over when some target was fetched incrementally.
+    sources: List[Callable[[], Iterable[Dict[str, Any]]]] = [iter_raw_records]
+    if not any(f["mode"] == "incremental" for f in fetched):
+        sources = [lambda: iter(())]
+    sources += [lambda p=f["part"]: iter_ndjson(p) for f in fetched]
+
+    watermarks: Dict[str, Dict[str, Optional[str]]] = {}
+    for f in fetched:
+        mark = Watermark(marks.get(f["doi"]) if f["mode"] == "incremental" else None)
+        mark.update(f["watermark"])
+        watermarks[f["doi"]] = mark.mark
 
     # Save raw data
-    raw_data_path = DATA_DIR / "raw_citations.json"
-    with open(raw_data_path, "w", encoding="utf-8") as f:
-        json.dump({
-            "work": {
-                "doi": TARGET_DOI,
-                "openalex_id": work.get("id"),
-                "display_name": work.get("display_name"),
-                "cited_by_count": work.get("cited_by_count"),
-            }, 
-            "results": items
-        }, f, ensure_ascii=False, indent=2)
-
-    print(f"Fetched {len(items)} papers")
-    print(f"Saved raw data to {raw_data_path}")
+    targets = {f["work"]["openalex_id"] for f in fetched}
+    with raw_writer(compress=args.gzip or RAW_COMPRESS) as out, metrics.stage("merge"):
+        added, updated = merge_streams(sources, targets, (previous.get("work") or {}).get("openalex_id"), out)
+    finalize_raw(out.path)
+    for i in range(len(fetched)):
+        for p in part_paths(i):
+            if p.exists():
+                p.unlink()
+    fetched_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    # only a run that re-downloaded every target drops the works that are gone
+    full = all(f["mode"] == "full" for f in fetched)
+    save_raw_meta({
+        "work": fetched[0]["work"],
+        "targets": [f["work"] for f in fetched],
+        "fetch": {
+            "mode": "incremental" if all(f["mode"] == "incremental" for f in fetched) else "full",
+            "fetched_at": fetched_at,
+            "full_at": fetched_at if full else (meta.get("fetch") or {}).get("full_at"),
+            "watermarks": watermarks,
+            "count": out.count,
+        },
+    })
+
+    print(f"Fetched {out.count} papers citing {len(fetched)} target(s) ({added} new, {updated} updated)")
+    print(f"Saved raw data to {out.path}")
+
+    metrics.count("works", out.count)
+    metrics.count("works.new", added)
+    metrics.count("works.updated", updated)
+
+    if args.enrich:
+        with metrics.stage("enrich"):
+            enrich_raw(client)
+
+    if args.graph:
+        with metrics.stage("references"):
+            works = ((it.get("id"), it.get("updated_date")) for it in iter_raw_records())
+            refs, looked_up, requests_made = fetch_references(client, works, load_references(), auth_params())
+            save_references(refs)
+        print(f"References: {looked_up} works looked up in {requests_made} requests, "
+              f"{len(refs) - looked_up} reused")
+
+    if http_cache is not None:
+        print("HTTP cache: {} served from cache, {} revalidated, {} fetched".format(*http_cache.summary()))
+        metrics.set("http_cache", dict(zip(("hits", "revalidated", "stored"), http_cache.summary())))
+        http_cache.close()
+    metrics.finish()
+    print(f"Stage times: {metrics.summary()}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
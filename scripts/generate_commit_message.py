@@ -2,78 +2,57 @@
 # -*- coding: utf-8 -*-
 """
 Generate commit message based on newly added papers.
-This script compares current data with previous data and generates a commit message
-that includes the count and titles of newly added papers.
+This script reads the changelog written by process_data (the difference between
+the id manifests of this and the previous run, see manifest.py) and generates a
+commit message that includes the count and titles of newly added papers, plus
+counts of removed, changed and re-counted papers.
+Its stage times are added to docs/data/run_report.json (see metrics.py).
 """
 
-import json
-import subprocess
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from manifest import load_changelog
+from metrics import metrics
+
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / "docs"
 DATA_DIR = DOCS / "data"
 
-def load_current_data() -> List[Dict[str, Any]]:
-    """現在のデータを読み込む"""
-    citations_path = DATA_DIR / "citations.json"
-    if not citations_path.exists():
-        return []
-    
-    with open(citations_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    
-    return data.get("results", [])
-
-def load_previous_data() -> List[Dict[str, Any]]:
-    """前回のデータを読み込む（Gitの前回のコミットから）"""
-    try:
-        result = subprocess.run(
-            ["git", "show", "HEAD:docs/data/citations.json"],
-            capture_output=True,
-            text=True,
-            cwd=ROOT
-        )
-        
-        if result.returncode == 0:
-            data = json.loads(result.stdout)
-            return data.get("results", [])
-        else:
-            return []
-    except Exception:
-        return []
-
-def get_new_papers(current: List[Dict[str, Any]], previous: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """新しく追加された論文を特定する"""
-    if not previous:
-        return current
-    
-    previous_ids = {paper.get("id") for paper in previous if paper.get("id")}
-    new_papers = []
-    
-    for paper in current:
-        if paper.get("id") and paper.get("id") not in previous_ids:
-            new_papers.append(paper)
-    
-    return new_papers
+def change_summary(changelog: Optional[Dict[str, Any]]) -> str:
+    """追加以外の変更（削除・内容更新・被引用数）の要約"""
+    if not changelog:
+        return ""
+    lines = []
+    if changelog["removed"]:
+        lines.append(f"削除: {len(changelog['removed'])}件")
+    if changelog["changed"]:
+        lines.append(f"内容更新: {len(changelog['changed'])}件")
+    if changelog["cited_by"]:
+        delta = sum(c["to"] - c["from"] for c in changelog["cited_by"])
+        lines.append(f"被引用数の変化: {len(changelog['cited_by'])}件（合計 {delta:+d}）")
+    return "\n".join(lines)
 
-def generate_commit_message(new_papers: List[Dict[str, Any]]) -> str:
+def generate_commit_message(new_papers: List[Dict[str, Any]], changelog: Optional[Dict[str, Any]] = None) -> str:
     """コミットメッセージを生成する"""
+    summary = change_summary(changelog)
     if not new_papers:
-        return "データ更新: 新しく追加された論文なし"
+        message = "データ更新: 新しく追加された論文なし"
+        return message + (f"\n\n{summary}\n" if summary else "")
     
     count = len(new_papers)
     current_date = datetime.now().strftime("%Y-%m-%d")
     
     message = f"データ更新 ({current_date}): {count}件の新論文を追加\n\n"
+    if summary:
+        message += summary + "\n\n"
     message += "新しく追加された論文:\n"
     
     for i, paper in enumerate(new_papers, 1):
-        title = paper.get("title") or paper.get("display_name") or "タイトルなし"
-        year = paper.get("publication_year") or "年不明"
-        url = paper.get("url") or paper.get("doi") or ""
+        title = paper.get("title") or "タイトルなし"
+        year = paper.get("year") or "年不明"
+        url = paper.get("url") or ""
         
         message += f"{i}. {title} ({year})\n"
         if url:
@@ -89,11 +68,16 @@ def save_commit_message(message: str) -> None:
         f.write(message)
 
 def main() -> None:
-    current_data = load_current_data()
-    previous_data = load_previous_data()
-    new_papers = get_new_papers(current_data, previous_data)
-    commit_message = generate_commit_message(new_papers)
+    metrics.begin("generate_commit_message")
+    with metrics.stage("load_changelog"):
+        changelog = load_changelog()
+    if changelog is None:
+        print("changelog.json が見つかりません。先に process_data.py を実行してください。")
+    new_papers = changelog["added"] if changelog else []
+    commit_message = generate_commit_message(new_papers, changelog)
     save_commit_message(commit_message)
+    metrics.count("works.new", len(new_papers))
+    metrics.finish()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
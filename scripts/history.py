@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Append-only history of the daily `cited_by_count` of every work.
+
+Each process_data run appends one row (the day of the run) to a columnar store
+under data/history/:
+
+- works.npy: the numeric part of every work id ever seen (W123 -> 123). A
+  work's position in this array is its stable column index, so rows of
+  different days line up without storing ids again.
+- YYYY-MM.npz: the rows of one month, compressed. `days` holds the days
+  (days since 1970-01-01) and `counts` the citation counts, one column per
+  work (-1 where the work was not in the corpus that day). The first row is
+  stored as is and every later row as the difference to the row before,
+  which is mostly zeros and compresses well. Columns of works first seen
+  after a chunk was written are implicitly -1.
+
+Rerunning on the same day replaces that day's row. Only the current month's
+chunk is rewritten.
+
+From the last TREND_DAYS days process_data publishes data/trends.json (rows
+are the rows of citations.json), so trend charts and "fastest rising" lists
+are read from one precomputed file instead of a walk over the git history:
+
+    {"format": "trends-v1", "count": N, "days": ["2024-01-01", ...], "window": 30,
+     "columns": {"growth": [...]},                  # citations gained in the window
+     "tags": {"names": [...], "series": [[...], ...]},  # citations of each tag per day
+     "rising": [{"row": i, "growth": g, "series": [...]}, ...]}
+
+The full series of any work can be printed with
+`python scripts/history.py W123 W456`.
+"""
+
+from __future__ import annotations
+import os, sys, time, datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # optional
+
+from manifest import work_number
+from rawstore import tmp_path
+
+ROOT = Path(__file__).resolve().parents[1]
+HISTORY_DIR = ROOT / "data" / "history"
+FORMAT = "trends-v1"
+# Days covered by trends.json
+TREND_DAYS = int(os.getenv("TREND_DAYS", "90"))
+# Growth of a work is measured over this many days
+RISING_WINDOW = 30
+# Works listed under "rising"
+RISING_TOP = 20
+
+MISSING = -1
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def today() -> int:
+    return int(time.time() // 86400)
+
+
+def day_str(day: int) -> str:
+    return (EPOCH + datetime.timedelta(days=int(day))).isoformat()
+
+
+def chunk_name(day: int) -> str:
+    d = EPOCH + datetime.timedelta(days=int(day))
+    return f"{d.year:04d}-{d.month:02d}.npz"
+
+
+def _pad(counts: "np.ndarray", n: int) -> "np.ndarray":
+    """`counts` (days x works) widened to `n` works with MISSING."""
+    if counts.shape[1] >= n:
+        return counts
+    out = np.full((counts.shape[0], n), MISSING, dtype=np.int32)
+    out[:, :counts.shape[1]] = counts
+    return out
+
+
+class CitationHistory:
+    """The store in `root`: stable work index plus monthly chunks of daily counts."""
+
+    def __init__(self, root: Path = HISTORY_DIR):
+        self.root = root
+        path = root / "works.npy"
+        self.works = np.load(path) if path.exists() else np.zeros(0, dtype=np.int64)
+        self.column: Dict[int, int] = {int(w): i for i, w in enumerate(self.works.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.works)
+
+    def columns_of(self, numbers: List[int], add: bool = False) -> "np.ndarray":
+        """Stable column of each work number (-1 if unknown); `add` assigns columns to new works."""
+        out = np.empty(len(numbers), dtype=np.int64)
+        new: List[int] = []
+        for k, n in enumerate(numbers):
+            col = self.column.get(n)
+            if col is None and add:
+                col = self.column[n] = len(self.works) + len(new)
+                new.append(n)
+            out[k] = MISSING if col is None else col
+        if new:
+            self.works = np.concatenate([self.works, np.asarray(new, dtype=np.int64)])
+        return out
+
+    # -- chunks ------------------------------------------------------------
+
+    def chunk_paths(self) -> List[Path]:
+        return sorted(self.root.glob("[0-9][0-9][0-9][0-9]-[0-9][0-9].npz"))
+
+    def load_chunk(self, path: Path) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(days, counts) of a chunk, counts decoded and widened to the current index."""
+        if not path.exists():
+            return np.zeros(0, dtype=np.int32), np.zeros((0, len(self)), dtype=np.int32)
+        with np.load(path) as z:
+            days, deltas = z["days"], z["counts"]
+        return days, _pad(np.cumsum(deltas, axis=0, dtype=np.int32), len(self))
+
+    def save_chunk(self, path: Path, days: "np.ndarray", counts: "np.ndarray") -> None:
+        deltas = counts.copy()
+        deltas[1:] -= counts[:-1]
+        tmp = tmp_path(path)
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, days=days.astype(np.int32), counts=deltas)
+        os.replace(tmp, path)
+
+    # -- update / query ----------------------------------------------------
+
+    def append(self, numbers: List[int], counts: List[int], day: Optional[int] = None) -> int:
+        """Record the counts of the works `numbers` on `day` (default: today); returns the day."""
+        day = today() if day is None else day
+        cols = self.columns_of(numbers, add=True)
+        row = np.full(len(self), MISSING, dtype=np.int32)
+        row[cols] = np.asarray(counts, dtype=np.int32)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / chunk_name(day)
+        days, matrix = self.load_chunk(path)
+        at = int(np.searchsorted(days, day))
+        if at < len(days) and days[at] == day:
+            matrix[at] = row
+        else:
+            days = np.insert(days, at, day)
+            matrix = np.insert(matrix, at, row, axis=0)
+        self.save_chunk(path, days, matrix)
+        tmp = tmp_path(self.root / "works.npy")
+        with open(tmp, "wb") as f:
+            np.save(f, self.works)
+        os.replace(tmp, self.root / "works.npy")
+        return day
+
+    def series(self, since: Optional[int] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+        """(days, counts) of every recorded day >= `since`, one column per work of the index."""
+        first = chunk_name(since) if since is not None else ""
+        days, rows = [], []
+        for path in self.chunk_paths():
+            if path.name < first:
+                continue
+            d, m = self.load_chunk(path)
+            keep = d >= since if since is not None else slice(None)
+            days.append(d[keep])
+            rows.append(m[keep])
+        if not days:
+            return np.zeros(0, dtype=np.int32), np.zeros((0, len(self)), dtype=np.int32)
+        return np.concatenate(days), np.concatenate(rows)
+
+
+def window_growth(days: "np.ndarray", counts: "np.ndarray", window: int = RISING_WINDOW) -> "np.ndarray":
+    """Citations gained per column between the earliest recorded day of the last `window` days and the last day."""
+    if len(days) == 0:
+        return np.zeros(counts.shape[1], dtype=np.int64)
+    last = counts[-1].astype(np.int64)
+    inside = counts[days >= days[-1] - window]
+    # earliest count of each work inside the window (its first appearance for new works)
+    present = inside != MISSING
+    first_row = np.argmax(present, axis=0)
+    start = inside[first_row, np.arange(inside.shape[1])].astype(np.int64)
+    growth = last - start
+    growth[(last == MISSING) | ~present.any(axis=0)] = 0
+    return growth
+
+
+def trends_payload(history: CitationHistory, payload: Dict[str, Any], end: Optional[int] = None,
+                   days_back: int = TREND_DAYS) -> Dict[str, Any]:
+    """trends.json for the rows of `payload` (citations.json) over the `days_back` days up to `end`."""
+    end = today() if end is None else end
+    numbers = [work_number(i) or 0 for i in payload["columns"]["id"]]
+    cols = history.columns_of(numbers)
+    days, counts = history.series(since=end - days_back)
+    keep = days <= end
+    days, counts = days[keep], counts[keep]
+    # rows x days, MISSING as 0
+    rows = np.where(cols[:, None] >= 0, np.maximum(counts.T[np.maximum(cols, 0)], 0), 0)
+    growth = np.where(cols >= 0, window_growth(days, counts)[np.maximum(cols, 0)], 0) if len(days) else \
+        np.zeros(len(cols), dtype=np.int64)
+
+    names = payload["dicts"]["tags"]
+    tag_rows: List[List[int]] = [[] for _ in names]
+    for r, tags in enumerate(payload["columns"]["tags"]):
+        for t in tags:
+            tag_rows[t].append(r)
+    top = [int(r) for r in np.argsort(-growth, kind="stable")[:RISING_TOP] if growth[r] > 0]
+    return {
+        "format": FORMAT,
+        "count": len(numbers),
+        "days": [day_str(d) for d in days.tolist()],
+        "window": RISING_WINDOW,
+        "columns": {"growth": growth.astype(np.int64).tolist()},
+        "tags": {
+            "names": names,
+            "series": [rows[idx].sum(axis=0).astype(np.int64).tolist() if idx else [0] * len(days)
+                       for idx in tag_rows],
+        },
+        "rising": [{"row": r, "growth": int(growth[r]), "series": rows[r].tolist()} for r in top],
+    }
+
+
+def update_history(payload: Dict[str, Any], root: Path = HISTORY_DIR,
+                   day: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Append today's counts of the rows of `payload` and return trends.json (None without NumPy)."""
+    if np is None:
+        return None
+    history = CitationHistory(root)
+    c = payload["columns"]
+    rows = [(n, cnt) for n, cnt in zip((work_number(i) for i in c["id"]), c["cited_by_count"]) if n is not None]
+    day = history.append([n for n, _ in rows], [cnt for _, cnt in rows], day)
+    return trends_payload(history, payload, day)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ids = sys.argv[1:] if argv is None else argv
+    if np is None:
+        raise SystemExit("NumPy is required")
+    history = CitationHistory()
+    days, counts = history.series()
+    cols = history.columns_of([work_number(i) or 0 for i in ids])
+    for wid, col in zip(ids, cols.tolist()):
+        if col < 0:
+            print(f"{wid}: not in the history")
+            continue
+        print(wid)
+        for d, v in zip(days.tolist(), counts[:, col].tolist()):
+            if v != MISSING:
+                print(f"  {day_str(d)}  {v}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent HTTP response cache, mounted as a transport adapter under the
+fetch session (see fetch_data._session).
+
+Successful GET responses are stored in data/build/http_cache.sqlite, keyed by
+the URL with its query parameters sorted (credentials such as `api_key` and
+`mailto` are left out of the key). Bodies are zlib-compressed.
+
+- online (default): a stored response younger than `max_age` seconds is
+  served without a request; older ones are revalidated with
+  If-None-Match / If-Modified-Since when the server sent an ETag or
+  Last-Modified (a 304 serves the stored body), otherwise fetched again.
+- offline: every response is replayed from the cache and a miss raises
+  `CacheMiss`, so a run against a cached snapshot needs no network at all.
+
+The cache is capped at `max_bytes`; the least recently used entries are
+evicted first.
+"""
+
+from __future__ import annotations
+import os, json, time, zlib, sqlite3, threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from rawstore import BUILD_DIR
+
+HTTP_CACHE_PATH = BUILD_DIR / "http_cache.sqlite"
+HTTP_CACHE_MAX_MB = float(os.getenv("HTTP_CACHE_MAX_MB", "256"))
+# Seconds a stored response is served without contacting the server
+HTTP_CACHE_MAX_AGE = float(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+
+# Query parameters that identify the caller, not the resource
+UNKEYED_PARAMS = {"api_key", "mailto"}
+# Response headers replayed from the cache
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Date", "Retry-After")
+
+
+class CacheMiss(RuntimeError):
+    """Raised in offline mode for a request that is not in the cache."""
+
+
+def cache_key(method: str, url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if k not in UNKEYED_PARAMS)
+    return f"{method.upper()} " + urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+class HTTPCache:
+    """SQLite store of response bodies with LRU eviction; safe to share between threads."""
+
+    def __init__(self, path: Path = HTTP_CACHE_PATH, max_bytes: int = int(HTTP_CACHE_MAX_MB * 1024 * 1024),
+                 max_age: float = HTTP_CACHE_MAX_AGE, offline: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB,
+            stored REAL, accessed REAL, size INTEGER)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        # served from the cache without a request / after a 304 / fetched and stored
+        self.hits = self.revalidated = self.stored = 0
+
+    def get(self, key: str) -> Optional[Tuple[int, Dict[str, str], bytes, float]]:
+        """(status, headers, body, stored time) of `key`, marking it recently used."""
+        with self.lock:
+            row = self.db.execute("SELECT status, headers, body, stored FROM responses WHERE key = ?",
+                                  (key,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        return row[0], json.loads(row[1]), zlib.decompress(row[2]), row[3]
+
+    def put(self, key: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        blob = zlib.compress(body)
+        now = time.time()
+        with self.lock:
+            old = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (key, status, json.dumps(headers), blob, now, now, len(blob)))
+            self.size += len(blob) - (old[0] if old else 0)
+            self._evict()
+            self.db.commit()
+            self.stored += 1
+
+    def touch(self, key: str) -> None:
+        """Mark `key` as revalidated now."""
+        now = time.time()
+        with self.lock:
+            self.db.execute("UPDATE responses SET stored = ?, accessed = ? WHERE key = ?", (now, now, key))
+            self.db.commit()
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes:
+            rows = self.db.execute("SELECT key, size FROM responses ORDER BY accessed LIMIT 64").fetchall()
+            if not rows:
+                self.size = 0
+                return
+            for key, size in rows:
+                self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                if self.size <= self.max_bytes:
+                    break
+
+    def summary(self) -> Tuple[int, int, int]:
+        """(served from cache, revalidated with 304, fetched and stored)."""
+        return self.hits, self.revalidated, self.stored
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+
+def cached_response(request: requests.PreparedRequest, status: int, headers: Dict[str, str],
+                    body: bytes) -> requests.Response:
+    r = requests.Response()
+    r.status_code = status
+    r.headers = CaseInsensitiveDict(headers)
+    r._content = body
+    r.url = request.url
+    r.request = request
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers) or "utf-8"
+    r.reason = "OK (cached)"
+    return r
+
+
+class CachingAdapter(HTTPAdapter):
+    """HTTPAdapter that answers GET requests from an `HTTPCache` and stores successful responses."""
+
+    def __init__(self, cache: HTTPCache, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if request.method != "GET":
+            return super().send(request, **kwargs)
+        key = cache_key(request.method, request.url)
+        entry = self.cache.get(key)
+        if self.cache.offline:
+            if entry is None:
+                raise CacheMiss(f"Not in the HTTP cache (offline): {key}")
+            self.cache.hits += 1
+            return cached_response(request, *entry[:3])
+        if entry is not None and time.time() - entry[3] < self.cache.max_age:
+            self.cache.hits += 1
+            return cached_response(request, *entry[:3])
+
+        if entry is not None:
+            headers = entry[1]
+            if headers.get("ETag"):
+                request.headers["If-None-Match"] = headers["ETag"]
+            if headers.get("Last-Modified"):
+                request.headers["If-Modified-Since"] = headers["Last-Modified"]
+        r = super().send(request, **kwargs)
+        if r.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.touch(key)
+            return cached_response(request, *entry[:3])
+        if r.status_code == 200:
+            self.cache.put(key, r.status_code, {h: r.headers[h] for h in KEPT_HEADERS if h in r.headers},
+                           r.content)
+        return r
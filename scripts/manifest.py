@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compact id manifest of the published corpus and the changelog between runs.
+
+process_data keeps data/manifest.json: the numeric part of every work id
+(W123 -> 123) in ascending order, with a parallel column of 32-bit content
+hashes of the displayed fields (title, year, venue, authors, tags, link) and
+the `cited_by_count` of each work:
+
+    {"format": "manifest-v1", "generated_at": "...", "count": N,
+     "ids": [...], "hashes": [...], "cited_by_count": [...]}
+
+Before overwriting it, the new manifest is compared with the previous one by
+merging the two sorted id arrays (no previous citations.json has to be read
+or parsed), and the result is published as data/changelog.json:
+
+    {"format": "changelog-v1", "generated_at": "...", "base": "<previous generated_at>",
+     "count": N, "added": [{"id", "title", "year", "url"}, ...], "removed": ["W..."],
+     "changed": ["W..."], "cited_by": [{"id", "from", "to"}, ...]}
+
+generate_commit_message builds the commit message from the changelog. When no
+manifest exists yet, the previous citations.json (if any) is used as the base
+once.
+"""
+
+from __future__ import annotations
+import json, time, hashlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from projection import decode_citations
+from rawstore import write_json_atomic
+
+ROOT = Path(__file__).resolve().parents[1]
+MANIFEST_PATH = ROOT / "data" / "manifest.json"
+CHANGELOG_PATH = ROOT / "docs" / "data" / "changelog.json"
+FORMAT = "manifest-v1"
+CHANGELOG_FORMAT = "changelog-v1"
+
+# Fields of a decoded citations.json row that make up the content hash
+HASHED_FIELDS = ("title", "publication_year", "host_venue", "authorships", "tags", "url")
+
+
+def work_number(wid: Optional[str]) -> Optional[int]:
+    """Numeric part of an OpenAlex work id ("W123" or its URL), or None."""
+    tail = (wid or "").rsplit("/", 1)[-1]
+    if tail[:1] in ("W", "w") and tail[1:].isdigit():
+        return int(tail[1:])
+    return None
+
+
+def content_hash(row: Dict[str, Any]) -> int:
+    """32-bit hash of the displayed fields of a row (cited_by_count is tracked separately)."""
+    data = json.dumps([row.get(k) for k in HASHED_FIELDS], ensure_ascii=False, separators=(",", ":"))
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=4).digest(), "big")
+
+
+def build_manifest(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Manifest of decoded citations.json rows (see projection.decode_citations)."""
+    entries = sorted((n, content_hash(r), int(r.get("cited_by_count") or 0))
+                     for r in rows if (n := work_number(r.get("id"))) is not None)
+    return {
+        "format": FORMAT,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "count": len(entries),
+        "ids": [e[0] for e in entries],
+        "hashes": [e[1] for e in entries],
+        "cited_by_count": [e[2] for e in entries],
+    }
+
+
+def load_manifest(path: Path = MANIFEST_PATH, fallback: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """The previous manifest; built from the citations.json at `fallback` if there is none."""
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") == FORMAT:
+            return data
+    if fallback is not None and fallback.exists():
+        try:
+            with open(fallback, "r", encoding="utf-8") as f:
+                manifest = build_manifest(decode_citations(json.load(f)))
+        except (OSError, ValueError, KeyError):
+            return None
+        manifest["generated_at"] = None
+        return manifest
+    return None
+
+
+def save_manifest(manifest: Dict[str, Any], path: Path = MANIFEST_PATH) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(path, manifest, separators=(",", ":"))
+
+
+def merge_diff(old: Dict[str, Any], new: Dict[str, Any]) -> Iterator[Tuple[str, int, int, int]]:
+    """Walk both sorted id arrays once, yielding (kind, id, old index, new index).
+
+    kind is "added", "removed", "changed" (content hash differs) or "cited_by"
+    (only the citation count differs); unchanged works are skipped. Indexes
+    are -1 on the side where the work is missing.
+    """
+    a, b = old["ids"], new["ids"]
+    i = j = 0
+    while i < len(a) or j < len(b):
+        if j >= len(b) or (i < len(a) and a[i] < b[j]):
+            yield "removed", a[i], i, -1
+            i += 1
+        elif i >= len(a) or b[j] < a[i]:
+            yield "added", b[j], -1, j
+            j += 1
+        else:
+            if old["hashes"][i] != new["hashes"][j]:
+                yield "changed", b[j], i, j
+            elif old["cited_by_count"][i] != new["cited_by_count"][j]:
+                yield "cited_by", b[j], i, j
+            i += 1
+            j += 1
+
+
+def build_changelog(old: Optional[Dict[str, Any]], new: Dict[str, Any],
+                    rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Changelog from `old` to `new`; `rows` (decoded, any order) describe the added works."""
+    base = old if old is not None else {"ids": [], "hashes": [], "cited_by_count": [], "generated_at": None}
+    added: List[int] = []
+    removed: List[str] = []
+    changed: List[str] = []
+    cited_by: List[Dict[str, Any]] = []
+    for kind, n, i, j in merge_diff(base, new):
+        if kind == "added":
+            added.append(n)
+        elif kind == "removed":
+            removed.append(f"W{n}")
+        else:
+            if kind == "changed":
+                changed.append(f"W{n}")
+            before, after = base["cited_by_count"][i], new["cited_by_count"][j]
+            if before != after:
+                cited_by.append({"id": f"W{n}", "from": before, "to": after})
+    by_number = {work_number(r.get("id")): r for r in rows}
+    cited_by.sort(key=lambda c: (-(c["to"] - c["from"]), c["id"]))
+    return {
+        "format": CHANGELOG_FORMAT,
+        "generated_at": new["generated_at"],
+        "base": base.get("generated_at"),
+        "count": new["count"],
+        "added": [
+            {"id": f"W{n}", "title": by_number[n].get("title"),
+             "year": by_number[n].get("publication_year"), "url": by_number[n].get("url")}
+            for n in added
+        ],
+        "removed": removed,
+        "changed": changed,
+        "cited_by": cited_by,
+    }
+
+
+def load_changelog(path: Path = CHANGELOG_PATH) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data if data.get("format") == CHANGELOG_FORMAT else None
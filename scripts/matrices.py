@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dense count matrices published as matrices.json, so the site's cross-cut
+charts render from precomputed numbers instead of scanning every paper.
+
+Counted with NumPy over the integer-encoded columns of citations.json (one
+`bincount` per matrix, no per-paper Python loop over tags):
+
+- `tag_year`   tags x years:  papers per tag and publication year,
+- `venue_year` venues x years: papers per venue and year (the MATRIX_VENUES
+  venues with the most papers),
+- `tag_tag`    tags x tags:   papers carrying both tags (the diagonal is the
+  number of papers per tag).
+
+Each matrix is a typed array: its values in row-major order, little-endian,
+base64-encoded, with the dtype (the smallest unsigned type that fits) and
+shape. Rows and columns are described by the label lists:
+
+    {"format": "matrices-v1", "count": N,
+     "labels": {"tags": [...], "venues": [...], "years": [...]},
+     "matrices": {"tag_year": {"dtype": "uint16", "shape": [T, Y], "data": "..."}, ...}}
+
+`labels.tags` is `dicts.tags` of citations.json; venues are ordered by paper
+count.
+"""
+
+from __future__ import annotations
+import base64
+from typing import Dict, Any, List, Optional
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # optional
+
+FORMAT = "matrices-v1"
+MATRIX_VENUES = 30
+
+
+def typed_array(counts: "np.ndarray") -> Dict[str, Any]:
+    """`counts` as the smallest unsigned little-endian type, base64-encoded."""
+    top = int(counts.max()) if counts.size else 0
+    dtype = "uint8" if top < 1 << 8 else "uint16" if top < 1 << 16 else "uint32"
+    data = np.ascontiguousarray(counts, dtype=np.dtype(dtype).newbyteorder("<")).tobytes()
+    return {"dtype": dtype, "shape": list(counts.shape), "data": base64.b64encode(data).decode("ascii")}
+
+
+def decode_typed_array(arr: Dict[str, Any]) -> "np.ndarray":
+    data = np.frombuffer(base64.b64decode(arr["data"]), dtype=np.dtype(arr["dtype"]).newbyteorder("<"))
+    return data.reshape(arr["shape"])
+
+
+def build_matrices(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """matrices.json for a columnar citations payload (see projection.py); None without NumPy."""
+    if np is None:
+        return None
+    dicts, cols = payload["dicts"], payload["columns"]
+    n, n_tags = payload["count"], len(dicts["tags"])
+
+    year = np.fromiter((y or 0 for y in cols["year"]), dtype=np.int64, count=n)
+    years = np.unique(year[year > 0])
+    # year column, -1 for papers without a year
+    year_col = np.where(year > 0, np.searchsorted(years, year), -1)
+    dated = year_col >= 0
+
+    lengths = np.fromiter((len(t) for t in cols["tags"]), dtype=np.int64, count=n)
+    tag_ids = np.fromiter((t for row in cols["tags"] for t in row), dtype=np.int64, count=int(lengths.sum()))
+    tag_rows = np.repeat(np.arange(n), lengths)
+
+    # tag x year
+    y = year_col[tag_rows]
+    keep = y >= 0
+    tag_year = np.bincount(tag_ids[keep] * len(years) + y[keep],
+                           minlength=n_tags * len(years)).reshape(n_tags, len(years))
+
+    # venue x year, top venues by paper count
+    venue = np.asarray(cols["venue"], dtype=np.int64)
+    per_venue = np.bincount(venue, minlength=len(dicts["venues"]))
+    top = np.lexsort((np.arange(len(per_venue)), -per_venue))[:MATRIX_VENUES]
+    top = top[per_venue[top] > 0]
+    slot = np.full(len(per_venue), -1, dtype=np.int64)
+    slot[top] = np.arange(len(top))
+    v = slot[venue]
+    keep = (v >= 0) & dated
+    venue_year = np.bincount(v[keep] * len(years) + year_col[keep],
+                             minlength=len(top) * len(years)).reshape(len(top), len(years))
+
+    # tag x tag: incidence^T @ incidence
+    incidence = np.zeros((n, n_tags), dtype=np.int32)
+    incidence[tag_rows, tag_ids] = 1
+    tag_tag = incidence.T @ incidence
+
+    return {
+        "format": FORMAT,
+        "count": n,
+        "labels": {
+            "tags": dicts["tags"],
+            "venues": [dicts["venues"][i] for i in top.tolist()],
+            "years": years.tolist(),
+        },
+        "matrices": {
+            "tag_year": typed_array(tag_year),
+            "venue_year": typed_array(venue_year),
+            "tag_tag": typed_array(tag_tag),
+        },
+    }
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Run instrumentation shared by the pipeline scripts.
+
+`metrics` is a process-wide recorder:
+
+    metrics.begin("process_data", profile=args.profile)
+    with metrics.stage("tag"):              # wall time, exclusive of nested stages
+        ...
+    for w in metrics.iter_stage("read", items):   # time spent producing each item
+        ...
+    metrics.count("http.requests")          # counters
+    metrics.set("tag_cache", {...})         # any other JSON value
+    metrics.finish()                        # writes the run report
+
+Stage times are exclusive: time spent in a nested stage (including the
+upstream generators of a streaming pipeline) is not counted again in the
+outer one, so the stages of a run add up to its wall time.
+
+`finish()` merges the script's section into docs/data/run_report.json (next
+to stats.json), so one report covers fetch_data, process_data and
+generate_commit_message of the same run.
+
+With `profile="cprofile"` the whole run is profiled (data/build/<script>.prof
+plus the top functions in the report); with `profile="tracemalloc"` the peak
+traced memory and the top allocation sites are reported. PIPELINE_PROFILE
+sets the default for every script.
+"""
+
+from __future__ import annotations
+import os, io, sys, json, time, pstats, cProfile, threading, tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+try:
+    import resource  # type: ignore
+except Exception:
+    resource = None  # optional (not available on Windows)
+
+from rawstore import BUILD_DIR, DATA_DIR, write_json_atomic
+
+RUN_REPORT_PATH = DATA_DIR / "run_report.json"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "") or None
+PROFILE_TOP = 15
+
+
+class Metrics:
+    """Stage timers, counters and values of one script run."""
+
+    def __init__(self) -> None:
+        self.script: Optional[str] = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        self.stages: Dict[str, float] = {}
+        self.counters: Counter = Counter()
+        self.values: Dict[str, Any] = {}
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.profile: Optional[str] = None
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def begin(self, script: str, profile: Optional[str] = PIPELINE_PROFILE) -> "Metrics":
+        self.reset()
+        self.script = script
+        if profile not in (None, *PROFILE_MODES):
+            raise ValueError(f"Unknown profile mode: {profile}")
+        self.profile = profile
+        if profile == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif profile == "tracemalloc":
+            tracemalloc.start(10)
+        return self
+
+    # -- recording -------------------------------------------------------
+
+    def _stack(self) -> List[float]:
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        stack = self._stack()
+        stack.append(0.0)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed - nested
+
+    def iter_stage(self, name: str, items: Iterable[Any]) -> Iterator[Any]:
+        """Yield from `items`, counting the time spent producing each item as stage `name`."""
+        it = iter(items)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[name] += n
+
+    def set(self, key: str, value: Any) -> None:
+        self.values[key] = value
+
+    # -- reporting -------------------------------------------------------
+
+    def report(self) -> Dict[str, Any]:
+        wall = time.perf_counter() - self.t0
+        out: Dict[str, Any] = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started)),
+            "seconds": round(wall, 3),
+            "stages": {k: round(v, 3) for k, v in sorted(self.stages.items(), key=lambda x: -x[1])},
+            "counters": dict(sorted(self.counters.items())),
+        }
+        if resource is not None:
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            out["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+        out.update(self.values)
+        return out
+
+    def _finish_profile(self) -> Optional[Dict[str, Any]]:
+        if self.profiler is not None:
+            self.profiler.disable()
+            BUILD_DIR.mkdir(parents=True, exist_ok=True)
+            path = BUILD_DIR / f"{self.script}.prof"
+            self.profiler.dump_stats(str(path))
+            stats = pstats.Stats(self.profiler, stream=io.StringIO())
+            rows = sorted(stats.stats.items(), key=lambda kv: -kv[1][3])[:PROFILE_TOP]
+            self.profiler = None
+            return {
+                "mode": "cprofile",
+                "file": str(path),
+                "top_cumulative": [
+                    {"function": f"{Path(file).name}:{line}({func})", "calls": nc,
+                     "self_seconds": round(tt, 3), "cumulative_seconds": round(ct, 3)}
+                    for (file, line, func), (cc, nc, tt, ct, _) in rows
+                ],
+            }
+        if self.profile == "tracemalloc" and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+            tracemalloc.stop()
+            return {
+                "mode": "tracemalloc",
+                "current_mb": round(current / 2 ** 20, 1),
+                "peak_mb": round(peak / 2 ** 20, 1),
+                "top_allocations": [
+                    {"where": f"{Path(s.traceback[0].filename).name}:{s.traceback[0].lineno}",
+                     "mb": round(s.size / 2 ** 20, 2), "blocks": s.count}
+                    for s in top
+                ],
+            }
+        return None
+
+    def summary(self) -> str:
+        parts = [f"{k} {v:.2f}s" for k, v in sorted(self.stages.items(), key=lambda x: -x[1])]
+        return ", ".join(parts)
+
+    def finish(self, path: Optional[Path] = RUN_REPORT_PATH) -> Dict[str, Any]:
+        """Stop profiling and merge this script's report into `path` (None: do not write)."""
+        profile = self._finish_profile()
+        report = self.report()
+        if profile is not None:
+            report["profile"] = profile
+        if path is not None and self.script:
+            runs: Dict[str, Any] = {}
+            if path.exists():
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        runs = json.load(f).get("scripts") or {}
+                except (OSError, ValueError):
+                    runs = {}
+            runs[self.script] = report
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(path, {"format": "run-report-v1", "scripts": runs}, indent=1)
+        return report
+
+
+metrics = Metrics()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate-limited, retrying client for the OpenAlex API.
+
+- A token bucket sized to the polite-pool budget (10 requests/second) paces
+  every request; the rate is halved on HTTP 429 and recovers gradually on
+  success (AIMD), so a throttled run backs off instead of hammering the API.
+- 429 and 5xx responses and connection errors are retried with jittered
+  exponential backoff; a `Retry-After` header always takes precedence (capped
+  at MAX_RETRY_AFTER seconds, so a bogus header cannot stall a run).
+- Other 4xx responses are raised immediately as `requests.HTTPError`.
+
+Requests, retries, throttling and downloaded bytes are counted in the run
+report (see metrics.py).
+"""
+
+from __future__ import annotations
+import os, time, random, threading
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+import requests
+
+from metrics import metrics
+
+OPENALEX_API_URL = os.getenv("OPENALEX_API_URL", "https://api.openalex.org").rstrip("/")
+# Polite pool: 10 requests/second, 100k requests/day
+OPENALEX_RATE = float(os.getenv("OPENALEX_RATE", "10"))
+# Largest page size OpenAlex allows for cursor paging
+MAX_PER_PAGE = 200
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Longest wait taken from a Retry-After header
+MAX_RETRY_AFTER = float(os.getenv("OPENALEX_MAX_RETRY_AFTER", "300"))
+
+
+class TokenBucket:
+    """Thread-safe token bucket. `acquire()` blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self) -> None:
+        """Multiplicative decrease after the server pushed back."""
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def recover(self) -> None:
+        """Additive increase after a successful request."""
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class OpenAlexClient:
+    """Wraps a `requests.Session` with rate limiting and retries."""
+
+    def __init__(self, session: requests.Session, rate: float = OPENALEX_RATE, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0,
+                 bucket: Optional[TokenBucket] = None, max_retry_after: float = MAX_RETRY_AFTER):
+        self.session = session
+        self.bucket = bucket or TokenBucket(rate)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.per_page = MAX_PER_PAGE
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, base * 2^attempt], capped
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 60) -> requests.Response:
+        """GET with pacing and retries. Raises `requests.HTTPError` on final failure."""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            metrics.count("http.requests")
+            try:
+                r = self.session.get(url, params=params, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                metrics.count("http.errors")
+                if attempt >= self.max_retries:
+                    raise
+                metrics.count("http.retries")
+                wait = self._backoff(attempt)
+                print(f"Request failed ({e.__class__.__name__}), retrying in {wait:.1f} seconds...")
+                time.sleep(wait)
+                continue
+
+            metrics.count("http.bytes", len(r.content))
+            if r.status_code in RETRY_STATUS and attempt < self.max_retries:
+                metrics.count("http.retries")
+                if r.status_code == 429:
+                    metrics.count("http.throttled")
+                    self.bucket.throttle()
+                wait = retry_after_seconds(r)
+                if wait is None:
+                    wait = self._backoff(attempt)
+                wait = min(wait, self.max_retry_after)
+                print(f"HTTP {r.status_code}, retrying in {wait:.1f} seconds...")
+                time.sleep(wait)
+                continue
+
+            if not r.ok:
+                print(f"HTTP Error {r.status_code}: {r.text[:200]}")
+            r.raise_for_status()
+            self.bucket.recover()
+            return r
+        raise AssertionError("unreachable")
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 60) -> Dict[str, Any]:
+        return self.get(url, params=params, timeout=timeout).json()
@@ -2,85 +2,105 @@
 # -*- coding: utf-8 -*-
 """
 Process raw citation data by applying tags and generating statistics.
-This script reads raw_citations.json and outputs citations.json and stats.json.
+This script reads raw_citations.ndjson and outputs citations.json and stats.json.
+citations.json is a slim, dictionary-encoded display payload (see projection.py);
+the full processed records are kept in data/build/citations_full.ndjson.gz.
 
-- Applies auto-tagging based on tag_rules.yml
+- Applies auto-tagging based on tag_rules.yml (cached per work between runs, see tagcache.py),
+  or with `--tagger model` the linear classifiers trained by tag_model.py
+- Merges near-duplicate works (preprint + published version) into one record (dedup.py)
 - Applies manual overrides from overrides.yml
+- Resolves authors to entities with stable integer ids (authors.py)
 - Generates statistics and charts data
+
+Records flow through a generator pipeline (read -> tag -> override -> write +
+accumulate stats), so only one work is held in memory at a time.
+
+stats.json is a small summary (counters, by_year, by_tag, top venues and
+authors); per-author details are split into pages under data/authors/ that the
+site loads lazily. Published JSON is compact and precompressed (.gz/.br).
+facets.json holds tag/author/venue/year posting lists so the site can filter
+without scanning every paper, and search.json + search/ a BM25 full-text index
+(see search_index.py). matrices.json holds tag x year, venue x year and
+tag x tag count matrices for the charts (matrices.py, needs NumPy). When
+fetch_data was run with `--graph` (and NumPy is installed), graph.json adds
+citation-graph scores per paper (citation_graph.py).
+
+Stage times, cache and tagging counters and per-rule match times are written to
+docs/data/run_report.json (metrics.py); `--profile` adds a cProfile or
+tracemalloc profile of the run.
+
+data/manifest.json lists every work id with a content hash and its citation
+count; the difference to the previous run's manifest is published as
+data/changelog.json (manifest.py), which generate_commit_message uses.
+
+Every run appends the citation counts of the day to the columnar history in
+data/history/ and publishes per-tag and "fastest rising" series as
+trends.json (history.py, needs NumPy).
 """
 
 from __future__ import annotations
-import os, re, json, time
-from collections import Counter, defaultdict
+import os, json, time, argparse
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, Iterable, Iterator, List, Optional
 
 try:
     import yaml  # type: ignore
 except Exception:
     yaml = None  # optional
 
+from tagging import TagEngine, get_engine, text_blob, abstract_text, iter_match_chunks
+from rawstore import iter_raw_records, load_raw_meta, raw_records_path, NDJSONWriter, BUILD_DIR, LEGACY_RAW_PATH
+from projection import CitationProjector, full_id, decode_citations
+from facets import build_facets
+from aggregate import StatsAccumulator
+from tagcache import TagCache
+from textstore import TextStore
+from search_index import SearchIndexBuilder
+from authors import AuthorIndex, load_author_ids
+from citation_graph import CitationGraph, REFERENCES_PATH, graph_payload, load_references, np
+from publish import write_json, remove_published, check_budgets
+from metrics import metrics, PROFILE_MODES, PIPELINE_PROFILE
+from dedup import DuplicateIndex, iter_dedup
+from history import update_history
+from matrices import build_matrices
+from tag_model import TagModel
+from manifest import CHANGELOG_PATH, build_changelog, build_manifest, load_manifest, save_manifest
+
 ROOT = Path(__file__).resolve().parents[1]
 DOCS = ROOT / "docs"
 DATA_DIR = DOCS / "data"
+AUTHORS_DIR = DATA_DIR / "authors"
+SEARCH_DIR = DATA_DIR / "search"
+GRAPH_PATH = DATA_DIR / "graph.json"
+TRENDS_PATH = DATA_DIR / "trends.json"
+MATRICES_PATH = DATA_DIR / "matrices.json"
+# Full processed records (internal, not published)
+FULL_CITATIONS_PATH = BUILD_DIR / "citations_full.ndjson.gz"
+
+# Works per chunk handed to a tagging worker
+TAG_CHUNK_SIZE = 256
+# Works scored per sparse product by the learned tagger
+MODEL_CHUNK_SIZE = 4096
+# Tagging backend: "regex" (tag_rules.yml) or "model" (data/build/tag_model.npz)
+TAGGERS = ("regex", "model")
+TAGGER = os.getenv("TAGGER", "regex")
+
+# Authors listed in the stats.json summary
+TOP_AUTHORS_SUMMARY = 100
+# Authors per lazily-loaded page (matches the page size of the authors table)
+AUTHORS_PER_SHARD = 50
+
 
 def load_tag_rules() -> List[tuple[str,str,str]]:
     """Load tagging rules from YAML file."""
-    path = ROOT / "data" / "tag_rules.yml"    
-    with open(path, "r", encoding="utf-8") as f:
-        data = yaml.safe_load(f) or {}
-    
-    rules = []
-    for rule in data.get("tag_rules", []):
-        name = rule.get("name")
-        pattern = rule.get("pattern")
-        category = rule.get("category", "Other")
-        if name and pattern:
-            rules.append((name, pattern, category))
-    
-    return rules
-
-
-def text_blob(work: Dict[str,Any]) -> str:
-    parts: List[str] = []
-    # タイトルを取得（display_nameまたはtitleフィールドから）
-    title = work.get("title") or work.get("display_name") or ""
-    parts.append(str(title))
-    # venue names
-    for key in ("host_venue","primary_location"):
-        hv = work.get(key) or {}
-        if isinstance(hv, dict):
-            dn = hv.get("display_name")
-            if dn: parts.append(str(dn))
-            src = hv.get("source") or {}
-            if isinstance(src, dict):
-                sdn = src.get("display_name")
-                if sdn: parts.append(str(sdn))
-    # abstract (inverted index → bag of words)
-    inv = work.get("abstract_inverted_index") or {}
-    if isinstance(inv, dict) and inv:
-        parts.append(" ".join(inv.keys()))
-    # concepts
-    concepts = work.get("concepts") or []
-    for c in concepts:
-        dn = c.get("display_name")
-        if dn: parts.append(str(dn))
-    return " \n".join(parts).lower()
+    return [(r.name, r.pattern, r.category) for r in get_engine().rules]
 
 
 def auto_tags_for(work: Dict[str,Any]) -> List[str]:
-    blob = text_blob(work)
-    tags: Set[str] = set()
-    tag_rules = load_tag_rules()
-    for tag, pat, category in tag_rules:
-        if re.search(pat, blob, flags=re.IGNORECASE):
-            tags.add(tag)
-            # より具体的なタグがマッチした場合、より一般的なタグも追加
-            if tag == "Disk-based Learned Index":
-                tags.add("Learned Index")
-            elif tag == "Learned Bloom Filter":
-                tags.add("Bloom Filter")
-    return sorted(tags)
+    return get_engine().tags_for(work)
 
 
 def load_overrides() -> Dict[str, Any]:
@@ -91,175 +111,311 @@ def load_overrides() -> Dict[str, Any]:
         return yaml.safe_load(f) or {}
 
 
-def apply_overrides(items: List[Dict[str,Any]], overrides: Dict[str,Any]) -> None:
+def iter_abstracts(items: Iterable[Dict[str,Any]], store: Optional[TextStore] = None) -> Iterator[Dict[str,Any]]:
+    """Replace the abstract inverted index with the ordered abstract text."""
+    for w in items:
+        w["abstract"] = store.abstract(w) if store is not None else abstract_text(w)
+        w.pop("abstract_inverted_index", None)
+        yield w
+
+
+def chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_tagged(items: Iterable[Dict[str,Any]], engine: TagEngine,
+                cache: Optional[TagCache] = None, workers: int = 1) -> Iterator[Dict[str,Any]]:
+    """Auto-tag works in input order.
+
+    Works are taken in chunks; blobs of works that miss the cache are matched by
+    `workers` processes (see tagging.iter_match_chunks), the rest reuse cached
+    matches. The output does not depend on `workers`.
+    """
+    # chunks handed to the matcher, waiting for their results (same order)
+    waiting: deque = deque()
+
+    def blob_chunks() -> Iterator[List[str]]:
+        for chunk in chunked(items, TAG_CHUNK_SIZE):
+            looked_up, todo = [], []
+            for w in chunk:
+                blob = text_blob(w)
+                h, keys = cache.lookup(w.get("id"), blob) if cache is not None else (None, None)
+                if keys is None:
+                    todo.append(blob)
+                looked_up.append((h, keys))
+            waiting.append((chunk, looked_up))
+            yield todo
+
+    for matches in iter_match_chunks(blob_chunks(), engine, workers):
+        chunk, looked_up = waiting.popleft()
+        metrics.count("tag.matched", len(matches))
+        fresh = iter(matches)
+        for w, (h, keys) in zip(chunk, looked_up):
+            if cache is None:
+                w["tags"] = engine.tags_for_matches(next(fresh))
+            else:
+                if keys is None:
+                    keys = cache.keys_of(next(fresh))
+                cache.store(w.get("id"), h, keys)
+                w["tags"] = cache.tags_of(keys)
+            if w["tags"]:
+                metrics.count("works.tagged")
+            yield w
+
+
+def iter_model_tagged(items: Iterable[Dict[str,Any]], model: TagModel,
+                      engine: TagEngine) -> Iterator[Dict[str,Any]]:
+    """Tag works with the learned classifiers, one sparse product per MODEL_CHUNK_SIZE works."""
+    for chunk in chunked(items, MODEL_CHUNK_SIZE):
+        for w, tags in zip(chunk, model.tag_blobs([text_blob(w) for w in chunk], engine)):
+            w["tags"] = tags
+            if tags:
+                metrics.count("works.tagged")
+            yield w
+
+
+def iter_overrides(items: Iterable[Dict[str,Any]], overrides: Dict[str,Any],
+                   engine: Optional[TagEngine] = None) -> Iterator[Dict[str,Any]]:
+    """Apply hide / remove_tags / add_tags; added tags bring their `implied_tags` along."""
+    engine = engine or get_engine()
     add_map = {k: set(v or []) for k,v in (overrides.get("add_tags", {}) or {}).items()}
     remove_map = {k: set(v or []) for k,v in (overrides.get("remove_tags", {}) or {}).items()}
     hide_set = set(overrides.get("hide", []) or [])
-    kept: List[Dict[str,Any]] = []
     for w in items:
         wid = w.get("id")
         if wid in hide_set:
             continue
         cur = set(w.get("tags", []))
-        if wid in remove_map:
-            cur -= remove_map[wid]
-        if wid in add_map:
-            cur |= add_map[wid]
+        # tags set on a merged duplicate apply to its canonical record
+        for i in [wid] + (w.get("merged") or []):
+            if i in remove_map:
+                cur -= remove_map[i]
+            if i in add_map:
+                cur |= engine.expand_implied(set(add_map[i]))
         w["tags"] = sorted(cur)
-        kept.append(w)
-    items[:] = kept
+        yield w
 
 
-def build_stats(items: List[Dict[str,Any]]) -> Dict[str,Any]:
-    by_year = Counter([w.get("publication_year") for w in items if w.get("publication_year")])
-    by_tag = Counter(tag for w in items for tag in w.get("tags", []))
-    
-    # Tag categories
-    tag_categories = {}
-    tag_rules = load_tag_rules()
-    for tag, pattern, category in tag_rules:
-        tag_categories[tag] = category
-    
-    by_venue = Counter()
-    citations_sum = 0
-    author_counts = Counter()
-    author_citations = Counter()
-    author_names = {}  # author_id -> name のマッピング
+def apply_overrides(items: List[Dict[str,Any]], overrides: Dict[str,Any],
+                    engine: Optional[TagEngine] = None) -> None:
+    items[:] = list(iter_overrides(items, overrides, engine))
+
+
+def build_stats(items: Iterable[Dict[str,Any]], engine: Optional[TagEngine] = None) -> Dict[str,Any]:
+    """Aggregate statistics in a single pass over `items` (may be a generator)."""
+    return StatsAccumulator((engine or get_engine()).categories).add_all(items).finalize()
 
-    for w in items:
-        citations_sum += int(w.get("cited_by_count") or 0)
-        hv = w.get("host_venue")
-        if hv: by_venue[hv] += 1
-        for a in (w.get("authorships") or []):
-            # データ構造に応じて著者IDと名前を取得
-            aid = a.get("author_id") or "unknown"
-            name = a.get("name") or "unknown"
-            # author_id がある場合はそれを使用、そうでなければ名前を使用
-            author_key = aid if aid != "unknown" else name
-            
-            # 著者名をマッピングに保存
-            if aid != "unknown" and name != "unknown":
-                author_names[aid] = name
-            elif aid == "unknown" and name != "unknown":
-                author_names[name] = name
-                
-            author_counts[author_key] += 1
-            author_citations[author_key] += int(w.get("cited_by_count") or 0)
-
-    # 著者キーから適切な表示名を生成
-    def get_author_display_name(author_key):
-        # 著者名マッピングから実際の名前を取得
-        if author_key in author_names:
-            return author_names[author_key]
-        elif author_key.startswith("https://openalex.org/"):
-            return author_key.split("/")[-1]
-        else:
-            return author_key
-    
-    # 著者の所属情報を収集（年次情報付き）
-    author_institutions = defaultdict(set)
-    author_institution_years = defaultdict(lambda: defaultdict(set))
-    for w in items:
-        year = w.get("publication_year")
-        for authorship in w.get("authorships", []):
-            author_id = authorship.get("author_id", "unknown")
-            author_name = authorship.get("name", "unknown")
-            institutions = authorship.get("institutions", [])
-            
-            # 著者キーを決定
-            author_key = author_id if author_id != "unknown" else author_name
-            
-            # 所属情報を追加
-            for institution in institutions:
-                author_institutions[author_key].add(institution)
-                if year:
-                    author_institution_years[author_key][institution].add(year)
-    
-    top_authors = [
-        {
-            "author_id": author_key,
-            "name": get_author_display_name(author_key),
-            "papers": cnt,
-            "sum_citations": int(author_citations[author_key]),
-            "avg_citations": (author_citations[author_key] / cnt) if cnt else 0.0,
-            "institutions": list(author_institutions[author_key]),
-            "institution_years": {
-                institution: {
-                    "years": sorted(list(years)),
-                    "year_range": f"{min(years)}-{max(years)}" if years else ""
-                }
-                for institution, years in author_institution_years[author_key].items()
-            }
-        }
-        for author_key, cnt in author_counts.most_common()
-    ]
 
-    # 著者名による論文数統計を追加
-    by_author = {}
-    for author_key, cnt in author_counts.items():
-        author_name = get_author_display_name(author_key)
-        by_author[author_name] = cnt
-
-    return {
-        "total_works": len(items),
-        "by_year": dict(sorted(by_year.items())),
-        "by_tag": dict(sorted(by_tag.items(), key=lambda x:(-x[1], x[0]))),
-        "by_tag_category": dict(sorted(by_tag.items(), key=lambda x:(tag_categories.get(x[0], "Other"), -x[1], x[0]))),
-        "tag_categories": tag_categories,
-        "by_venue": dict(by_venue.most_common(30)),
-        "by_author": by_author,
-        "top_authors": top_authors,
-        "citations_sum": citations_sum,
-        "last_updated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+def split_stats(stats: Dict[str,Any]) -> tuple[Dict[str,Any], List[List[Dict[str,Any]]]]:
+    """Split full statistics into a compact summary and per-author pages (in rank order)."""
+    authors = stats["top_authors"]
+    summary = {k: v for k, v in stats.items() if k not in ("top_authors", "by_author")}
+    summary["top_authors"] = [
+        {k: a[k] for k in ("id", "author_id", "name", "papers", "sum_citations") if k in a}
+        | {"avg_citations": round(a["avg_citations"], 2)}
+        for a in authors[:TOP_AUTHORS_SUMMARY]
+    ]
+    summary["authors"] = {
+        "count": len(authors),
+        "per_shard": AUTHORS_PER_SHARD,
+        "shards": (len(authors) + AUTHORS_PER_SHARD - 1) // AUTHORS_PER_SHARD,
     }
+    # institution -> sorted years; the site derives ranges from these
+    detail = [
+        {k: a[k] for k in ("id", "author_id", "name", "papers", "sum_citations") if k in a}
+        | {"avg_citations": round(a["avg_citations"], 2),
+           "institution_years": {inst: v["years"] for inst, v in a["institution_years"].items()},
+           "top_tags": a["top_tags"]}
+        for a in authors
+    ]
+    shards = [detail[i:i + AUTHORS_PER_SHARD] for i in range(0, len(detail), AUTHORS_PER_SHARD)]
+    return summary, shards
+
+
+def shard_path(i: int) -> Path:
+    return AUTHORS_DIR / f"{i:03d}.json"
+
+
+def iter_project(items: Iterable[Dict[str,Any]], projector: CitationProjector,
+                 full_writer: NDJSONWriter, search: SearchIndexBuilder,
+                 authors: AuthorIndex) -> Iterator[Dict[str,Any]]:
+    """Feed each work to the display projection, the search and author indexes and the full-record artifact."""
+    for w in items:
+        search.add(projector.add(w), w)
+        authors.add(w)
+        full_writer.write(w)
+        yield w
+
+
+def build_graph(payload: Dict[str,Any]) -> Optional[Dict[str,Any]]:
+    """Citation-graph scores per row of `payload`, or None without references or NumPy."""
+    if np is None or not REFERENCES_PATH.exists():
+        return None
+    cols, tags = payload["columns"], payload["dicts"]["tags"]
+    graph = CitationGraph.from_references([full_id(i) for i in cols["id"]], load_references())
+    return graph_payload(graph, [[tags[t] for t in row] for row in cols["tags"]])
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Tag raw citations and build the site data.")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="rebuild abstracts and retag every work instead of reusing data/build caches")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="processes used for tagging (default: CPU count; 1 = serial)")
+    ap.add_argument("--ignore-budgets", action="store_true",
+                    help="report files over their size budget without failing (benchmarks, large local corpora)")
+    ap.add_argument("--tagger", choices=TAGGERS, default=TAGGER,
+                    help="tag with the regex rules or the model trained by scripts/tag_model.py (default: regex)")
+    ap.add_argument("--profile", choices=PROFILE_MODES, default=PIPELINE_PROFILE,
+                    help="profile the run with cProfile or tracemalloc (summary in docs/data/run_report.json)")
+    return ap.parse_args(argv)
 
 
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    metrics.begin("process_data", profile=args.profile)
     print("Processing raw citation data...")
     
-    # Load raw data
-    raw_data_path = DATA_DIR / "raw_citations.json"
-    if not raw_data_path.exists():
-        raise SystemExit(f"Raw data file not found: {raw_data_path}")
+    # Raw data is streamed record by record
+    if raw_records_path() is None and not LEGACY_RAW_PATH.exists():
+        raise SystemExit(f"Raw data file not found: {DATA_DIR / 'raw_citations.ndjson'}")
+    work_info = load_raw_meta().get("work", {})
     
-    with open(raw_data_path, "r", encoding="utf-8") as f:
-        raw_data = json.load(f)
-    
-    items = raw_data.get("results", [])
-    work_info = raw_data.get("work", {})
-    
-    print(f"Loaded {len(items)} papers from raw data")
-    
-    # Apply auto-tagging
-    print("Applying auto-tags...")
-    for item in items:
-        item["tags"] = auto_tags_for(item)
-    
-    # Apply manual overrides
-    overrides = load_overrides()
+    # read -> ordered abstracts -> auto-tag (rules are compiled once per process,
+    # uncached works are matched on --workers processes) -> overrides
+    # (abstracts and tags of unchanged works are reused from the previous run)
+    with metrics.stage("load"):
+        engine = get_engine().track_rules()
+        model = None
+        if args.tagger == "model":
+            model = TagModel.load()
+            if model is None:
+                raise SystemExit("No tag model for the current text_blob(); run python scripts/tag_model.py")
+            metrics.set("tag_model", model.info)
+        cache = None if args.no_cache or model is not None else TagCache.load(engine)
+        texts = None if args.no_cache else TextStore()
+        overrides = load_overrides()
+    # near-duplicates are found in a first, light pass over the raw records
+    with metrics.stage("dedup"):
+        dups = DuplicateIndex().add_all(iter_raw_records()).resolve(overrides)
+    if len(dups) or dups.candidates:
+        print(f"Merging {len(dups)} duplicate works into {len(dups.members)} records"
+              + (f"; {len(dups.candidates)} possible duplicates need review "
+                 "(merge_works / separate_works in overrides.yml):" if dups.candidates else ""))
+        for group in dups.candidates[:20]:
+            print("  " + ", ".join(group))
+    metrics.count("works.merged", len(dups))
+    metrics.set("duplicate_candidates", dups.candidates)
+    items: Iterable[Dict[str,Any]] = metrics.iter_stage("read", iter_raw_records())
+    items = metrics.iter_stage("dedup", iter_dedup(items, dups))
+    items = metrics.iter_stage("abstracts", iter_abstracts(items, texts))
+    if model is not None:
+        items = metrics.iter_stage("tag", iter_model_tagged(items, model, engine))
+    else:
+        items = metrics.iter_stage("tag", iter_tagged(items, engine, cache, args.workers))
     if overrides:
         print("Applying manual overrides...")
-        apply_overrides(items, overrides)
+        items = metrics.iter_stage("overrides", iter_overrides(items, overrides, engine))
     
     # Generate output files
     citations_path = DATA_DIR / "citations.json"
     stats_path = DATA_DIR / "stats.json"
     
-    # Save processed citations
-    with open(citations_path, "w", encoding="utf-8") as f:
-        json.dump({
-            "work": work_info,
-            "results": items
-        }, f, ensure_ascii=False, indent=2)
-    
-    # Generate and save statistics
-    stats = build_stats(items)
-    with open(stats_path, "w", encoding="utf-8") as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
+    # Project display fields and keep the full records while accumulating statistics
+    print("Applying auto-tags and building statistics...")
+    projector = CitationProjector()
+    search = SearchIndexBuilder()
+    authors = AuthorIndex()
+    acc = StatsAccumulator(engine.categories)
+    with NDJSONWriter(FULL_CITATIONS_PATH) as full_writer, metrics.stage("stats"):
+        acc.add_all(metrics.iter_stage("project", iter_project(items, projector, full_writer, search, authors)))
+
+    # Resolve author ids/names to entities with stable integer ids (used by every output)
+    with metrics.stage("authors"):
+        entities = authors.resolve(overrides, load_author_ids())
+        entities.save()
+    with metrics.stage("stats"):
+        stats = acc.resolve_authors(entities).finalize()
+    with metrics.stage("caches"):
+        if texts is not None:
+            texts.prune()
+            texts.close()
+            metrics.set("text_store", {"hits": texts.hits, "misses": texts.misses})
+        if cache is not None:
+            cache.save()
+            print("Tag cache: {} reused, {} checked against new rules, {} retagged".format(*cache.summary()))
+            metrics.set("tag_cache", dict(zip(("reused", "rechecked", "retagged"), cache.summary())))
+    with metrics.stage("write"):
+        payload = projector.payload(work_info, entities)
+        # the previous manifest (or, the first time, the previous citations.json) is the diff base
+        previous = load_manifest(fallback=citations_path)
+        rows = decode_citations(payload)
+        manifest = build_manifest(rows)
+        changelog = build_changelog(previous, manifest, rows)
+        del rows
+        written = [write_json(citations_path, payload), write_json(CHANGELOG_PATH, changelog)]
+        save_manifest(manifest)
+        written.append(write_json(DATA_DIR / "facets.json", build_facets(payload)))
+
+        summary, shards = split_stats(stats)
+        written.append(write_json(stats_path, summary))
+        matrices = build_matrices(payload)
+        if matrices is not None:
+            written.append(write_json(MATRICES_PATH, matrices))
+        else:
+            remove_published([MATRICES_PATH])
+        written += [write_json(shard_path(i), shard) for i, shard in enumerate(shards)]
+        remove_published(p for p in AUTHORS_DIR.glob("*.json") if p not in written)
+
+    with metrics.stage("search"):
+        search_manifest, search_shards = search.build()
+        written.append(write_json(DATA_DIR / "search.json", search_manifest))
+        written += [write_json(SEARCH_DIR / f"{key}.json", shard) for key, shard in search_shards.items()]
+        remove_published(p for p in SEARCH_DIR.glob("*.json") if p not in written)
+
+    with metrics.stage("graph"):
+        graph = build_graph(payload)
+        if graph is not None:
+            written.append(write_json(GRAPH_PATH, graph))
+        else:
+            remove_published([GRAPH_PATH])
+
+    with metrics.stage("history"):
+        trends = update_history(payload)
+        if trends is not None:
+            written.append(write_json(TRENDS_PATH, trends))
+        else:
+            remove_published([TRENDS_PATH])
     
-    print(f"Processed {len(items)} papers")
+    print(f"Processed {len(projector)} papers")
     print(f"Saved processed data to {citations_path}")
-    print(f"Saved statistics to {stats_path}")
+    print(f"Changes since the last run: {len(changelog['added'])} added, {len(changelog['removed'])} removed, "
+          f"{len(changelog['changed'])} changed, {len(changelog['cited_by'])} citation counts updated")
+    print(f"Saved statistics to {stats_path} ({len(shards)} author pages in {AUTHORS_DIR})")
+    print(f"Saved search index: {search_manifest['terms']} terms in {len(search_shards)} shards ({SEARCH_DIR})")
+    if graph is not None:
+        print(f"Saved citation graph: {graph['edges']} citations between {graph['count']} papers, "
+              f"{len(graph['clusters'])} clusters")
+    if trends is not None:
+        print(f"Saved citation trends: {len(trends['days'])} days, {len(trends['rising'])} rising papers")
+
+    metrics.count("works", len(projector))
+    metrics.count("bytes.published", sum(p.stat().st_size for p in written))
+    metrics.set("rules", engine.rule_report())
+    metrics.finish()
+    print(f"Stage times: {metrics.summary()}")
+
+    errors = check_budgets(written)
+    if errors:
+        for e in errors:
+            print(f"Size budget exceeded: {e}")
+        if not args.ignore_budgets:
+            raise SystemExit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
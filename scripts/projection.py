@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Projection of processed works into the display payload served as citations.json.
+
+Only the fields the site renders are kept (title, year, venue, authors, tags,
+citation count, link). Strings that repeat across works (author names, venues,
+tags) are interned into lookup tables and referenced by integer id, and the
+records are stored column by column:
+
+    {"format": "columnar-v1", "work": {...}, "count": N,
+     "dicts": {"authors": [...], "author_ids": [...], "venues": [...], "tags": [...]},
+     "columns": {"id": [...], "title": [...], "year": [...], "venue": [...],
+                 "authors": [[...]], "tags": [[...]], "cited_by_count": [...], "url": [...]}}
+
+Authors are interned per author entity (see authors.py): `dicts.authors[i]` is
+the display name and `dicts.author_ids[i]` the stable integer id of entry i.
+
+The full processed record is kept only as an internal artifact.
+"""
+
+from __future__ import annotations
+from typing import Dict, Any, List, Optional
+
+from authors import AuthorEntities, author_key
+
+FORMAT = "columnar-v1"
+OPENALEX_PREFIX = "https://openalex.org/"
+
+
+class Interner:
+    """Assigns dense integer ids to strings in first-seen order."""
+
+    def __init__(self) -> None:
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def __call__(self, value: str) -> int:
+        i = self.ids.get(value)
+        if i is None:
+            i = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return i
+
+
+def short_id(wid: Optional[str]) -> Optional[str]:
+    if wid and wid.startswith(OPENALEX_PREFIX):
+        return wid[len(OPENALEX_PREFIX):]
+    return wid
+
+
+def full_id(wid: Optional[str]) -> Optional[str]:
+    if wid and not wid.startswith("http"):
+        return OPENALEX_PREFIX + wid
+    return wid
+
+
+def display_url(w: Dict[str, Any]) -> Optional[str]:
+    if w.get("landing_page_url"):
+        return w["landing_page_url"]
+    doi = w.get("doi")
+    if doi:
+        return f"https://doi.org/{doi.replace('https://doi.org/', '')}"
+    return None
+
+
+class CitationProjector:
+    """Accumulates works one at a time into the columnar display payload."""
+
+    def __init__(self) -> None:
+        # author key (OpenAlex id or name) -> display name; resolved to entities in payload()
+        self.authors = Interner()
+        self.author_names: Dict[str, str] = {}
+        self.venues = Interner()
+        self.tags = Interner()
+        self.columns: Dict[str, List[Any]] = {k: [] for k in (
+            "id", "title", "year", "venue", "authors", "tags", "cited_by_count", "url")}
+
+    def add(self, w: Dict[str, Any]) -> int:
+        """Append a work and return its row index."""
+        c = self.columns
+        c["id"].append(short_id(w.get("id")))
+        c["title"].append(w.get("title"))
+        c["year"].append(w.get("publication_year"))
+        c["venue"].append(self.venues(w.get("host_venue") or "Unknown"))
+        row_authors = []
+        for a in (w.get("authorships") or []):
+            if a.get("name"):
+                key = author_key(a)
+                self.author_names[key] = a["name"]
+                row_authors.append(self.authors(key))
+        c["authors"].append(row_authors)
+        c["tags"].append([self.tags(t) for t in (w.get("tags") or [])])
+        c["cited_by_count"].append(int(w.get("cited_by_count") or 0))
+        c["url"].append(display_url(w))
+        return len(c["id"]) - 1
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+    def payload(self, work_info: Dict[str, Any], entities: Optional[AuthorEntities] = None) -> Dict[str, Any]:
+        keys = self.authors.values
+        entity_ids = Interner()
+        if entities is not None:
+            # author keys -> entities; an entity appears once per row
+            remap = [entity_ids(str(entities.entity_of[k])) for k in keys]
+            author_col = [list(dict.fromkeys(remap[a] for a in row)) for row in self.columns["authors"]]
+            ids = [int(e) for e in entity_ids.values]
+            authors = {"authors": [entities.names[e] for e in ids], "author_ids": ids}
+        else:
+            author_col = self.columns["authors"]
+            authors = {"authors": [self.author_names[k] for k in keys]}
+        return {
+            "format": FORMAT,
+            "work": work_info,
+            "count": len(self),
+            "dicts": {**authors, "venues": self.venues.values, "tags": self.tags.values},
+            "columns": {**self.columns, "authors": author_col},
+        }
+
+
+def decode_citations(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Expand citations.json (columnar or the older `results` list) into per-work dicts."""
+    if data.get("format") != FORMAT:
+        return data.get("results", [])
+    d, c = data["dicts"], data["columns"]
+    return [
+        {
+            "id": full_id(c["id"][i]),
+            "title": c["title"][i],
+            "publication_year": c["year"][i],
+            "host_venue": d["venues"][c["venue"][i]],
+            "authorships": [
+                {"name": d["authors"][a], **({"id": d["author_ids"][a]} if "author_ids" in d else {})}
+                for a in c["authors"][i]
+            ],
+            "tags": [d["tags"][t] for t in c["tags"][i]],
+            "cited_by_count": c["cited_by_count"][i],
+            "url": c["url"][i],
+        }
+        for i in range(data["count"])
+    ]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Helpers for writing the JSON files served by the site (docs/data).
+
+- Output is compact (no indentation) and written atomically.
+- Every published file gets precompressed `.gz` and, when the optional
+  `brotli` package is installed, `.br` siblings.
+- `check_budgets()` fails the build when a file exceeds its size budget.
+"""
+
+from __future__ import annotations
+import os, gzip, json, fnmatch
+from pathlib import Path
+from typing import Dict, Any, Iterable, List
+
+try:
+    import brotli  # type: ignore
+except Exception:
+    brotli = None  # optional
+
+from rawstore import tmp_path
+
+ROOT = Path(__file__).resolve().parents[1]
+DOCS = ROOT / "docs"
+DATA_DIR = DOCS / "data"
+
+# Uncompressed size budgets (bytes) for published files, by glob relative to docs/data
+SIZE_BUDGETS: Dict[str, int] = {
+    "citations.json": 1024 * 1024,
+    "facets.json": 512 * 1024,
+    "changelog.json": 512 * 1024,
+    "stats.json": 64 * 1024,
+    "authors/*.json": 64 * 1024,
+    "search.json": 16 * 1024,
+    "search/*.json": 128 * 1024,
+    "graph.json": 256 * 1024,
+    "trends.json": 256 * 1024,
+    "matrices.json": 64 * 1024,
+}
+
+
+def dumps_compact(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_json(path: Path, obj: Any, compress: bool = True) -> Path:
+    """Write `obj` as compact JSON (plus precompressed variants)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = tmp_path(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(dumps_compact(obj))
+    os.replace(tmp, path)
+    if compress:
+        precompress(path)
+    return path
+
+
+def precompress(path: Path) -> None:
+    """Write `<path>.gz` (and `<path>.br` if brotli is available) next to `path`."""
+    data = path.read_bytes()
+    gz = path.with_name(path.name + ".gz")
+    # mtime=0 keeps the .gz byte-identical across runs with the same content
+    with open(gz, "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(data, quality=11))
+
+
+def remove_published(paths: Iterable[Path]) -> None:
+    """Delete published files and their precompressed variants."""
+    for p in paths:
+        for q in (p, p.with_name(p.name + ".gz"), p.with_name(p.name + ".br")):
+            if q.exists():
+                q.unlink()
+
+
+def check_budgets(paths: Iterable[Path], budgets: Dict[str, int] = SIZE_BUDGETS) -> List[str]:
+    """Return a message for every file that exceeds its budget."""
+    errors: List[str] = []
+    for p in paths:
+        rel = p.relative_to(DATA_DIR).as_posix()
+        for pattern, limit in budgets.items():
+            if fnmatch.fnmatch(rel, pattern):
+                size = p.stat().st_size
+                if size > limit:
+                    errors.append(f"{rel}: {size:,} bytes exceeds budget of {limit:,} bytes")
+    return errors
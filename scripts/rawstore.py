@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Newline-delimited JSON storage for raw citation records.
+
+- One work per line in raw_citations.ndjson (or raw_citations.ndjson.gz), so
+  records can be written as pages arrive and read back as a stream.
+- Run metadata (target works, fetch mode, watermarks) lives in a small
+  raw_citations.meta.json sidecar.
+- Files are written to a temporary path and renamed into place on success.
+- Fetch parts are appended to with `AppendWriter`, which can resume an
+  interrupted part from the last synced offset.
+- The legacy single-document raw_citations.json is still readable.
+"""
+
+from __future__ import annotations
+import os, io, gzip, json
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+DOCS = ROOT / "docs"
+DATA_DIR = DOCS / "data"
+# Local, git-ignored working files (fetch parts, caches)
+BUILD_DIR = ROOT / "data" / "build"
+
+RAW_NDJSON_PATH = DATA_DIR / "raw_citations.ndjson"
+RAW_GZIP_PATH = DATA_DIR / "raw_citations.ndjson.gz"
+RAW_META_PATH = DATA_DIR / "raw_citations.meta.json"
+LEGACY_RAW_PATH = DATA_DIR / "raw_citations.json"
+
+
+def open_text(path: Path, mode: str = "r") -> io.TextIOBase:
+    """Open a text file, transparently (de)compressing `.gz` paths."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+
+def tmp_path(path: Path) -> Path:
+    """Sibling temporary path that keeps the final suffix (so `.gz` still compresses)."""
+    return path.with_name(f"{path.stem}.tmp{path.suffix}")
+
+
+def raw_records_path() -> Optional[Path]:
+    """The existing raw records file (gzip preferred), or None."""
+    for p in (RAW_GZIP_PATH, RAW_NDJSON_PATH):
+        if p.exists():
+            return p
+    return None
+
+
+def iter_ndjson(path: Path) -> Iterator[Dict[str, Any]]:
+    with open_text(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_raw_records() -> Iterator[Dict[str, Any]]:
+    """Stream raw records from the NDJSON store (or the legacy JSON document)."""
+    path = raw_records_path()
+    if path is not None:
+        yield from iter_ndjson(path)
+    elif LEGACY_RAW_PATH.exists():
+        with open(LEGACY_RAW_PATH, "r", encoding="utf-8") as f:
+            yield from json.load(f).get("results", [])
+
+
+def load_raw_meta() -> Dict[str, Any]:
+    """Run metadata; falls back to the header fields of the legacy JSON document."""
+    if RAW_META_PATH.exists():
+        with open(RAW_META_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    if raw_records_path() is None and LEGACY_RAW_PATH.exists():
+        with open(LEGACY_RAW_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data.pop("results", None)
+        return data
+    return {}
+
+
+def save_raw_meta(meta: Dict[str, Any]) -> None:
+    write_json_atomic(RAW_META_PATH, meta, indent=2)
+
+
+def write_json_atomic(path: Path, obj: Any, **kwargs: Any) -> None:
+    tmp = tmp_path(path)
+    with open_text(tmp, "w") as f:
+        json.dump(obj, f, ensure_ascii=False, **kwargs)
+    os.replace(tmp, path)
+
+
+class NDJSONWriter:
+    """Write records one per line to a temporary file; `commit()` renames it into place."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = tmp_path(path)
+        self.f = open_text(self.tmp, "w")
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.f.write("\n")
+        self.count += 1
+
+    def write_all(self, records: Iterable[Dict[str, Any]]) -> None:
+        for r in records:
+            self.write(r)
+
+    def commit(self) -> Path:
+        self.f.close()
+        os.replace(self.tmp, self.path)
+        return self.path
+
+    def abort(self) -> None:
+        self.f.close()
+        if self.tmp.exists():
+            self.tmp.unlink()
+
+    def __enter__(self) -> "NDJSONWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class AppendWriter:
+    """Append records to `path`, starting at byte `offset` (anything after it is cut off).
+
+    `sync()` makes the records written so far durable and returns the offset
+    to resume from.
+    """
+
+    def __init__(self, path: Path, offset: int = 0):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(path, "r+b" if path.exists() else "wb")
+        self.f.truncate(offset)
+        self.f.seek(offset)
+        self.count = 0
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self.f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.count += 1
+
+    def sync(self) -> int:
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        return self.f.tell()
+
+    def close(self) -> None:
+        self.f.close()
+
+    def __enter__(self) -> "AppendWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def raw_writer(compress: bool = False) -> NDJSONWriter:
+    return NDJSONWriter(RAW_GZIP_PATH if compress else RAW_NDJSON_PATH)
+
+
+def finalize_raw(path: Path) -> None:
+    """Remove stale variants once `path` is the new raw records file."""
+    for p in (RAW_GZIP_PATH, RAW_NDJSON_PATH, LEGACY_RAW_PATH):
+        if p != path and p.exists():
+            p.unlink()
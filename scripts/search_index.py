@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Offline full-text search over titles, abstracts and concepts.
+
+process_data builds a BM25 inverted index while it projects citations.json;
+document ids are row numbers of citations.json (as in facets.json).
+
+- Text is NFKD-folded, lowercased, split into [a-z0-9]+ tokens, stop words
+  are dropped and a small suffix stemmer is applied. The analyzer settings are
+  published in the manifest so the site tokenizes queries the same way.
+- Title terms count TITLE_WEIGHT times. Each posting stores the BM25 weight of
+  the term in the document, quantized to an integer (x WEIGHT_SCALE), so a
+  query score is the sum of the weights of its terms (all terms required).
+- Postings are delta-encoded and sharded by term prefix: terms are grouped by
+  their first character, and groups larger than SHARD_POSTINGS are split on
+  the next character. The site fetches only the shards of the query terms.
+
+    data/search.json        {"format": "bm25-v1", "count": N, "analyzer": {...}, "shards": ["a", "co", ...]}
+    data/search/<key>.json  {"term": [[row deltas], [weights]], ...}
+
+Command line:
+
+    python scripts/search_index.py "learned bloom filter" [--limit 20]
+"""
+
+from __future__ import annotations
+import re, math, json, argparse, unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+FORMAT = "bm25-v1"
+TITLE_WEIGHT = 3
+K1 = 1.2
+B = 0.75
+WEIGHT_SCALE = 10
+SHARD_POSTINGS = 8000
+MAX_PREFIX = 3
+MIN_TOKEN = 2
+MIN_STEM = 3
+
+STOPWORDS = sorted("""
+a an and are as at be based but by can for from has have in into is it its not of on or our
+such than that the their these this to using was we were which with
+""".split())
+
+# (suffix, replacement), first match wins; entries mapping to themselves stop stemming
+SUFFIXES: List[Tuple[str, str]] = [
+    ("sses", "ss"), ("ies", "y"), ("ied", "y"), ("xes", "x"), ("ches", "ch"), ("shes", "sh"),
+    ("ss", "ss"), ("us", "us"), ("is", "is"), ("eed", "eed"),
+    ("ingly", ""), ("edly", ""), ("ing", ""), ("ed", ""), ("ly", ""), ("s", ""),
+]
+
+ANALYZER = {
+    "min_token": MIN_TOKEN,
+    "min_stem": MIN_STEM,
+    "stopwords": STOPWORDS,
+    "suffixes": SUFFIXES,
+}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MARKS_RE = re.compile("[\u0300-\u036f]")
+_STOP = frozenset(STOPWORDS)
+
+
+def stem(term: str) -> str:
+    if len(term) <= MIN_STEM or term.isdigit():
+        return term
+    for suffix, rep in SUFFIXES:
+        if term.endswith(suffix):
+            cut = term[:len(term) - len(suffix)] + rep
+            if len(cut) >= MIN_STEM:
+                term = cut
+            break
+    # "structure" / "structured" -> "structur"
+    if len(term) > 4 and term.endswith("e"):
+        term = term[:-1]
+    return term
+
+
+def analyze(text: Optional[str]) -> List[str]:
+    """Index terms of `text`, in order."""
+    if not text:
+        return []
+    folded = MARKS_RE.sub("", unicodedata.normalize("NFKD", text).lower())
+    return [stem(t) for t in TOKEN_RE.findall(folded) if len(t) >= MIN_TOKEN and t not in _STOP]
+
+
+class SearchIndexBuilder:
+    """Collects term frequencies row by row; `build()` computes the BM25 postings."""
+
+    def __init__(self) -> None:
+        # term -> (rows, term frequencies)
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.lengths = array("I")
+
+    def add(self, row: int, work: Dict[str, Any]) -> None:
+        assert row == len(self.lengths), "rows must be added in order"
+        tf: Dict[str, int] = {}
+        for t in analyze(work.get("title")):
+            tf[t] = tf.get(t, 0) + TITLE_WEIGHT
+        body = [work.get("abstract") or ""]
+        body += [c.get("display_name") or "" for c in (work.get("concepts") or [])]
+        for t in analyze(" ".join(body)):
+            tf[t] = tf.get(t, 0) + 1
+        for t, n in tf.items():
+            p = self.postings.get(t)
+            if p is None:
+                p = self.postings[t] = (array("I"), array("I"))
+            p[0].append(row)
+            p[1].append(n)
+        self.lengths.append(sum(tf.values()))
+
+    def build(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, List[List[int]]]]]:
+        """(manifest, shards by key)."""
+        n = len(self.lengths)
+        avgdl = (sum(self.lengths) / n) if n else 1.0
+        lengths = self.lengths
+        encoded: Dict[str, List[List[int]]] = {}
+        for term, (rows, tfs) in self.postings.items():
+            df = len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            deltas, weights, prev = [], [], 0
+            for r, f in zip(rows, tfs):
+                norm = f + K1 * (1 - B + B * lengths[r] / avgdl)
+                weights.append(max(1, round(WEIGHT_SCALE * idf * f * (K1 + 1) / norm)))
+                deltas.append(r - prev)
+                prev = r
+            encoded[term] = [deltas, weights]
+        shards = shard_terms(encoded)
+        manifest = {
+            "format": FORMAT,
+            "count": n,
+            "terms": len(encoded),
+            "weight_scale": WEIGHT_SCALE,
+            "analyzer": ANALYZER,
+            "shards": sorted(shards),
+        }
+        return manifest, shards
+
+
+def shard_terms(encoded: Dict[str, List[List[int]]], depth: int = 1,
+                terms: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, List[List[int]]]]:
+    """Group terms by prefix, splitting groups larger than SHARD_POSTINGS."""
+    groups: Dict[str, List[str]] = {}
+    for t in (encoded if terms is None else terms):
+        groups.setdefault(t[:depth], []).append(t)
+    out: Dict[str, Dict[str, List[List[int]]]] = {}
+    for key, members in groups.items():
+        size = sum(len(encoded[t][0]) for t in members)
+        if size > SHARD_POSTINGS and depth < MAX_PREFIX and any(len(t) > depth for t in members):
+            out.update(shard_terms(encoded, depth + 1, members))
+        else:
+            out[key] = {t: encoded[t] for t in sorted(members)}
+    return out
+
+
+def shard_key(term: str, keys: Iterable[str]) -> Optional[str]:
+    """The shard holding `term`: the longest key that is a prefix of it."""
+    best = None
+    for k in keys:
+        if term.startswith(k) and (best is None or len(k) > len(best)):
+            best = k
+    return best
+
+
+class SearchIndex:
+    """Query API over the published index (docs/data/search.json + shards)."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        with open(data_dir / "search.json", "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != FORMAT:
+            raise ValueError(f"Unsupported search index format: {self.manifest.get('format')}")
+        self.shards: Dict[str, Dict[str, List[List[int]]]] = {}
+
+    def postings(self, term: str) -> Dict[int, int]:
+        """row -> weight for one analyzed term."""
+        key = shard_key(term, self.manifest["shards"])
+        if key is None:
+            return {}
+        if key not in self.shards:
+            with open(self.data_dir / "search" / f"{key}.json", "r", encoding="utf-8") as f:
+                self.shards[key] = json.load(f)
+        entry = self.shards[key].get(term)
+        if not entry:
+            return {}
+        out, row = {}, 0
+        for d, w in zip(*entry):
+            row += d
+            out[row] = w
+        return out
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Rows matching every query term, best BM25 score first."""
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms:
+            return []
+        lists = sorted((self.postings(t) for t in terms), key=len)
+        scores = dict(lists[0])
+        for p in lists[1:]:
+            scores = {r: s + p[r] for r, s in scores.items() if r in p}
+        scale = self.manifest.get("weight_scale", WEIGHT_SCALE)
+        ranked = sorted(((r, s / scale) for r, s in scores.items()), key=lambda x: (-x[1], x[0]))
+        return ranked[:limit] if limit else ranked
+
+
+def main() -> None:
+    from projection import decode_citations
+    root = Path(__file__).resolve().parents[1]
+    data_dir = root / "docs" / "data"
+    ap = argparse.ArgumentParser(description="Search the published paper index")
+    ap.add_argument("query")
+    ap.add_argument("--limit", type=int, default=20)
+    args = ap.parse_args()
+
+    index = SearchIndex(data_dir)
+    hits = index.search(args.query, args.limit)
+    if not hits:
+        print("No matches")
+        return
+    with open(data_dir / "citations.json", "r", encoding="utf-8") as f:
+        papers = decode_citations(json.load(f))
+    for row, score in hits:
+        w = papers[row]
+        print(f"{score:6.2f}  {w.get('publication_year') or '----'}  {w.get('title')}")
+
+
+if __name__ == "__main__":
+    main()
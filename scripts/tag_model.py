@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Learned alternative to the regex tagger: one-vs-rest linear classifiers over
+hashed bag-of-words features, trained from the regex tags and the manual
+corrections of data/overrides.yml.
+
+- Features: the words and adjacent word pairs of `text_blob()` are hashed
+  (CRC32) into N_FEATURES buckets. A work is a binary row, L2-normalized, of a
+  CSR matrix (`indptr`, `indices`, `data` arrays), so a corpus is featurized
+  with a few NumPy operations after tokenizing.
+- Labels: the regex tags of every work (with implied tags), with the
+  `add_tags` / `remove_tags` of overrides.yml applied. Works with a correction
+  weigh OVERRIDE_WEIGHT times as much in the loss, so the model can move away
+  from the rules where they are known to be wrong (e.g. the broad
+  "update|online" pattern of `Updatable`).
+- Model: one logistic regression per tag (weights of all tags in one
+  features x tags matrix), trained by full-batch AdaGrad. With far more
+  features than works the fit memorizes its training rows, so each tag's score
+  threshold is the one that maximizes its F1 on out-of-fold scores (FOLDS
+  models, each scoring the rows it was not fitted to).
+- Scoring: `X @ W + b` as one sparse-times-dense product (segment sums over
+  the CSR rows, split only to bound memory), independent of the number of
+  rules.
+
+`python scripts/tag_model.py` trains on data/build/citations_full.ndjson.gz
+(written by process_data), holds out every HOLDOUT-th work to report per-tag
+precision / recall of the model against the regex labels, refits on all works
+and saves data/build/tag_model.npz. The report (also written to
+data/build/tag_model_report.json) lists, per tag, the held-out precision,
+recall and F1 and the number of works tagged by the rules and by the model
+over the whole corpus (out-of-fold predictions). `python scripts/process_data.py --tagger model` then
+tags with the saved model instead of the rules. Requires NumPy.
+"""
+
+from __future__ import annotations
+import json, time, zlib, argparse
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # optional
+
+from tagging import TagEngine, WORD_RE, BLOB_VERSION, get_engine, text_blob
+from rawstore import iter_ndjson, tmp_path, write_json_atomic, BUILD_DIR
+
+TAG_MODEL_PATH = BUILD_DIR / "tag_model.npz"
+TAG_MODEL_REPORT_PATH = BUILD_DIR / "tag_model_report.json"
+TRAINING_PATH = BUILD_DIR / "citations_full.ndjson.gz"
+FORMAT = "tag-model-v1"
+
+# Hash buckets for words and word pairs (power of two)
+N_FEATURES = 1 << 18
+EPOCHS = 60
+LEARNING_RATE = 0.5
+L2 = 1e-5
+# Loss weight of works with a manual tag correction
+OVERRIDE_WEIGHT = 5.0
+# Every HOLDOUT-th work (by id hash) is held out for the evaluation
+HOLDOUT = 5
+# Folds for the out-of-fold scores the thresholds are chosen on
+FOLDS = 3
+# Tags with fewer training works are not learned
+MIN_SUPPORT = 3
+# Works featurized at once
+FEATURIZE_CHUNK = 4096
+# Nonzeros per block of a sparse product (bounds the temporary nnz x tags array)
+BLOCK_NNZ = 1 << 19
+
+
+class FeatureHasher:
+    """Hashed word / word-pair features of text blobs; word hashes are memoized."""
+
+    def __init__(self, n_features: int = N_FEATURES):
+        self.mask = n_features - 1
+        self.words: Dict[str, int] = {}
+
+    def word_hashes(self, blob: str) -> List[int]:
+        words = self.words
+        out = []
+        for tok in WORD_RE.findall(blob):
+            h = words.get(tok)
+            if h is None:
+                h = words[tok] = zlib.crc32(tok.encode("utf-8"))
+            out.append(h)
+        return out
+
+    def transform(self, blobs: List[str]) -> "SparseRows":
+        """CSR matrix of `blobs`: one binary, L2-normalized row per blob."""
+        hashes = [self.word_hashes(b) for b in blobs]
+        lengths = np.fromiter((len(h) for h in hashes), dtype=np.int64, count=len(hashes))
+        words = np.fromiter((h for hs in hashes for h in hs), dtype=np.uint64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(blobs), dtype=np.int64), lengths)
+        # pairs of adjacent words of the same blob
+        same = rows[1:] == rows[:-1]
+        pairs = (words[:-1][same] * np.uint64(0x9E3779B97F4A7C15)) ^ words[1:][same]
+        pairs = (pairs * np.uint64(0xBF58476D1CE4E5B9)) >> np.uint64(29)
+        cols = np.concatenate([words, pairs]) & np.uint64(self.mask)
+        rows = np.concatenate([rows, rows[1:][same]])
+        keys = np.unique(rows * (self.mask + 1) + cols.astype(np.int64))
+        rows, cols = keys // (self.mask + 1), keys % (self.mask + 1)
+        counts = np.bincount(rows, minlength=len(blobs))
+        indptr = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        data = (1.0 / np.sqrt(np.maximum(counts, 1)))[rows].astype(np.float32)
+        return SparseRows(indptr, cols, data)
+
+
+class SparseRows:
+    """Rows of a CSR matrix with the two products needed for training and scoring."""
+
+    def __init__(self, indptr: "np.ndarray", indices: "np.ndarray", data: "np.ndarray"):
+        self.indptr, self.indices, self.data = indptr, indices, data
+        self._by_col: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @staticmethod
+    def concat(parts: List["SparseRows"]) -> "SparseRows":
+        offsets = np.cumsum([0] + [int(p.indptr[-1]) for p in parts[:-1]])
+        indptr = np.concatenate([np.zeros(1, dtype=np.int64)] +
+                                [p.indptr[1:] + o for p, o in zip(parts, offsets)])
+        return SparseRows(indptr, np.concatenate([p.indices for p in parts]),
+                          np.concatenate([p.data for p in parts]))
+
+    def take(self, rows: "np.ndarray") -> "SparseRows":
+        lengths = np.diff(self.indptr)[rows]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        # positions of the nonzeros of the selected rows
+        pos = np.repeat(self.indptr[rows] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return SparseRows(indptr, self.indices[pos], self.data[pos])
+
+    def remap(self, features: "np.ndarray") -> "SparseRows":
+        """Columns renumbered to positions in the sorted `features`; other columns dropped."""
+        at = np.searchsorted(features, self.indices)
+        at = np.minimum(at, len(features) - 1) if len(features) else at
+        known = features[at] == self.indices if len(features) else np.zeros(len(at), dtype=bool)
+        row = np.repeat(np.arange(len(self)), np.diff(self.indptr))[known]
+        indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row, minlength=len(self)), out=indptr[1:])
+        return SparseRows(indptr, at[known], self.data[known])
+
+    def dot(self, w: "np.ndarray") -> "np.ndarray":
+        """self @ w for a dense (features x k) matrix."""
+        out = np.zeros((len(self), w.shape[1]), dtype=np.float32)
+        indptr = self.indptr
+        start = 0
+        while start < len(self):
+            # rows whose nonzeros fit in one block (at least one row)
+            end = max(int(np.searchsorted(indptr, indptr[start] + BLOCK_NNZ, side="right")) - 1, start + 1)
+            end = min(end, len(self))
+            lo, hi = indptr[start], indptr[end]
+            if hi > lo:
+                prod = self.data[lo:hi, None] * w[self.indices[lo:hi]]
+                starts = indptr[start:end] - lo
+                filled = starts < indptr[start + 1:end + 1] - lo
+                out[start:end][filled] = np.add.reduceat(prod, starts[filled], axis=0)
+            start = end
+        return out
+
+    def tdot(self, r: "np.ndarray", n_features: int) -> "np.ndarray":
+        """self.T @ r for a dense (rows x k) matrix; the column order is built once."""
+        if self._by_col is None:
+            order = np.argsort(self.indices, kind="stable")
+            rows = np.repeat(np.arange(len(self)), np.diff(self.indptr))[order]
+            cols, first = np.unique(self.indices[order], return_index=True)
+            self._by_col = (rows, self.data[order], cols, first)
+        rows, data, cols, first = self._by_col
+        out = np.zeros((n_features, r.shape[1]), dtype=np.float32)
+        bounds = np.append(first, len(rows))
+        cuts = np.unique(np.append(np.searchsorted(first, np.arange(0, len(rows), BLOCK_NNZ)), len(cols)))
+        for a, b in zip(cuts[:-1], cuts[1:]):
+            lo, hi = bounds[a], bounds[b]
+            prod = data[lo:hi, None] * r[rows[lo:hi]]
+            out[cols[a:b]] = np.add.reduceat(prod, first[a:b] - lo, axis=0)
+        return out
+
+
+def _sigmoid(z: "np.ndarray") -> "np.ndarray":
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def fit_weights(x: "SparseRows", labels: "np.ndarray", sample_weight: "np.ndarray",
+                epochs: int = EPOCHS) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """(features, weights, bias) of one logistic regression per label column."""
+    features = np.unique(x.indices)
+    x = x.remap(features)
+    y = labels.astype(np.float32)
+    sw = (sample_weight / sample_weight.sum())[:, None].astype(np.float32)
+    w = np.zeros((len(features), labels.shape[1]), dtype=np.float32)
+    prior = np.clip((y * sw).sum(axis=0), 1e-4, 1 - 1e-4)
+    b = np.log(prior / (1 - prior)).astype(np.float32)
+    gw_sq = np.full_like(w, 1e-8)
+    gb_sq = np.full_like(b, 1e-8)
+    for _ in range(epochs):
+        r = (_sigmoid(x.dot(w) + b) - y) * sw
+        gw = x.tdot(r, len(features)) + L2 * w
+        gb = r.sum(axis=0)
+        gw_sq += gw * gw
+        gb_sq += gb * gb
+        w -= LEARNING_RATE * gw / np.sqrt(gw_sq)
+        b -= LEARNING_RATE * gb / np.sqrt(gb_sq)
+    return features, w, b
+
+
+def best_thresholds(scores: "np.ndarray", labels: "np.ndarray") -> "np.ndarray":
+    """Per column, the score threshold with the highest F1 on (scores, labels)."""
+    out = np.zeros(scores.shape[1], dtype=np.float32)
+    for t in range(scores.shape[1]):
+        order = np.argsort(-scores[:, t], kind="stable")
+        s, y = scores[order, t], labels[order, t]
+        positives = y.sum()
+        if positives == 0:
+            out[t] = np.inf
+            continue
+        tp = np.cumsum(y)
+        k = np.arange(1, len(y) + 1)
+        f1 = 2 * tp / (k + positives)
+        best = int(np.argmax(f1))
+        out[t] = (s[best] + s[best + 1]) / 2 if best + 1 < len(s) else s[best] - 1
+    return out
+
+
+class TagModel:
+    """Linear one-vs-rest classifiers over the hashed features seen in training."""
+
+    def __init__(self, tags: List[str], features: "np.ndarray", weights: "np.ndarray",
+                 bias: "np.ndarray", thresholds: "np.ndarray", info: Optional[Dict[str, Any]] = None):
+        self.tags = tags
+        self.features = features  # sorted hash buckets, one weight row each
+        self.weights = weights
+        self.bias = bias
+        self.thresholds = thresholds
+        self.info = info or {}
+        self.hasher = FeatureHasher()
+        self.fold_scores: Optional["np.ndarray"] = None
+
+    @classmethod
+    def train(cls, x: "SparseRows", labels: "np.ndarray", tags: List[str],
+              sample_weight: Optional["np.ndarray"] = None, epochs: int = EPOCHS) -> "TagModel":
+        """Fit on every row; thresholds from out-of-fold scores (kept as `fold_scores`)."""
+        n = len(x)
+        sw = np.ones(n, dtype=np.float32) if sample_weight is None else sample_weight.astype(np.float32)
+        fold = np.arange(n) % FOLDS
+        scores = np.zeros(labels.shape, dtype=np.float32)
+        for k in range(FOLDS if n >= 2 * FOLDS else 0):
+            fit, out = np.flatnonzero(fold != k), np.flatnonzero(fold == k)
+            part = cls(tags, *fit_weights(x.take(fit), labels[fit], sw[fit], epochs), np.zeros(0))
+            scores[out] = part.scores(x.take(out))
+        model = cls(tags, *fit_weights(x, labels, sw, epochs), np.zeros(0))
+        if n < 2 * FOLDS:
+            scores = model.scores(x)
+        model.thresholds = best_thresholds(scores, labels)
+        model.fold_scores = scores
+        return model
+
+    def scores(self, x: "SparseRows") -> "np.ndarray":
+        """Decision scores (works x tags) of hashed rows, one sparse product."""
+        return x.remap(self.features).dot(self.weights) + self.bias
+
+    def predict(self, x: "SparseRows") -> "np.ndarray":
+        return self.scores(x) > self.thresholds
+
+    def tag_blobs(self, blobs: List[str], engine: Optional[TagEngine] = None) -> List[List[str]]:
+        """Sorted tags per blob (implied tags of `engine` added)."""
+        hits = self.predict(self.hasher.transform(blobs))
+        out = []
+        for row in hits:
+            tags = {self.tags[t] for t in np.flatnonzero(row).tolist()}
+            out.append(sorted(engine.expand_implied(tags) if engine is not None else tags))
+        return out
+
+    def save(self, path: Path = TAG_MODEL_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        info = dict(self.info, format=FORMAT, blob_version=BLOB_VERSION, tags=self.tags)
+        tmp = tmp_path(path)
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, features=self.features, weights=self.weights.astype(np.float16),
+                                bias=self.bias, thresholds=self.thresholds,
+                                info=np.frombuffer(json.dumps(info).encode("utf-8"), dtype=np.uint8))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = TAG_MODEL_PATH) -> Optional["TagModel"]:
+        """The saved model, or None if there is none or it was built for another text_blob()."""
+        if np is None or not path.exists():
+            return None
+        with np.load(path) as z:
+            info = json.loads(z["info"].tobytes().decode("utf-8"))
+            if info.get("format") != FORMAT or info.get("blob_version") != BLOB_VERSION:
+                return None
+            tags = info.pop("tags")
+            return cls(tags, z["features"], z["weights"].astype(np.float32), z["bias"], z["thresholds"],
+                       {k: v for k, v in info.items() if k not in ("format", "blob_version")})
+
+
+# -- training data ---------------------------------------------------------
+
+def corrections(overrides: Dict[str, Any]) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+    add = {k: set(v or []) for k, v in (overrides.get("add_tags", {}) or {}).items()}
+    remove = {k: set(v or []) for k, v in (overrides.get("remove_tags", {}) or {}).items()}
+    return add, remove
+
+
+def training_set(works: Iterable[Dict[str, Any]], engine: TagEngine, overrides: Dict[str, Any]
+                 ) -> Tuple[List[str], List[str], List[List[str]], List[List[str]], List[bool]]:
+    """(ids, blobs, regex tags, corrected tags, corrected?) of full records."""
+    add, remove = corrections(overrides)
+    hide = set(overrides.get("hide", []) or [])
+    ids, blobs, regex, labels, fixed = [], [], [], [], []
+    for w in works:
+        wid = w.get("id")
+        if wid in hide:
+            continue
+        blob = text_blob(w)
+        tags = engine.tags_for_blob(blob)
+        cur = set(tags)
+        for i in [wid] + (w.get("merged") or []):
+            cur = (cur - remove.get(i, set())) | engine.expand_implied(set(add.get(i, ())))
+        ids.append(wid)
+        blobs.append(blob)
+        regex.append(tags)
+        labels.append(sorted(cur))
+        fixed.append(cur != set(tags))
+    return ids, blobs, regex, labels, fixed
+
+
+def label_matrix(rows: List[List[str]], tags: List[str]) -> "np.ndarray":
+    col = {t: i for i, t in enumerate(tags)}
+    out = np.zeros((len(rows), len(tags)), dtype=bool)
+    for r, row in enumerate(rows):
+        for t in row:
+            if t in col:
+                out[r, col[t]] = True
+    return out
+
+
+def holdout_mask(ids: List[str]) -> "np.ndarray":
+    return np.fromiter((zlib.crc32((i or "").encode("utf-8")) % HOLDOUT == 0 for i in ids),
+                       dtype=bool, count=len(ids))
+
+
+def evaluate(predicted: "np.ndarray", labels: "np.ndarray", tags: List[str]) -> List[Dict[str, Any]]:
+    """Per-tag precision / recall / F1 of `predicted` against `labels`."""
+    tp = (predicted & labels).sum(axis=0)
+    n_pred, n_true = predicted.sum(axis=0), labels.sum(axis=0)
+    out = []
+    for t, name in enumerate(tags):
+        p = tp[t] / n_pred[t] if n_pred[t] else 0.0
+        r = tp[t] / n_true[t] if n_true[t] else 0.0
+        out.append({"tag": name, "support": int(n_true[t]), "predicted": int(n_pred[t]),
+                    "precision": round(float(p), 3), "recall": round(float(r), 3),
+                    "f1": round(float(2 * p * r / (p + r)) if p + r else 0.0, 3)})
+    return out
+
+
+def train_and_report(works: Iterable[Dict[str, Any]], engine: TagEngine, overrides: Dict[str, Any],
+                     epochs: int = EPOCHS) -> Tuple[TagModel, Dict[str, Any]]:
+    """Held-out evaluation, then the model refitted on every work."""
+    t0 = time.perf_counter()
+    ids, blobs, regex, labels, fixed = training_set(works, engine, overrides)
+    if not ids:
+        raise SystemExit("No training works")
+    hasher = FeatureHasher()
+    x = SparseRows.concat([hasher.transform(blobs[i:i + FEATURIZE_CHUNK])
+                           for i in range(0, len(blobs), FEATURIZE_CHUNK)])
+    counts: Dict[str, int] = {}
+    for row in labels:
+        for t in row:
+            counts[t] = counts.get(t, 0) + 1
+    tags = sorted(t for t, c in counts.items() if c >= MIN_SUPPORT)
+    y = label_matrix(labels, tags)
+    weight = np.where(np.asarray(fixed), OVERRIDE_WEIGHT, 1.0)
+    held = holdout_mask(ids)
+    train = np.flatnonzero(~held)
+    test = np.flatnonzero(held)
+
+    model = TagModel.train(x.take(train), y[train], tags, weight[train], epochs)
+    predicted = model.predict(x.take(test))
+    per_tag = evaluate(predicted, y[test], tags)
+    # corrected held-out works: how many of the corrected (work, tag) labels the model gets right
+    regex_y = label_matrix(regex, tags)
+    fixed_test = np.asarray(fixed, dtype=bool)[test]
+    truth = y[test][fixed_test]
+    changed = regex_y[test][fixed_test] != truth
+    agrees = int((predicted[fixed_test] == truth)[changed].sum())
+
+    model = TagModel.train(x, y, tags, weight, epochs)
+    model_all = model.fold_scores > model.thresholds
+    n_regex, n_model = regex_y.sum(axis=0), model_all.sum(axis=0)
+    for row, t in zip(per_tag, range(len(tags))):
+        row["regex_count"], row["model_count"] = int(n_regex[t]), int(n_model[t])
+    report = {
+        "format": "tag-model-report-v1",
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "works": len(ids),
+        "train": int(len(train)),
+        "holdout": int(len(test)),
+        "features": int(len(model.features)),
+        "epochs": epochs,
+        "seconds": round(time.perf_counter() - t0, 2),
+        "not_learned": sorted(t for t, c in counts.items() if c < MIN_SUPPORT),
+        "corrections": {
+            "works": int(np.asarray(fixed).sum()),
+            "holdout_labels": int(changed.sum()),
+            "model_agrees": agrees,
+        },
+        "tags": sorted(per_tag, key=lambda r: -r["support"]),
+    }
+    model.info = {k: report[k] for k in ("trained_at", "works", "features", "epochs")}
+    return model, report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"{report['works']} works ({report['holdout']} held out), {report['features']} features, "
+          f"{report['seconds']}s")
+    print(f"{'tag':32} {'prec':>6} {'recall':>6} {'f1':>6} {'regex':>6} {'model':>6}")
+    for r in report["tags"]:
+        print(f"{r['tag'][:32]:32} {r['precision']:6.3f} {r['recall']:6.3f} {r['f1']:6.3f} "
+              f"{r['regex_count']:6d} {r['model_count']:6d}")
+    c = report["corrections"]
+    if c["works"]:
+        print(f"Corrections: {c['works']} works; the model reproduces "
+              f"{c['model_agrees']}/{c['holdout_labels']} corrected held-out labels")
+    if report["not_learned"]:
+        print("Too few works to learn: " + ", ".join(report["not_learned"]))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Train the learned tagger and compare it with the regex rules.")
+    ap.add_argument("--input", type=Path, default=TRAINING_PATH,
+                    help="full records written by process_data (default: data/build/citations_full.ndjson.gz)")
+    ap.add_argument("--epochs", type=int, default=EPOCHS)
+    args = ap.parse_args(argv)
+    if np is None:
+        raise SystemExit("NumPy is required")
+    if not args.input.exists():
+        raise SystemExit(f"{args.input} not found; run scripts/process_data.py first")
+    from process_data import load_overrides
+    model, report = train_and_report(iter_ndjson(args.input), get_engine(), load_overrides(), args.epochs)
+    model.save()
+    TAG_MODEL_REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    write_json_atomic(TAG_MODEL_REPORT_PATH, report, indent=1)
+    print_report(report)
+    print(f"Saved {TAG_MODEL_PATH} (use: python scripts/process_data.py --tagger model)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of auto-tagging results between runs of process_data.
+
+Each work is cached by id together with a hash of its text blob (the only
+input the rules see) and the keys of the rules that matched it. A rule's key
+is a hash of its pattern, so:
+
+- works whose text is unchanged reuse their cached matches (a new citation
+  count or venue metadata outside the blob does not force a retag),
+- renaming a rule, moving it to another category or editing `implied_tags` needs
+  no retagging, since names and implied tags are resolved on every run,
+- adding or editing a rule evaluates just that rule (through its own literal
+  prefilter) against the cached works, and removed rules are dropped.
+
+The cache lives in data/build/ and is rewritten after every run with only the
+works seen in that run.
+"""
+
+from __future__ import annotations
+import json, hashlib
+from typing import Dict, Any, List, Optional, Tuple
+
+from tagging import TagEngine, TagRule, text_blob, BLOB_VERSION
+from rawstore import BUILD_DIR, open_text, write_json_atomic
+
+TAG_CACHE_PATH = BUILD_DIR / "tag_cache.json.gz"
+
+
+def digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=10).hexdigest()
+
+
+def rule_key(rule: TagRule) -> str:
+    return digest(rule.pattern)[:12]
+
+
+class TagCache:
+    """Tags works through `engine`, reusing matches cached by a previous run."""
+
+    def __init__(self, engine: TagEngine, entries: Optional[Dict[str, List[Any]]] = None,
+                 evaluated: Optional[List[str]] = None):
+        self.engine = engine
+        self.keys = [rule_key(r) for r in engine.rules]
+        # several rules may share a pattern
+        self.names: Dict[str, List[str]] = {}
+        for k, r in zip(self.keys, engine.rules):
+            self.names.setdefault(k, []).append(r.name)
+        # work id -> [blob hash, matched rule keys], as loaded / as written
+        self.entries: Dict[str, List[Any]] = entries or {}
+        self.updated: Dict[str, List[Any]] = {}
+        # Rules the cached entries were not evaluated against get their own engine
+        seen = set(evaluated or [])
+        fresh = [(k, r) for k, r in zip(self.keys, engine.rules) if k not in seen]
+        self.fresh_keys = [k for k, _ in fresh]
+        self.fresh = TagEngine([r for _, r in fresh]) if fresh else None
+        self.hits = self.partial = self.misses = 0
+
+    @classmethod
+    def load(cls, engine: TagEngine) -> "TagCache":
+        """Open the on-disk cache (an empty one if missing or from another blob version)."""
+        if TAG_CACHE_PATH.exists():
+            with open_text(TAG_CACHE_PATH) as f:
+                data = json.load(f)
+            if data.get("version") == BLOB_VERSION:
+                return cls(engine, data.get("works") or {}, data.get("rules") or [])
+        return cls(engine)
+
+    def lookup(self, wid: Optional[str], blob: str) -> Tuple[str, Optional[List[str]]]:
+        """(blob hash, matched rule keys); keys are None when the work needs a full retag."""
+        h = digest(blob)
+        entry = self.entries.get(wid) if wid else None
+        if entry is None or entry[0] != h:
+            self.misses += 1
+            return h, None
+        keys = [k for k in entry[1] if k in self.names]
+        if self.fresh is None:
+            self.hits += 1
+        else:
+            self.partial += 1
+            keys = sorted(set(keys).union(self.fresh_keys[i] for i in self.fresh.match_rules(blob)))
+        return h, keys
+
+    def store(self, wid: Optional[str], h: str, keys: List[str]) -> None:
+        if wid:
+            self.updated[wid] = [h, keys]
+
+    def keys_of(self, matches: List[int]) -> List[str]:
+        """Rule keys for `engine.match_rules()` indices."""
+        return sorted({self.keys[i] for i in matches})
+
+    def tags_of(self, keys: List[str]) -> List[str]:
+        tags = {name for k in keys for name in self.names[k]}
+        return sorted(self.engine.expand_implied(tags))
+
+    def match_keys(self, wid: Optional[str], blob: str) -> List[str]:
+        h, keys = self.lookup(wid, blob)
+        if keys is None:
+            keys = self.keys_of(self.engine.match_rules(blob))
+        self.store(wid, h, keys)
+        return keys
+
+    def tags_for(self, work: Dict[str, Any]) -> List[str]:
+        return self.tags_of(self.match_keys(work.get("id"), text_blob(work)))
+
+    def save(self) -> None:
+        BUILD_DIR.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(TAG_CACHE_PATH, {
+            "version": BLOB_VERSION,
+            "rules": sorted(self.names),
+            "works": self.updated,
+        }, separators=(",", ":"))
+
+    def summary(self) -> Tuple[int, int, int]:
+        """(reused, partially retagged, retagged) work counts for this run."""
+        return self.hits, self.partial, self.misses
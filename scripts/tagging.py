@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rule engine for auto-tagging works.
+
+- Rules are loaded from tag_rules.yml and compiled once per run.
+- All rule patterns are merged into a single literal prefilter: the leading
+  literal of every alternative is indexed in one table, each text blob is
+  tokenized once, and only the rules whose literals occur are verified with
+  their full regex.
+- Implied tags (e.g. "Learned Bloom Filter" -> "Bloom Filter") are declared in
+  the YAML `implied_tags` map instead of being hard-coded.
+- `iter_match_chunks()` runs the matcher in a process pool; each worker compiles
+  the rule set once and chunks come back in input order.
+- `track_rules()` makes the engine count, per rule, how often its regex was
+  verified, how often it matched and the time spent in it (workers send their
+  counts back with each chunk), for the run report.
+"""
+
+from __future__ import annotations
+import re, time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+    from re import _constants as sre_constants
+except ImportError:  # pragma: no cover
+    import sre_parse, sre_constants  # type: ignore
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set
+
+try:
+    import yaml  # type: ignore
+except Exception:
+    yaml = None  # optional
+
+ROOT = Path(__file__).resolve().parents[1]
+TAG_RULES_PATH = ROOT / "data" / "tag_rules.yml"
+# Bump when text_blob() changes, so cached tagging results are discarded
+BLOB_VERSION = 2
+
+
+class TagRule:
+    __slots__ = ("name", "pattern", "category", "regex")
+
+    def __init__(self, name: str, pattern: str, category: str = "Other"):
+        self.name = name
+        self.pattern = pattern
+        self.category = category
+        self.regex = re.compile(pattern, flags=re.IGNORECASE)
+
+
+WORD_RE = re.compile(r"\w+")
+
+
+def _literal_prefixes(seq: List[Any], prefix: str = "", anchored: bool = False) -> Optional[List[tuple[str, bool]]]:
+    """Leading literal of every alternative of a parsed pattern.
+
+    Returns (literal, anchored) pairs where `anchored` means the match starts at a
+    word boundary, or None when some alternative has no usable literal.
+    """
+    for i, (op, av) in enumerate(seq):
+        if op is sre_constants.AT and av is sre_constants.AT_BOUNDARY and not prefix:
+            anchored = True
+        elif op is sre_constants.LITERAL:
+            prefix += chr(av).lower()
+        elif op is sre_constants.SUBPATTERN:
+            return _literal_prefixes(list(av[-1]) + list(seq[i + 1:]), prefix, anchored)
+        elif op is sre_constants.BRANCH:
+            out: List[tuple[str, bool]] = []
+            for branch in av[1]:
+                r = _literal_prefixes(list(branch) + list(seq[i + 1:]), prefix, anchored)
+                if r is None:
+                    return None
+                out.extend(r)
+            return out
+        else:
+            break
+    return [(prefix, anchored)] if prefix else None
+
+
+class TagEngine:
+    """Compiled rule set. Build once with `load_engine()` and reuse for every work."""
+
+    def __init__(self, rules: List[TagRule], implied_tags: Optional[Dict[str, List[str]]] = None):
+        self.rules = rules
+        self.categories: Dict[str, str] = {r.name: r.category for r in rules}
+        # tag -> implied tags (the `implied_tags` map)
+        self.implied: Dict[str, List[str]] = {tag: list(extra or []) for tag, extra in (implied_tags or {}).items()}
+
+        # Prefilter tables: word-start literal -> rules, substring literal -> rules,
+        # and rules without a usable literal that are always verified.
+        self.word_prefixes: Dict[str, Set[int]] = {}
+        self.substrings: Dict[str, Set[int]] = {}
+        self.always: Set[int] = set()
+        for i, r in enumerate(rules):
+            prefixes = _literal_prefixes(list(sre_parse.parse(r.pattern, re.IGNORECASE)))
+            if prefixes is None:
+                self.always.add(i)
+                continue
+            for lit, anchored in prefixes:
+                word = WORD_RE.match(lit) if anchored else None
+                if word:
+                    self.word_prefixes.setdefault(word.group(0), set()).add(i)
+                else:
+                    self.substrings.setdefault(lit, set()).add(i)
+        self.prefix_lengths = sorted({len(w) for w in self.word_prefixes})
+        # per-rule [verified, matched, seconds], None until track_rules()
+        self.rule_stats: Optional[List[List[float]]] = None
+
+    def track_rules(self) -> "TagEngine":
+        self.rule_stats = [[0, 0, 0.0] for _ in self.rules]
+        return self
+
+    def take_rule_stats(self) -> Optional[List[List[float]]]:
+        """Counts since the last call (and reset them); None when not tracking."""
+        stats = self.rule_stats
+        if stats is not None:
+            self.track_rules()
+        return stats
+
+    def add_rule_stats(self, stats: Optional[List[List[float]]]) -> None:
+        if stats is None or self.rule_stats is None:
+            return
+        for mine, theirs in zip(self.rule_stats, stats):
+            for k in range(3):
+                mine[k] += theirs[k]
+
+    def rule_report(self) -> List[Dict[str, Any]]:
+        """Tracked rules by time spent, slowest first."""
+        if self.rule_stats is None:
+            return []
+        rows = [{"rule": r.name, "verified": int(st[0]), "matched": int(st[1]), "seconds": round(st[2], 4)}
+                for r, st in zip(self.rules, self.rule_stats) if st[0]]
+        return sorted(rows, key=lambda x: (-x["seconds"], x["rule"]))
+
+    def candidate_rules(self, blob: str) -> Set[int]:
+        """Rules whose leading literal occurs in `blob` (a superset of the matches)."""
+        if not blob.isascii():
+            # Case-insensitive matching folds some non-ASCII letters onto ASCII
+            # ones (e.g. "ſ" ~ "s"); verify every rule rather than miss those.
+            return set(range(len(self.rules)))
+        found = set(self.always)
+        lookup = self.word_prefixes.get
+        for tok in set(WORD_RE.findall(blob)):
+            for n in self.prefix_lengths:
+                if n > len(tok):
+                    break
+                hit = lookup(tok[:n])
+                if hit:
+                    found |= hit
+        for lit, idx in self.substrings.items():
+            if lit in blob:
+                found |= idx
+        return found
+
+    def match_rules(self, blob: str) -> List[int]:
+        """Return the indices of all rules whose pattern occurs in `blob`."""
+        rules = self.rules
+        if self.rule_stats is None:
+            return sorted(i for i in self.candidate_rules(blob) if rules[i].regex.search(blob))
+        out: List[int] = []
+        clock = time.perf_counter
+        for i in self.candidate_rules(blob):
+            st = self.rule_stats[i]
+            t0 = clock()
+            hit = rules[i].regex.search(blob)
+            st[2] += clock() - t0
+            st[0] += 1
+            if hit:
+                st[1] += 1
+                out.append(i)
+        return sorted(out)
+
+    def expand_implied(self, tags: Set[str]) -> Set[str]:
+        stack = list(tags)
+        while stack:
+            for extra in self.implied.get(stack.pop(), ()):
+                if extra not in tags:
+                    tags.add(extra)
+                    stack.append(extra)
+        return tags
+
+    def tags_for_matches(self, matches: Iterable[int]) -> List[str]:
+        """Sorted tags (with implied ones) for rule indices from `match_rules`."""
+        tags = {self.rules[i].name for i in matches}
+        return sorted(self.expand_implied(tags))
+
+    def tags_for_blob(self, blob: str) -> List[str]:
+        return self.tags_for_matches(self.match_rules(blob))
+
+    def tags_for(self, work: Dict[str, Any]) -> List[str]:
+        return self.tags_for_blob(text_blob(work))
+
+    def tag_corpus(self, items: Iterable[Dict[str, Any]]) -> List[List[str]]:
+        """Tag a batch of works, returning one sorted tag list per item."""
+        return [self.tags_for(w) for w in items]
+
+    def spec(self) -> List[tuple]:
+        """Picklable rule definitions, enough to rebuild the matcher in a worker."""
+        return [(r.name, r.pattern, r.category) for r in self.rules]
+
+
+def load_engine(path: Path = TAG_RULES_PATH) -> TagEngine:
+    """Load and compile tagging rules from YAML file."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+
+    rules: List[TagRule] = []
+    for rule in data.get("tag_rules", []):
+        name = rule.get("name")
+        pattern = rule.get("pattern")
+        category = rule.get("category", "Other")
+        if name and pattern:
+            rules.append(TagRule(name, pattern, category))
+    return TagEngine(rules, data.get("implied_tags") or {})
+
+
+_ENGINE: Optional[TagEngine] = None
+
+
+def get_engine() -> TagEngine:
+    """Process-wide engine, loaded on first use."""
+    global _ENGINE
+    if _ENGINE is None:
+        _ENGINE = load_engine()
+    return _ENGINE
+
+
+def tag_corpus(items: Iterable[Dict[str, Any]], engine: Optional[TagEngine] = None) -> List[List[str]]:
+    return (engine or get_engine()).tag_corpus(items)
+
+
+# Matcher of a pool worker process, built once by the pool initializer
+_WORKER_ENGINE: Optional[TagEngine] = None
+
+
+def _init_worker(spec: List[tuple], track: bool = False) -> None:
+    global _WORKER_ENGINE
+    _WORKER_ENGINE = TagEngine([TagRule(*r) for r in spec])
+    if track:
+        _WORKER_ENGINE.track_rules()
+
+
+def _match_chunk(blobs: List[str]) -> tuple[List[List[int]], Optional[List[List[float]]]]:
+    """Matches of `blobs` and the worker's rule counts for them."""
+    return [_WORKER_ENGINE.match_rules(b) for b in blobs], _WORKER_ENGINE.take_rule_stats()
+
+
+def iter_match_chunks(chunks: Iterable[List[str]], engine: TagEngine, workers: int) -> Iterator[List[List[int]]]:
+    """`match_rules` for every blob of every chunk, computed by `workers` processes.
+
+    Results are yielded per chunk in input order. At most two chunks per worker
+    are in flight, so `chunks` may be a lazy stream. Rule counts of the workers
+    are added to `engine` when it tracks rules.
+    """
+    if workers <= 1:
+        for blobs in chunks:
+            yield [engine.match_rules(b) for b in blobs]
+        return
+    track = engine.rule_stats is not None
+
+    def result(f: Any) -> List[List[int]]:
+        if f is None:
+            return []
+        matches, stats = f.result()
+        engine.add_rule_stats(stats)
+        return matches
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(engine.spec(), track)) as pool:
+        pending: deque = deque()
+        for blobs in chunks:
+            # empty chunks (e.g. fully cached) never reach the pool
+            pending.append(pool.submit(_match_chunk, blobs) if blobs else None)
+            if len(pending) >= 2 * workers:
+                yield result(pending.popleft())
+        while pending:
+            yield result(pending.popleft())
+
+
+def reconstruct_abstract(inv: Optional[Dict[str, List[int]]]) -> str:
+    """Rebuild the abstract text from an OpenAlex inverted index (word -> positions)."""
+    if not isinstance(inv, dict) or not inv:
+        return ""
+    slots: Dict[int, str] = {}
+    for word, positions in inv.items():
+        for p in positions or ():
+            slots[p] = word
+    return " ".join(slots[p] for p in sorted(slots))
+
+
+def abstract_text(work: Dict[str,Any]) -> str:
+    """Ordered abstract of a work: the `abstract` field set by process_data, else rebuilt."""
+    text = work.get("abstract")
+    if text is None:
+        text = reconstruct_abstract(work.get("abstract_inverted_index"))
+    return text
+
+
+def text_blob(work: Dict[str,Any]) -> str:
+    parts: List[str] = []
+    # タイトルを取得（display_nameまたはtitleフィールドから）
+    title = work.get("title") or work.get("display_name") or ""
+    parts.append(str(title))
+    # venue names
+    for key in ("host_venue","primary_location"):
+        hv = work.get(key) or {}
+        if isinstance(hv, dict):
+            dn = hv.get("display_name")
+            if dn: parts.append(str(dn))
+            src = hv.get("source") or {}
+            if isinstance(src, dict):
+                sdn = src.get("display_name")
+                if sdn: parts.append(str(sdn))
+    # abstract (ordered text, so multi-word patterns only match adjacent words)
+    abstract = abstract_text(work)
+    if abstract:
+        parts.append(abstract)
+    # concepts
+    concepts = work.get("concepts") or []
+    for c in concepts:
+        dn = c.get("display_name")
+        if dn: parts.append(str(dn))
+    return " \n".join(parts).lower()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DuplicateIndex.resolve with merge_works overrides, in every input order.
+
+    python -m unittest discover -s scripts -p "test_*.py"
+"""
+
+from __future__ import annotations
+import itertools, unittest
+from typing import Any, Dict, List
+
+from dedup import DuplicateIndex, np
+
+TITLE = "The Case for Learned Index Structures in Main Memory Databases"
+
+
+def work(wid: str, title: str, venue: str, cited_by: int = 0) -> Dict[str, Any]:
+    return {"id": f"https://openalex.org/{wid}", "title": title, "host_venue": venue,
+            "publication_year": 2019, "cited_by_count": cited_by,
+            "authorships": [{"name": "Tim Kraska"}, {"name": "Alex Beutel"}]}
+
+
+def oa(*ids: str) -> List[str]:
+    return [f"https://openalex.org/{i}" for i in ids]
+
+
+@unittest.skipIf(np is None, "NumPy is required for duplicate detection")
+class MergeWorksTest(unittest.TestCase):
+    def resolve_all_orders(self, records: List[Dict[str, Any]], overrides: Dict[str, Any]) -> List[tuple]:
+        results = []
+        for order in itertools.permutations(records):
+            dups = DuplicateIndex().add_all(order).resolve(overrides)
+            results.append((dups.canonical_of, dups.members, dups.candidates))
+        return results
+
+    def test_forced_group_survives_a_published_match(self) -> None:
+        # W2 + W3 are merged by hand; W1 is a published work LSH-similar to W2
+        records = [work("W1", TITLE, "VLDB"), work("W2", TITLE, "SIGMOD", 10),
+                   work("W3", "An Unrelated Journal Version", "TODS")]
+        results = self.resolve_all_orders(records, {"merge_works": [oa("W2", "W3")]})
+        for canonical_of, members, candidates in results:
+            self.assertEqual(canonical_of, {oa("W3")[0]: oa("W2")[0]})
+            self.assertEqual(members, {oa("W2")[0]: oa("W3")})
+            self.assertEqual(candidates, [oa("W2", "W1", "W3")])
+
+    def test_preprint_joins_a_forced_group(self) -> None:
+        records = [work("W1", TITLE, "arXiv (Cornell University)"), work("W2", TITLE, "SIGMOD", 10),
+                   work("W3", "An Unrelated Journal Version", "TODS")]
+        results = self.resolve_all_orders(records, {"merge_works": [oa("W2", "W3")]})
+        for canonical_of, members, candidates in results:
+            self.assertEqual(members, {oa("W2")[0]: oa("W1", "W3")})
+            self.assertEqual(candidates, [])
+
+    def test_separate_works(self) -> None:
+        records = [work("W1", TITLE, "arXiv (Cornell University)"), work("W2", TITLE, "SIGMOD")]
+        for canonical_of, _, _ in self.resolve_all_orders(records, {"separate_works": [oa("W1", "W2")]}):
+            self.assertEqual(canonical_of, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAlexClient against a local stub server that injects throttling and errors.
+
+    python -m unittest discover -s scripts -p "test_*.py"
+"""
+
+from __future__ import annotations
+import json, time, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+import requests
+
+from openalex_client import OpenAlexClient, TokenBucket
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers from the server's script: (status, headers) per request, then 200."""
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        server = self.server
+        with server.lock:
+            server.hits.append(time.monotonic())
+            status, headers = server.script.pop(0) if server.script else (200, {})
+        body = json.dumps({"status": status}).encode("utf-8")
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class OpenAlexClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = []
+        self.server.script = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/works"
+        self.session = requests.Session()
+
+    def tearDown(self) -> None:
+        self.session.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, script: List[Tuple[int, dict]], **kwargs) -> OpenAlexClient:
+        self.server.script[:] = script
+        kwargs.setdefault("rate", 1000)
+        kwargs.setdefault("backoff_base", 0.01)
+        kwargs.setdefault("max_retries", 3)
+        return OpenAlexClient(self.session, **kwargs)
+
+    def test_retry_after_is_honoured(self) -> None:
+        client = self.client([(429, {"Retry-After": "1"})])
+        self.assertEqual(client.get_json(self.url), {"status": 200})
+        hits = self.server.hits
+        self.assertEqual(len(hits), 2)
+        self.assertGreaterEqual(hits[1] - hits[0], 0.9)
+
+    def test_retry_after_is_capped(self) -> None:
+        client = self.client([(503, {"Retry-After": "3600"})], max_retry_after=0.2)
+        t0 = time.monotonic()
+        client.get_json(self.url)
+        self.assertLess(time.monotonic() - t0, 5)
+        self.assertEqual(len(self.server.hits), 2)
+
+    def test_server_errors_are_retried_until_exhausted(self) -> None:
+        client = self.client([(500, {}), (502, {})])
+        self.assertEqual(client.get_json(self.url), {"status": 200})
+        self.assertEqual(len(self.server.hits), 3)
+
+        client = self.client([(503, {})] * 10, max_retries=2)
+        with self.assertRaises(requests.HTTPError) as ctx:
+            client.get(self.url)
+        self.assertEqual(ctx.exception.response.status_code, 503)
+        self.assertEqual(len(self.server.hits), 3 + 3)
+
+    def test_client_errors_raise_at_once(self) -> None:
+        client = self.client([(404, {}), (200, {})])
+        with self.assertRaises(requests.HTTPError) as ctx:
+            client.get(self.url)
+        self.assertEqual(ctx.exception.response.status_code, 404)
+        self.assertEqual(len(self.server.hits), 1)
+
+    def test_throttling_halves_the_rate(self) -> None:
+        client = self.client([(429, {"Retry-After": "0"})], rate=40)
+        client.get(self.url)
+        self.assertLess(client.bucket.rate, 40)
+
+    def test_token_bucket_keeps_its_rate(self) -> None:
+        bucket = TokenBucket(rate=20, capacity=1)
+        t0 = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        # the first token is free, the other 10 come at 20 per second
+        self.assertGreaterEqual(time.monotonic() - t0, 0.45)
+
+    def test_requests_through_the_client_are_paced(self) -> None:
+        client = self.client([], bucket=TokenBucket(rate=20, capacity=1))
+        for _ in range(6):
+            client.get(self.url)
+        hits = self.server.hits
+        self.assertGreaterEqual(hits[-1] - hits[0], 0.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+On-disk cache of reconstructed abstracts, shared by tagging, search and other
+text features.
+
+OpenAlex ships abstracts as inverted indexes (word -> positions). The ordered
+text is rebuilt once (tagging.reconstruct_abstract) and stored per work id in
+a SQLite table, zlib-compressed, together with a stamp of the source: the
+work's `updated_date` when available, else a hash of the inverted index. A
+work is rebuilt only when its stamp changes.
+
+    with TextStore() as store:
+        text = store.abstract(work)      # cached or rebuilt
+        text = store.get(work_id)        # random access by id
+"""
+
+from __future__ import annotations
+import json, zlib, sqlite3, hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from tagging import reconstruct_abstract
+from rawstore import BUILD_DIR
+
+TEXT_STORE_PATH = BUILD_DIR / "texts.sqlite"
+
+
+def source_stamp(work: Dict[str, Any]) -> str:
+    stamp = work.get("updated_date")
+    if stamp:
+        return stamp
+    inv = work.get("abstract_inverted_index")
+    raw = json.dumps(inv, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=10).hexdigest()
+
+
+class TextStore:
+    """SQLite-backed map of work id -> ordered abstract text."""
+
+    def __init__(self, path: Path = TEXT_STORE_PATH, readonly: bool = False):
+        self.path = path
+        if not readonly:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        uri = f"file:{path}?mode=ro" if readonly else f"file:{path}"
+        self.db = sqlite3.connect(uri, uri=True)
+        if not readonly:
+            self.db.execute("CREATE TABLE IF NOT EXISTS abstracts (id TEXT PRIMARY KEY, stamp TEXT, text BLOB)")
+        self.pending: List[Tuple[str, str, bytes]] = []
+        self.seen: Set[str] = set()
+        self.hits = self.misses = 0
+
+    def get(self, wid: str) -> Optional[str]:
+        row = self.db.execute("SELECT text FROM abstracts WHERE id = ?", (wid,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else None
+
+    def abstract(self, work: Dict[str, Any]) -> str:
+        """Ordered abstract of `work`, from the store when its source is unchanged."""
+        wid = work.get("id")
+        if not wid:
+            return reconstruct_abstract(work.get("abstract_inverted_index"))
+        self.seen.add(wid)
+        stamp = source_stamp(work)
+        row = self.db.execute("SELECT stamp, text FROM abstracts WHERE id = ?", (wid,)).fetchone()
+        if row and row[0] == stamp:
+            self.hits += 1
+            return zlib.decompress(row[1]).decode("utf-8")
+        self.misses += 1
+        text = reconstruct_abstract(work.get("abstract_inverted_index"))
+        self.pending.append((wid, stamp, zlib.compress(text.encode("utf-8"))))
+        if len(self.pending) >= 1000:
+            self.flush()
+        return text
+
+    def flush(self) -> None:
+        if self.pending:
+            self.db.executemany("INSERT OR REPLACE INTO abstracts VALUES (?, ?, ?)", self.pending)
+            self.db.commit()
+            self.pending.clear()
+
+    def prune(self) -> None:
+        """Drop works not requested through `abstract()` since the store was opened."""
+        self.flush()
+        self.db.execute("CREATE TEMP TABLE keep (id TEXT PRIMARY KEY)")
+        self.db.executemany("INSERT INTO keep VALUES (?)", ((i,) for i in self.seen))
+        self.db.execute("DELETE FROM abstracts WHERE id NOT IN (SELECT id FROM keep)")
+        self.db.execute("DROP TABLE keep")
+        self.db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+    def __enter__(self) -> "TextStore":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()